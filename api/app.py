@@ -1,4 +1,5 @@
 import os
+import tempfile
 from flask import Flask, jsonify
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
@@ -18,6 +19,61 @@ def create_app():
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     
+    # Configuración de reservas temporales de entradas
+    app.config['RESERVATION_TTL_SECONDS'] = int(os.getenv('RESERVATION_TTL_SECONDS', 600))
+    app.config['RESERVATION_MAX_TTL_SECONDS'] = int(os.getenv('RESERVATION_MAX_TTL_SECONDS', 1800))
+    app.config['RESERVATION_SWEEP_INTERVAL'] = float(os.getenv('RESERVATION_SWEEP_INTERVAL', 5))
+    app.config['RESERVATION_SWEEP_BATCH_SIZE'] = int(os.getenv('RESERVATION_SWEEP_BATCH_SIZE', 500))
+    app.config['RESERVATION_SWEEPER_ENABLED'] = os.getenv('RESERVATION_SWEEPER_ENABLED', 'True').lower() == 'true'
+    
+    # Configuración de claves de idempotencia para POST /api/purchases
+    app.config['IDEMPOTENCY_KEY_TTL_SECONDS'] = int(os.getenv('IDEMPOTENCY_KEY_TTL_SECONDS', 86400))
+    app.config['IDEMPOTENCY_PURGE_INTERVAL'] = float(os.getenv('IDEMPOTENCY_PURGE_INTERVAL', 3600))
+    
+    # Configuración de la sala de espera para salidas a venta masivas
+    app.config['QUEUE_ADMISSION_RATE'] = float(os.getenv('QUEUE_ADMISSION_RATE', 50))
+    app.config['QUEUE_EVENT_CACHE_TTL'] = float(os.getenv('QUEUE_EVENT_CACHE_TTL', 1))
+    app.config['QUEUE_DIR'] = os.getenv('QUEUE_DIR', os.path.join(tempfile.gettempdir(), 'entradas_sala_espera'))
+    
+    # Modo de confirmación de compras: 'sync' (una transacción por compra) o 'async' (aceptar y confirmar en lote)
+    app.config['PURCHASE_PIPELINE_MODE'] = os.getenv('PURCHASE_PIPELINE_MODE', 'sync').lower()
+    app.config['PURCHASE_PIPELINE_BATCH_SIZE'] = int(os.getenv('PURCHASE_PIPELINE_BATCH_SIZE', 200))
+    app.config['PURCHASE_PIPELINE_BATCH_WAIT'] = float(os.getenv('PURCHASE_PIPELINE_BATCH_WAIT', 0.05))
+    
+    # Firma HMAC de los códigos QR (verificable en la puerta sin consultar la base)
+    app.config['QR_SIGNING_KEY'] = os.getenv('QR_SIGNING_KEY', app.config['SECRET_KEY'])
+    app.config['QR_ALLOW_UNSIGNED'] = os.getenv('QR_ALLOW_UNSIGNED', 'True').lower() == 'true'
+    
+    # Modo día de evento: índice de validación en un almacén local compartido por los procesos del servidor
+    app.config['HOT_VALIDATION_DIR'] = os.getenv('HOT_VALIDATION_DIR', os.path.join(tempfile.gettempdir(), 'entradas_validacion'))
+    app.config['HOT_VALIDATION_FLUSH_INTERVAL'] = float(os.getenv('HOT_VALIDATION_FLUSH_INTERVAL', 0.5))
+    app.config['HOT_VALIDATION_FLUSH_BATCH'] = int(os.getenv('HOT_VALIDATION_FLUSH_BATCH', 1000))
+    
+    # Imágenes QR renderizadas en el servidor: caché en disco con límite de tamaño y procesos de pre-render
+    app.config['QR_CACHE_DIR'] = os.getenv('QR_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'entradas_qr'))
+    app.config['QR_CACHE_MAX_BYTES'] = int(os.getenv('QR_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    app.config['QR_RENDER_WORKERS'] = int(os.getenv('QR_RENDER_WORKERS', 0))
+    
+    # PDF de entradas generados en el servidor: pool de procesos y caché en disco por número de orden
+    app.config['TICKET_PDF_CACHE_DIR'] = os.getenv('TICKET_PDF_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'entradas_pdf'))
+    app.config['TICKET_PDF_WORKERS'] = int(os.getenv('TICKET_PDF_WORKERS', 0))
+    app.config['TICKET_PDF_TIMEOUT'] = float(os.getenv('TICKET_PDF_TIMEOUT', 30))
+    
+    # Segundos entre aplicaciones de los cambios de ventas pendientes (sales_changes) al resumen diario
+    app.config['SALES_ROLLUP_INTERVAL'] = float(os.getenv('SALES_ROLLUP_INTERVAL', 1))
+    
+    # Reportes PDF/Excel generados como trabajos en un pool de procesos; los archivos se borran tras REPORT_JOBS_TTL segundos
+    app.config['REPORT_JOBS_DIR'] = os.getenv('REPORT_JOBS_DIR', os.path.join(tempfile.gettempdir(), 'entradas_reportes'))
+    app.config['REPORT_JOBS_WORKERS'] = int(os.getenv('REPORT_JOBS_WORKERS', 0))
+    app.config['REPORT_JOBS_TTL'] = float(os.getenv('REPORT_JOBS_TTL', 3600))
+    app.config['REPORT_JOBS_HEARTBEAT_INTERVAL'] = float(os.getenv('REPORT_JOBS_HEARTBEAT_INTERVAL', 5))
+    
+    # Caché en memoria de reportes de ventas (JSON, PDF y Excel) por filtros y versión de los datos; expulsión LRU por bytes
+    app.config['REPORT_CACHE_MAX_BYTES'] = int(os.getenv('REPORT_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    
+    # Segundos entre lecturas de los contadores de asistencia en el stream SSE
+    app.config['ATTENDANCE_STREAM_INTERVAL'] = float(os.getenv('ATTENDANCE_STREAM_INTERVAL', 1))
+    
     # Configuración de CORS
     CORS(app, origins=['http://localhost:3000', 'http://localhost:3001', 'http://localhost:5173'])
     
@@ -63,10 +119,14 @@ def create_app():
         @events_ns.param('active', 'Filtrar por estado (true/false)', default='true')
         @events_ns.param('page', 'Número de página', type='integer', default=1)
         @events_ns.param('per_page', 'Eventos por página', type='integer', default=50)
+        @events_ns.param('pagination', 'Modo de paginación (cursor para paginación por cursor)')
+        @events_ns.param('cursor', 'Cursor de la página siguiente (next_cursor de la respuesta anterior)')
+        @events_ns.param('include_total', 'Incluir el total de eventos en modo cursor (true/false)', default='false')
         def get(self):
             """Obtener lista de eventos"""
             from flask import request
             from api.models import Event
+            from api.utils.pagination import usa_cursor, paginar_por_cursor
             
             try:
                 page = request.args.get('page', 1, type=int)
@@ -82,14 +142,29 @@ def create_app():
                 if category:
                     query = query.filter(Event.category.ilike(f'%{category}%'))
                 
+                # Paginación por cursor (keyset) si se pide; por página (OFFSET) por defecto
+                if usa_cursor(request.args):
+                    events, pagination = paginar_por_cursor(
+                        query, Event, per_page,
+                        cursor=request.args.get('cursor'),
+                        incluir_total=request.args.get('include_total', 'false').lower() == 'true'
+                    )
+                    disponibles = Event.disponibles_por_evento(events)
+                    return {
+                        'success': True,
+                        'events': [event.to_dict(disponibles.get(event.id)) for event in events],
+                        'pagination': pagination
+                    }
+                
                 # Paginar resultados
                 events = query.order_by(Event.created_at.desc()).paginate(
                     page=page, per_page=per_page, error_out=False
                 )
                 
+                disponibles = Event.disponibles_por_evento(events.items)
                 return {
                     'success': True,
-                    'events': [event.to_dict() for event in events.items],
+                    'events': [event.to_dict(disponibles.get(event.id)) for event in events.items],
                     'pagination': {
                         'page': page,
                         'pages': events.pages,
@@ -100,6 +175,8 @@ def create_app():
                     }
                 }
                 
+            except ValueError as e:
+                return {'success': False, 'error': str(e)}, 400
             except Exception as e:
                 return {'success': False, 'error': f'Error interno del servidor: {str(e)}'}, 500
         
@@ -170,16 +247,16 @@ def create_app():
         @events_ns.doc('get_event')
         def get(self, event_id):
             """Obtener un evento específico"""
-            from api.models import Event
+            from api.routes.events import detalle_evento
             
             try:
-                event = Event.query.get(event_id)
-                if not event:
+                event_dict = detalle_evento(event_id)
+                if not event_dict:
                     return {'success': False, 'error': 'Evento no encontrado'}, 404
                 
                 return {
                     'success': True,
-                    'event': event.to_dict()
+                    'event': event_dict
                 }
                 
             except Exception as e:
@@ -224,12 +301,16 @@ def create_app():
     from api.routes.reports import reports_bp
     from api.routes.purchases import purchases_bp
     from api.routes.tickets import tickets_bp
+    from api.routes.reservations import reservations_bp
+    from api.routes.queue import queue_bp
     
     app.register_blueprint(users_bp, url_prefix='/api')
     app.register_blueprint(events_bp, url_prefix='/api')
     app.register_blueprint(reports_bp, url_prefix='/api')
     app.register_blueprint(purchases_bp, url_prefix='/api')
     app.register_blueprint(tickets_bp, url_prefix='/api')
+    app.register_blueprint(reservations_bp, url_prefix='/api')
+    app.register_blueprint(queue_bp, url_prefix='/api')
     
     # Ruta simple para crear eventos (alternativa a Swagger)
     @app.route('/api/test/event', methods=['POST'])
@@ -307,7 +388,9 @@ def create_app():
                 'events_original': 'http://localhost:5001/api/events',
                 'users': 'http://localhost:5001/api/users',
                 'purchases': 'http://localhost:5001/api/purchases',
-                'tickets': 'http://localhost:5001/api/tickets'
+                'tickets': 'http://localhost:5001/api/tickets',
+                'reservations': 'http://localhost:5001/api/reservations',
+                'queue': 'http://localhost:5001/api/queue'
             }
         })
     
@@ -315,10 +398,64 @@ def create_app():
     with app.app_context():
         db.create_all()
         
+        # Completar tablas existentes con columnas agregadas a los modelos
+        from api.utils.schema import actualizar_esquema
+        actualizar_esquema()
+        
+        # Calcular el digest QR de tickets creados antes de la columna qr_digest
+        from api.utils.qr import completar_digests_qr
+        completar_digests_qr()
+        
+        # Construir el resumen diario de ventas de bases con compras anteriores a la tabla
+        from api.utils.sales_rollup import completar_resumen_ventas
+        completar_resumen_ventas()
+        
         # Poblar con datos iniciales si la base está vacía
         from api.utils.seed_data import seed_initial_data
         seed_initial_data()
     
+    # Liberar reservas vencidas en segundo plano
+    if app.config['RESERVATION_SWEEPER_ENABLED']:
+        from api.utils.reservations import iniciar_barrido_reservas
+        iniciar_barrido_reservas(app)
+    
+    # Resumen diario de ventas mantenido en segundo plano, fuera de la transacción de cada compra
+    from api.utils.sales_rollup import iniciar_resumen_ventas
+    iniciar_resumen_ventas(app)
+    
+    # Confirmación de compras en lote en segundo plano
+    if app.config['PURCHASE_PIPELINE_MODE'] == 'async':
+        from api.utils.purchase_pipeline import iniciar_pipeline
+        iniciar_pipeline(app)
+    
+    # Salas de espera compartidas por los procesos de API
+    from api.utils.waiting_room import iniciar_salas_espera
+    iniciar_salas_espera(app)
+    
+    # Validación de tickets desde memoria para eventos en modo día de evento
+    from api.utils.hot_validation import iniciar_validacion_en_caliente
+    iniciar_validacion_en_caliente(app)
+    
+    # Caché en disco de las imágenes QR de los tickets
+    from api.utils.qr_images import iniciar_cache_qr
+    iniciar_cache_qr(app)
+    
+    # PDF de entradas por compra
+    from api.utils.ticket_pdf import iniciar_pdf_tickets
+    iniciar_pdf_tickets(app)
+    
+    # Cola de trabajos de reportes de ventas
+    from api.utils.report_jobs import iniciar_trabajos_reportes
+    iniciar_trabajos_reportes(app)
+    
+    # Caché de reportes de ventas ya generados
+    from api.utils.report_cache import iniciar_cache_reportes
+    iniciar_cache_reportes(app)
+    
+    # Purgar claves de idempotencia vencidas para mantener la tabla pequeña
+    from api.utils.idempotency import iniciar_purga_claves
+    iniciar_purga_claves(app)
+    
     return app
 
 if __name__ == '__main__':
@@ -1,7 +1,7 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Boolean, Text, ForeignKey, Index, UniqueConstraint, func, inspect
+from sqlalchemy.orm import relationship, joinedload
 
 db = SQLAlchemy()
 
@@ -21,6 +21,11 @@ class User(db.Model):
     # Relaciones
     purchases = relationship('Purchase', back_populates='user', cascade='all, delete-orphan')
     
+    __table_args__ = (
+        # Paginación por cursor: ORDER BY created_at DESC, id DESC
+        Index('ix_users_created_at_id', 'created_at', 'id'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -53,14 +58,51 @@ class Event(db.Model):
     category = Column(String(100), nullable=True)
     available_tickets = Column(Integer, default=0)
     total_tickets = Column(Integer, default=0)
+    inventory_shards = Column(Integer, default=0)  # 0 = inventario en available_tickets; K > 0 = repartido en K sub-contadores
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relaciones
     purchases = relationship('Purchase', back_populates='event')
+    shards = relationship('InventoryShard', back_populates='event', cascade='all, delete-orphan')
+    attendance = relationship('EventAttendance', back_populates='event', uselist=False, cascade='all, delete-orphan')
     
-    def to_dict(self):
+    __table_args__ = (
+        # Paginación por cursor: ORDER BY created_at DESC, id DESC
+        Index('ix_events_created_at_id', 'created_at', 'id'),
+    )
+    
+    @property
+    def entradas_disponibles(self):
+        """Entradas disponibles, sumando los sub-contadores si el evento usa inventario repartido"""
+        if not self.inventory_shards:
+            return self.available_tickets
+        if 'shards' not in inspect(self).unloaded:
+            # Sub-contadores ya cargados (carga ansiosa): sumar sin consultar
+            return sum(shard.available_tickets for shard in self.shards)
+        return db.session.query(func.coalesce(func.sum(InventoryShard.available_tickets), 0)).filter(
+            InventoryShard.event_id == self.id
+        ).scalar()
+    
+    @staticmethod
+    def disponibles_por_evento(events):
+        """Entradas disponibles de los eventos con inventario repartido, con un solo SUM agrupado por evento.
+
+        Retorna {event_id: disponibles} para pasar a to_dict() al listar
+        eventos sin una consulta por evento.
+        """
+        ids = [event.id for event in events if event.inventory_shards]
+        if not ids:
+            return {}
+        disponibles = dict.fromkeys(ids, 0)
+        disponibles.update(db.session.query(
+            InventoryShard.event_id, func.sum(InventoryShard.available_tickets)
+        ).filter(InventoryShard.event_id.in_(ids)).group_by(InventoryShard.event_id).all())
+        return disponibles
+    
+    def to_dict(self, disponibles=None):
+        """Diccionario del evento; `disponibles` evita calcular entradas_disponibles (ver disponibles_por_evento)"""
         return {
             'id': self.id,
             'title': self.title,
@@ -73,7 +115,7 @@ class Event(db.Model):
             'image': self.image,
             'description': self.description,
             'category': self.category,
-            'availableTickets': self.available_tickets,
+            'availableTickets': self.entradas_disponibles if disponibles is None else disponibles,
             'totalTickets': self.total_tickets,
             'isActive': self.is_active,
             'createdAt': self.created_at.isoformat() if self.created_at else None
@@ -83,6 +125,121 @@ class Event(db.Model):
         return f'<Event {self.title}>'
 
 
+class InventoryShard(db.Model):
+    """Sub-contador de inventario para eventos con alta demanda (reparte la contención de escritura)"""
+    __tablename__ = 'inventory_shards'
+    
+    id = Column(Integer, primary_key=True)
+    event_id = Column(String(50), ForeignKey('events.id'), nullable=False, index=True)
+    shard_index = Column(Integer, nullable=False)
+    available_tickets = Column(Integer, nullable=False, default=0)
+    
+    # Relaciones
+    event = relationship('Event', back_populates='shards')
+    
+    __table_args__ = (
+        UniqueConstraint('event_id', 'shard_index', name='uq_inventory_shards_event_shard'),
+    )
+    
+    def __repr__(self):
+        return f'<InventoryShard {self.event_id}#{self.shard_index}>'
+
+
+class EventAttendance(db.Model):
+    """Contadores de asistencia por evento, mantenidos incrementalmente por ventas y validaciones"""
+    __tablename__ = 'event_attendance'
+    
+    event_id = Column(String(50), ForeignKey('events.id'), primary_key=True)
+    tickets_sold = Column(Integer, nullable=False, default=0)
+    tickets_admitted = Column(Integer, nullable=False, default=0)
+    minute_start = Column(DateTime, nullable=True)  # Minuto al que corresponde admissions_current_minute
+    admissions_current_minute = Column(Integer, nullable=False, default=0)
+    admissions_previous_minute = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relaciones
+    event = relationship('Event', back_populates='attendance')
+    
+    def to_dict(self, ahora=None):
+        # Las ventanas por minuto se interpretan respecto del minuto actual
+        minuto = (ahora or datetime.utcnow()).replace(second=0, microsecond=0)
+        if self.minute_start == minuto:
+            actual, anterior = self.admissions_current_minute, self.admissions_previous_minute
+        elif self.minute_start == minuto - timedelta(minutes=1):
+            actual, anterior = 0, self.admissions_current_minute
+        else:
+            actual, anterior = 0, 0
+        
+        return {
+            'eventId': self.event_id,
+            'ticketsSold': self.tickets_sold,
+            'ticketsAdmitted': self.tickets_admitted,
+            'ticketsPending': self.tickets_sold - self.tickets_admitted,
+            'admissionsLastMinute': anterior,
+            'admissionsCurrentMinute': actual,
+            'updatedAt': self.updated_at.isoformat() if self.updated_at else None
+        }
+    
+    def __repr__(self):
+        return f'<EventAttendance {self.event_id}>'
+
+
+class SalesDailyRollup(db.Model):
+    """Ventas por día, evento y categoría; las compras llegan en segundo plano desde sales_changes"""
+    __tablename__ = 'sales_daily_rollup'
+    
+    day = Column(Date, primary_key=True)  # Día UTC de purchase_date
+    event_id = Column(String(50), ForeignKey('events.id'), primary_key=True)
+    category = Column(String(100), primary_key=True)  # Categoría actual del evento ('General' si no tiene)
+    purchases = Column(Integer, nullable=False, default=0)
+    tickets = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+    last_purchase_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        # Reportes filtrados por evento y rango de días
+        Index('ix_sales_daily_rollup_event_day', 'event_id', 'day'),
+    )
+    
+    def __repr__(self):
+        return f'<SalesDailyRollup {self.day} {self.event_id} {self.category}>'
+
+
+class SalesChange(db.Model):
+    """Cambios de ventas aún no aplicados al resumen diario.
+
+    Cada compra o cambio de estado inserta una fila en su propia transacción
+    (solo INSERT, sin filas compartidas que bloquear); un proceso en segundo
+    plano las suma al resumen diario y luego las elimina.
+    """
+    __tablename__ = 'sales_changes'
+
+    id = Column(Integer, primary_key=True)
+    event_id = Column(String(50), nullable=False)
+    day = Column(Date, nullable=False)  # Día UTC de purchase_date
+    purchases = Column(Integer, nullable=False)  # +1 o -1
+    tickets = Column(Integer, nullable=False)
+    revenue = Column(Float, nullable=False)
+    purchase_date = Column(DateTime, nullable=True)  # Solo en altas: candidato a last_purchase_at
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<SalesChange {self.id} {self.event_id} {self.day}>'
+
+
+class SalesDataVersion(db.Model):
+    """Versión de los datos de ventas: una única fila que aumenta con cada escritura que cambia los reportes"""
+    __tablename__ = 'sales_data_version'
+
+    id = Column(Integer, primary_key=True)  # Siempre 1
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<SalesDataVersion {self.version}>'
+
+
 class Purchase(db.Model):
     """Modelo para compras de entradas"""
     __tablename__ = 'purchases'
@@ -109,8 +266,23 @@ class Purchase(db.Model):
     event = relationship('Event', back_populates='purchases')
     tickets = relationship('Ticket', back_populates='purchase', cascade='all, delete-orphan')
     
-    def to_dict(self):
-        return {
+    __table_args__ = (
+        # Paginación por cursor: ORDER BY created_at DESC, id DESC
+        Index('ix_purchases_created_at_id', 'created_at', 'id'),
+        # Exportación del detalle de ventas por lotes: ORDER BY purchase_date DESC, id DESC
+        Index('ix_purchases_purchase_date_id', 'purchase_date', 'id'),
+    )
+    
+    @staticmethod
+    def opciones_carga():
+        """Carga ansiosa de las relaciones que usa to_dict(), para listar compras sin consultas N+1"""
+        return (
+            joinedload(Purchase.user),
+            joinedload(Purchase.event).selectinload(Event.shards)
+        )
+    
+    def to_dict(self, incluir_relaciones=True):
+        data = {
             'id': self.id,
             'orderNumber': self.order_number,
             'userId': self.user_id,
@@ -126,11 +298,13 @@ class Purchase(db.Model):
             'qrCodeData': self.qr_code_data,
             'notes': self.notes,
             'createdAt': self.created_at.isoformat() if self.created_at else None,
-            'updatedAt': self.updated_at.isoformat() if self.updated_at else None,
-            # Datos relacionados
-            'user': self.user.to_dict() if self.user else None,
-            'event': self.event.to_dict() if self.event else None
+            'updatedAt': self.updated_at.isoformat() if self.updated_at else None
         }
+        if incluir_relaciones:
+            # Datos relacionados
+            data['user'] = self.user.to_dict() if self.user else None
+            data['event'] = self.event.to_dict() if self.event else None
+        return data
     
     def __repr__(self):
         return f'<Purchase {self.order_number}>'
@@ -144,6 +318,7 @@ class Ticket(db.Model):
     purchase_id = Column(Integer, ForeignKey('purchases.id'), nullable=False)
     ticket_number = Column(String(100), unique=True, nullable=False, index=True)
     qr_code_data = Column(Text, nullable=False)
+    qr_digest = Column(String(64), unique=True, nullable=True, index=True)  # sha256 de qr_code_data, para buscar QR por índice
     is_used = Column(Boolean, default=False)
     used_at = Column(DateTime, nullable=True)
     seat_info = Column(String(100), nullable=True)  # Para futuras implementaciones de asientos
@@ -170,6 +345,64 @@ class Ticket(db.Model):
         return f'<Ticket {self.ticket_number}>'
 
 
+class Reservation(db.Model):
+    """Modelo para reservas temporales de entradas (retención durante el checkout)"""
+    __tablename__ = 'reservations'
+    
+    id = Column(Integer, primary_key=True)
+    reservation_code = Column(String(100), unique=True, nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    event_id = Column(String(50), ForeignKey('events.id'), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    status = Column(String(50), default='active')  # active, converted, expired, cancelled
+    expires_at = Column(DateTime, nullable=False)
+    purchase_id = Column(Integer, ForeignKey('purchases.id'), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relaciones
+    user = relationship('User')
+    event = relationship('Event')
+    
+    __table_args__ = (
+        # El barrido de reservas vencidas filtra por estado y vencimiento
+        Index('ix_reservations_status_expires_at', 'status', 'expires_at'),
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'reservationCode': self.reservation_code,
+            'userId': self.user_id,
+            'eventId': self.event_id,
+            'quantity': self.quantity,
+            'status': self.status,
+            'expiresAt': self.expires_at.isoformat() if self.expires_at else None,
+            'purchaseId': self.purchase_id,
+            'createdAt': self.created_at.isoformat() if self.created_at else None,
+            'updatedAt': self.updated_at.isoformat() if self.updated_at else None
+        }
+    
+    def __repr__(self):
+        return f'<Reservation {self.reservation_code}>'
+
+
+class IdempotencyKey(db.Model):
+    """Modelo para respuestas guardadas por Idempotency-Key (reintentos de clientes)"""
+    __tablename__ = 'idempotency_keys'
+    
+    id = Column(Integer, primary_key=True)
+    key = Column(String(255), unique=True, nullable=False, index=True)
+    request_hash = Column(String(64), nullable=False)  # SHA-256 del cuerpo de la petición original
+    status_code = Column(Integer, nullable=False)
+    response_body = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f'<IdempotencyKey {self.key}>'
+
+
 class EmailLog(db.Model):
     """Modelo para logging de emails enviados"""
     __tablename__ = 'email_logs'
@@ -1,8 +1,21 @@
-from flask import Blueprint, request, jsonify
+import json
+import time
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
 from api.models import db, Event
+from api.utils.attendance import obtener_contadores
+from api.utils.inventory import activar_shards
+from api.utils.pagination import usa_cursor, paginar_por_cursor
+from api.utils.sales_rollup import incrementar_version_ventas, recategorizar_ventas
+from api.utils.waiting_room import obtener_sala
 
 events_bp = Blueprint('events', __name__)
 
+# Máximo de sub-contadores de inventario por evento
+MAX_INVENTORY_SHARDS = 64
+
+# Segundos sin cambios tras los que el stream de asistencia envía un comentario para mantener viva la conexión
+SSE_HEARTBEAT_SECONDS = 15
+
 @events_bp.route('/events', methods=['GET'])
 def list_events():
     """Listar todos los eventos disponibles"""
@@ -20,14 +33,29 @@ def list_events():
         if category:
             query = query.filter(Event.category.ilike(f'%{category}%'))
         
+        # Paginación por cursor (keyset) si se pide; por página (OFFSET) por defecto
+        if usa_cursor(request.args):
+            events, pagination = paginar_por_cursor(
+                query, Event, per_page,
+                cursor=request.args.get('cursor'),
+                incluir_total=request.args.get('include_total', 'false').lower() == 'true'
+            )
+            disponibles = Event.disponibles_por_evento(events)
+            return jsonify({
+                'success': True,
+                'events': [event.to_dict(disponibles.get(event.id)) for event in events],
+                'pagination': pagination
+            })
+        
         # Paginar resultados
         events = query.order_by(Event.created_at.desc()).paginate(
             page=page, per_page=per_page, error_out=False
         )
         
+        disponibles = Event.disponibles_por_evento(events.items)
         return jsonify({
             'success': True,
-            'events': [event.to_dict() for event in events.items],
+            'events': [event.to_dict(disponibles.get(event.id)) for event in events.items],
             'pagination': {
                 'page': page,
                 'pages': events.pages,
@@ -38,6 +66,8 @@ def list_events():
             }
         })
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'Error interno del servidor: {str(e)}'}), 500
 
@@ -45,18 +75,33 @@ def list_events():
 def get_event(event_id):
     """Obtener un evento específico"""
     try:
-        event = Event.query.get(event_id)
-        if not event:
+        event_dict = detalle_evento(event_id)
+        if not event_dict:
             return jsonify({'error': 'Evento no encontrado'}), 404
         
         return jsonify({
             'success': True,
-            'event': event.to_dict()
+            'event': event_dict
         })
         
     except Exception as e:
         return jsonify({'error': f'Error interno del servidor: {str(e)}'}), 500
 
+def detalle_evento(event_id):
+    """Detalle de un evento como diccionario, o None si no existe.
+    
+    Si el evento tiene sala de espera activa, el detalle se sirve desde un
+    caché en memoria de corta duración para no golpear la fila del evento.
+    """
+    def cargar():
+        event = Event.query.get(event_id)
+        return event.to_dict() if event else None
+    
+    sala = obtener_sala(event_id)
+    if sala:
+        return sala.evento_cacheado(cargar)
+    return cargar()
+
 @events_bp.route('/events', methods=['POST'])
 def create_event():
     """Crear un nuevo evento (solo admin)"""
@@ -114,7 +159,13 @@ def update_event(event_id):
         event = Event.query.get(event_id)
         if not event:
             return jsonify({'error': 'Evento no encontrado'}), 404
-        
+
+        # Con el inventario repartido, available_tickets es la suma de los sub-contadores
+        if 'available_tickets' in data and event.inventory_shards:
+            return jsonify({
+                'error': 'El inventario del evento está repartido en sub-contadores; consolídelo con PUT /events/<id>/inventory-shards antes de cambiar available_tickets'
+            }), 409
+
         # Actualizar campos permitidos
         updatable_fields = [
             'title', 'artist', 'date', 'time', 'venue', 'location', 
@@ -128,6 +179,13 @@ def update_event(event_id):
                 if hasattr(event, snake_case_field):
                     setattr(event, snake_case_field, data[field])
         
+        # Las ventas del resumen diario se agrupan por la categoría actual del evento
+        if 'category' in data:
+            recategorizar_ventas(event.id, event.category)
+        else:
+            # Los reportes de ventas muestran título, fecha y lugar del evento
+            incrementar_version_ventas()
+        
         db.session.commit()
         
         return jsonify({
@@ -140,6 +198,36 @@ def update_event(event_id):
         db.session.rollback()
         return jsonify({'error': f'Error interno del servidor: {str(e)}'}), 500
 
+@events_bp.route('/events/<string:event_id>/inventory-shards', methods=['PUT'])
+def update_event_inventory_shards(event_id):
+    """Repartir el inventario de un evento en sub-contadores (solo admin, antes de abrir la venta)"""
+    try:
+        data = request.get_json()
+        
+        if 'shards' not in data:
+            return jsonify({'error': 'Campo requerido: shards'}), 400
+        
+        shards = data['shards']
+        if not isinstance(shards, int) or isinstance(shards, bool) or not 0 <= shards <= MAX_INVENTORY_SHARDS:
+            return jsonify({'error': f'shards debe ser un entero entre 0 y {MAX_INVENTORY_SHARDS}'}), 400
+        
+        event = Event.query.get(event_id)
+        if not event:
+            return jsonify({'error': 'Evento no encontrado'}), 404
+        
+        activar_shards(event, shards)
+        db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'message': f'Inventario repartido en {event.inventory_shards} sub-contadores' if event.inventory_shards else 'Inventario consolidado en un único contador',
+            'event': event.to_dict()
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Error interno del servidor: {str(e)}'}), 500
+
 @events_bp.route('/events/<string:event_id>', methods=['DELETE'])
 def delete_event(event_id):
     """Eliminar un evento (solo admin)"""
@@ -156,6 +244,7 @@ def delete_event(event_id):
         }
         
         db.session.delete(event)
+        incrementar_version_ventas()
         db.session.commit()
         
         return jsonify({
@@ -166,4 +255,54 @@ def delete_event(event_id):
         
     except Exception as e:
         db.session.rollback()
-        return jsonify({'error': f'Error interno del servidor: {str(e)}'}), 500
\ No newline at end of file
+        return jsonify({'error': f'Error interno del servidor: {str(e)}'}), 500
+
+@events_bp.route('/events/<string:event_id>/attendance', methods=['GET'])
+def get_event_attendance(event_id):
+    """Contadores de asistencia en vivo de un evento (vendidas, admitidas, admisiones por minuto)"""
+    try:
+        if not Event.query.get(event_id):
+            return jsonify({'error': 'Evento no encontrado'}), 404
+        
+        return jsonify({
+            'success': True,
+            'attendance': obtener_contadores(event_id).to_dict()
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Error interno del servidor: {str(e)}'}), 500
+
+@events_bp.route('/events/<string:event_id>/attendance/stream', methods=['GET'])
+def stream_event_attendance(event_id):
+    """Stream Server-Sent Events con los contadores de asistencia; envía un mensaje solo cuando cambian"""
+    if not Event.query.get(event_id):
+        return jsonify({'error': 'Evento no encontrado'}), 404
+    
+    intervalo = current_app.config['ATTENDANCE_STREAM_INTERVAL']
+    
+    def generar():
+        ultimo = None
+        ultimo_envio = time.monotonic()
+        yield f"retry: {int(intervalo * 1000)}\n\n"
+        while True:
+            try:
+                datos = obtener_contadores(event_id).to_dict()
+            finally:
+                # Cerrar la transacción de lectura: una conexión abierta bloquearía escrituras en SQLite
+                db.session.rollback()
+            
+            if datos != ultimo:
+                yield f"event: attendance\ndata: {json.dumps(datos)}\n\n"
+                ultimo = datos
+                ultimo_envio = time.monotonic()
+            elif time.monotonic() - ultimo_envio >= SSE_HEARTBEAT_SECONDS:
+                yield ": ping\n\n"
+                ultimo_envio = time.monotonic()
+            time.sleep(intervalo)
+    
+    return Response(
+        stream_with_context(generar()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
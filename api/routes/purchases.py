@@ -1,7 +1,16 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, make_response
 from datetime import datetime
-from api.models import db, Purchase, User, Event, Ticket, EmailLog
-import uuid
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+from api.models import db, Purchase, User, Event, EmailLog
+from api.utils.inventory import reservar_entradas, liberar_entradas
+from api.utils.orders import crear_compra, resumen_tickets
+from api.utils.waiting_room import tomar_turno
+from api.utils.idempotency import MAX_LARGO_CLAVE, hash_peticion, buscar_respuesta, guardar_respuesta, respuesta_guardada
+from api.utils.pagination import usa_cursor, paginar_por_cursor
+from api.utils.attendance import ESTADOS_SIN_VENTA
+from api.utils.sales_rollup import registrar_venta_diaria
+from api.utils.ticket_pdf import datos_pdf, huella_pdf
 
 purchases_bp = Blueprint('purchases', __name__)
 
@@ -17,6 +26,32 @@ def create_purchase():
             if field not in data:
                 return jsonify({'error': f'Campo requerido: {field}'}), 400
         
+        # Reintentos con la misma Idempotency-Key devuelven la respuesta original
+        # sin volver a tocar el evento ni los tickets
+        pipeline = current_app.extensions.get('pipeline_compras')
+        idempotency_key = request.headers.get('Idempotency-Key')
+        request_hash = None
+        if idempotency_key:
+            if len(idempotency_key) > MAX_LARGO_CLAVE:
+                return jsonify({'error': f'Idempotency-Key no puede superar {MAX_LARGO_CLAVE} caracteres'}), 400
+            request_hash = hash_peticion(data)
+            registro = buscar_respuesta(idempotency_key)
+            if registro:
+                if registro.request_hash != request_hash:
+                    return jsonify({'error': 'Idempotency-Key ya fue usada con datos distintos'}), 422
+                return respuesta_guardada(registro)
+            orden = pipeline.orden_pendiente(idempotency_key) if pipeline else None
+            if orden:
+                if orden['request_hash'] != request_hash:
+                    return jsonify({'error': 'Idempotency-Key ya fue usada con datos distintos'}), 422
+                return jsonify(pipeline.respuesta_aceptada(orden)), 202
+        
+        # Con sala de espera activa, solo entran los turnos admitidos
+        rechazo = tomar_turno(data['eventId'], request.headers.get('X-Queue-Token'))
+        if rechazo:
+            mensaje, status = rechazo
+            return jsonify({'error': mensaje}), status
+        
         # Verificar que el usuario existe
         user = User.query.get(data['userId'])
         if not user:
@@ -27,60 +62,65 @@ def create_purchase():
         if not event:
             return jsonify({'error': 'Evento no encontrado'}), 404
         
-        # Verificar disponibilidad de entradas
-        if event.available_tickets < data['quantity']:
-            return jsonify({'error': 'No hay suficientes entradas disponibles'}), 400
-        
-        # Generar número de orden único
-        order_number = f"ORD-{datetime.now().strftime('%Y%m%d')}-{uuid.uuid4().hex[:8].upper()}"
-        
-        # Crear la compra con estado 'completed' (el pago ya fue procesado en el frontend)
-        purchase = Purchase(
-            order_number=order_number,
-            user_id=data['userId'],
-            event_id=data['eventId'],
-            quantity=data['quantity'],
+        quantity = data['quantity']
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+            return jsonify({'error': 'La cantidad debe ser un entero mayor a 0'}), 400
+        
+        # Modo diferido: aceptar contra el inventario en memoria y confirmar en lote
+        if pipeline:
+            orden, _ = pipeline.aceptar(
+                user, event, quantity,
+                unit_price=data['unitPrice'],
+                total_price=data['totalPrice'],
+                service_charge=data.get('serviceCharge', 0),
+                idempotency_key=idempotency_key,
+                request_hash=request_hash
+            )
+            if not orden:
+                return jsonify({'error': 'No hay suficientes entradas disponibles'}), 409
+            return jsonify(pipeline.respuesta_aceptada(orden)), 202
+        
+        # ⚠️ IMPORTANTE: Verificar disponibilidad y descontar en un solo UPDATE condicional.
+        # Si otra compra concurrente se llevó las últimas entradas, no se actualiza ninguna fila.
+        if not reservar_entradas(event, quantity):
+            db.session.rollback()
+            return jsonify({'error': 'No hay suficientes entradas disponibles'}), 409
+        db.session.refresh(event, ['available_tickets'])
+        
+        purchase, tickets = crear_compra(
+            user, event, quantity,
             unit_price=data['unitPrice'],
-            service_charge=data.get('serviceCharge', 0),
             total_price=data['totalPrice'],
-            status='completed',  # Estado completado porque el pago ya fue simulado
-            qr_code_data=f"ORD:{order_number}:USER:{user.email}:QTY:{data['quantity']}",
-            purchase_date=datetime.utcnow()  # Registrar fecha de compra
+            service_charge=data.get('serviceCharge', 0)
         )
         
-        db.session.add(purchase)
-        db.session.flush()  # Para obtener el ID de la compra
-        
-        # Crear tickets individuales
-        tickets = []
-        for i in range(data['quantity']):
-            ticket_number = f"{order_number}-T{i+1:03d}"
-            qr_data = f"TICKET:{ticket_number}:EVENT:{event.id}:USER:{user.email}"
-            
-            ticket = Ticket(
-                purchase_id=purchase.id,
-                ticket_number=ticket_number,
-                qr_code_data=qr_data
-            )
-            tickets.append(ticket)
-            db.session.add(ticket)
-        
-        # ⚠️ IMPORTANTE: Actualizar entradas disponibles del evento
-        # Descontar la cantidad comprada
-        event.available_tickets -= data['quantity']
-        
-        # Log para debugging
-        print(f"✅ Compra {order_number}: {data['quantity']} entradas descontadas del evento {event.id}")
-        print(f"   Entradas restantes: {event.available_tickets}/{event.total_tickets}")
-        
-        db.session.commit()
-        
-        return jsonify({
+        response_body = {
             'success': True,
             'message': 'Compra creada exitosamente',
             'purchase': purchase.to_dict(),
-            'tickets': [ticket.to_dict() for ticket in tickets]
-        }), 201
+            'tickets': resumen_tickets(tickets)
+        }
+        
+        # La clave se guarda en la misma transacción que la compra
+        if idempotency_key:
+            guardar_respuesta(idempotency_key, request_hash, response_body, 201)
+        
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Un reintento concurrente con la misma clave ganó la carrera:
+            # se descarta esta compra completa y se devuelve la respuesta ya guardada
+            db.session.rollback()
+            registro = buscar_respuesta(idempotency_key) if idempotency_key else None
+            if not registro:
+                raise
+            return respuesta_guardada(registro)
+        
+        # Log para debugging
+        print(f"✅ Compra {purchase.order_number}: {quantity} entradas descontadas del evento {event.id}")
+        print(f"   Entradas restantes: {event.entradas_disponibles}/{event.total_tickets}")
+        
+        return jsonify(response_body), 201
         
     except Exception as e:
         db.session.rollback()
@@ -90,7 +130,7 @@ def create_purchase():
 def get_purchase(purchase_id):
     """Obtener una compra específica"""
     try:
-        purchase = Purchase.query.get(purchase_id)
+        purchase = Purchase.query.options(*Purchase.opciones_carga()).get(purchase_id)
         if not purchase:
             return jsonify({'error': 'Compra no encontrada'}), 404
         
@@ -102,12 +142,45 @@ def get_purchase(purchase_id):
     except Exception as e:
         return jsonify({'error': f'Error interno del servidor: {str(e)}'}), 500
 
+@purchases_bp.route('/purchases/<int:purchase_id>/tickets.pdf', methods=['GET'])
+def get_purchase_tickets_pdf(purchase_id):
+    """PDF con las entradas de una compra (generado en el servidor y cacheado por número de orden)"""
+    try:
+        purchase = Purchase.query.options(*Purchase.opciones_carga()).get(purchase_id)
+        if not purchase:
+            return jsonify({'error': 'Compra no encontrada'}), 404
+        if purchase.status in ESTADOS_SIN_VENTA:
+            return jsonify({'error': f'La compra está {purchase.status}, sus entradas no son válidas'}), 409
+        
+        datos = datos_pdf(purchase)
+        huella = huella_pdf(datos)
+        if request.if_none_match.contains(huella):
+            response = make_response('', 304)
+        else:
+            response = make_response(current_app.extensions['pdf_tickets'].obtener(datos, huella))
+            response.headers['Content-Type'] = 'application/pdf'
+            response.headers['Content-Disposition'] = f'inline; filename=entradas_{purchase.order_number}.pdf'
+        response.set_etag(huella)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+        
+    except Exception as e:
+        return jsonify({'error': f'Error interno del servidor: {str(e)}'}), 500
+
 @purchases_bp.route('/purchases/order/<string:order_number>', methods=['GET'])
 def get_purchase_by_order(order_number):
     """Obtener una compra por número de orden"""
     try:
-        purchase = Purchase.query.filter_by(order_number=order_number).first()
+        purchase = Purchase.query.options(*Purchase.opciones_carga()).filter_by(order_number=order_number).first()
         if not purchase:
+            # En modo diferido la orden puede estar aceptada pero aún no confirmada
+            pipeline = current_app.extensions.get('pipeline_compras')
+            estado = pipeline.estado_orden(order_number) if pipeline else None
+            if estado:
+                status, error = estado
+                if status == 'queued':
+                    return jsonify({'success': True, 'orderNumber': order_number, 'status': 'queued'}), 202
+                return jsonify({'error': error, 'orderNumber': order_number, 'status': 'failed'}), 409
             return jsonify({'error': 'Compra no encontrada'}), 404
         
         return jsonify({
@@ -120,13 +193,34 @@ def get_purchase_by_order(order_number):
 
 @purchases_bp.route('/purchases/user/<int:user_id>', methods=['GET'])
 def get_user_purchases(user_id):
-    """Obtener todas las compras de un usuario"""
+    """Obtener todas las compras de un usuario
+    
+    Con ?shape=normalized cada compra lleva solo userId/eventId y el usuario
+    y los eventos aparecen una sola vez en los mapas 'users' y 'events'.
+    """
     try:
+        shape = request.args.get('shape', 'full')
+        if shape not in ['full', 'normalized']:
+            return jsonify({'error': "shape inválido. Valores permitidos: ['full', 'normalized']"}), 400
+        
         user = User.query.get(user_id)
         if not user:
             return jsonify({'error': 'Usuario no encontrado'}), 404
         
-        purchases = Purchase.query.filter_by(user_id=user_id).order_by(Purchase.created_at.desc()).all()
+        if shape == 'normalized':
+            purchases = Purchase.query.filter_by(user_id=user_id).order_by(Purchase.created_at.desc()).all()
+            event_ids = {purchase.event_id for purchase in purchases}
+            events = Event.query.options(selectinload(Event.shards)).filter(Event.id.in_(event_ids)).all() if event_ids else []
+            
+            return jsonify({
+                'success': True,
+                'shape': 'normalized',
+                'purchases': [purchase.to_dict(incluir_relaciones=False) for purchase in purchases],
+                'users': {str(user.id): user.to_dict()},
+                'events': {event.id: event.to_dict() for event in events}
+            })
+        
+        purchases = Purchase.query.options(*Purchase.opciones_carga()).filter_by(user_id=user_id).order_by(Purchase.created_at.desc()).all()
         
         return jsonify({
             'success': True,
@@ -163,21 +257,30 @@ def update_purchase_status(purchase_id):
         
         # Manejar cambios de estado que afectan disponibilidad de entradas
         # Si se cancela o reembolsa una compra que estaba completada/pendiente, devolver entradas
+        cambio_inventario = None
         if data['status'] in ['cancelled', 'refunded'] and old_status not in ['cancelled', 'refunded']:
-            event.available_tickets += purchase.quantity
-            print(f"✅ Compra {purchase.order_number} {data['status']}: {purchase.quantity} entradas devueltas al evento {event.id}")
-            print(f"   Entradas disponibles ahora: {event.available_tickets}/{event.total_tickets}")
+            liberar_entradas(event, purchase.quantity)
+            cambio_inventario = f"{data['status']}: {purchase.quantity} entradas devueltas al evento {event.id}"
         
         # Si se completa una compra que estaba cancelada, descontar las entradas nuevamente
         elif data['status'] == 'completed' and old_status in ['cancelled', 'refunded']:
-            if event.available_tickets < purchase.quantity:
-                return jsonify({'error': 'No hay suficientes entradas disponibles para reactivar esta compra'}), 400
-            event.available_tickets -= purchase.quantity
-            print(f"✅ Compra {purchase.order_number} reactivada: {purchase.quantity} entradas descontadas del evento {event.id}")
-            print(f"   Entradas disponibles ahora: {event.available_tickets}/{event.total_tickets}")
+            if not reservar_entradas(event, purchase.quantity):
+                db.session.rollback()
+                return jsonify({'error': 'No hay suficientes entradas disponibles para reactivar esta compra'}), 409
+            cambio_inventario = f"reactivada: {purchase.quantity} entradas descontadas del evento {event.id}"
+        
+        # Resumen diario de ventas y vendidas del evento: las compras canceladas o reembolsadas no cuentan
+        era_venta = old_status not in ESTADOS_SIN_VENTA
+        es_venta = purchase.status not in ESTADOS_SIN_VENTA
+        if era_venta != es_venta:
+            registrar_venta_diaria(purchase, event, 1 if es_venta else -1)
         
         db.session.commit()
         
+        if cambio_inventario:
+            print(f"✅ Compra {purchase.order_number} {cambio_inventario}")
+            print(f"   Entradas disponibles ahora: {event.entradas_disponibles}/{event.total_tickets}")
+        
         return jsonify({
             'success': True,
             'message': f'Estado actualizado de {old_status} a {data["status"]}',
@@ -237,8 +340,8 @@ def list_purchases():
         event_id = request.args.get('event_id')
         user_id = request.args.get('user_id')
         
-        # Construir consulta
-        query = Purchase.query
+        # Construir consulta (usuario y evento se cargan junto a cada página, sin N+1)
+        query = Purchase.query.options(*Purchase.opciones_carga())
         
         if status:
             query = query.filter(Purchase.status == status)
@@ -247,6 +350,19 @@ def list_purchases():
         if user_id:
             query = query.filter(Purchase.user_id == user_id)
         
+        # Paginación por cursor (keyset) si se pide; por página (OFFSET) por defecto
+        if usa_cursor(request.args):
+            purchases, pagination = paginar_por_cursor(
+                query, Purchase, per_page,
+                cursor=request.args.get('cursor'),
+                incluir_total=request.args.get('include_total', 'false').lower() == 'true'
+            )
+            return jsonify({
+                'success': True,
+                'purchases': [purchase.to_dict() for purchase in purchases],
+                'pagination': pagination
+            })
+        
         # Paginar resultados
         purchases = query.order_by(Purchase.created_at.desc()).paginate(
             page=page, per_page=per_page, error_out=False
@@ -265,5 +381,7 @@ def list_purchases():
             }
         })
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'Error interno del servidor: {str(e)}'}), 500
\ No newline at end of file
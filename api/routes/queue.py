@@ -0,0 +1,89 @@
+from flask import Blueprint, request, jsonify, current_app
+from api.models import Event
+from api.utils.waiting_room import abrir_sala, cerrar_sala, obtener_sala
+
+queue_bp = Blueprint('queue', __name__)
+
+def _token_de_peticion():
+    return request.headers.get('X-Queue-Token') or request.args.get('token')
+
+@queue_bp.route('/queue/<string:event_id>', methods=['PUT'])
+def open_waiting_room(event_id):
+    """Abrir la sala de espera de un evento (solo admin)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        rate = data.get('admissionRate', current_app.config['QUEUE_ADMISSION_RATE'])
+        if not isinstance(rate, (int, float)) or isinstance(rate, bool) or rate <= 0:
+            return jsonify({'error': 'admissionRate debe ser un número mayor a 0'}), 400
+        
+        event = Event.query.get(event_id)
+        if not event:
+            return jsonify({'error': 'Evento no encontrado'}), 404
+        
+        sala = abrir_sala(event.id, rate, current_app.config['QUEUE_EVENT_CACHE_TTL'])
+        
+        return jsonify({
+            'success': True,
+            'message': f'Sala de espera abierta: {rate} compras por segundo',
+            'queue': sala.to_dict()
+        })
+        
+    except Exception as e:
+        return jsonify({'error': f'Error interno del servidor: {str(e)}'}), 500
+
+@queue_bp.route('/queue/<string:event_id>', methods=['DELETE'])
+def close_waiting_room(event_id):
+    """Cerrar la sala de espera de un evento (solo admin)"""
+    sala = cerrar_sala(event_id)
+    if not sala:
+        return jsonify({'error': 'El evento no tiene sala de espera activa'}), 404
+    
+    return jsonify({
+        'success': True,
+        'message': 'Sala de espera cerrada',
+        'queue': sala.to_dict()
+    })
+
+@queue_bp.route('/queue/<string:event_id>', methods=['GET'])
+def get_waiting_room(event_id):
+    """Obtener el estado general de la sala de espera de un evento"""
+    sala = obtener_sala(event_id)
+    if not sala:
+        return jsonify({'error': 'El evento no tiene sala de espera activa'}), 404
+    
+    return jsonify({
+        'success': True,
+        'queue': sala.to_dict()
+    })
+
+@queue_bp.route('/queue/<string:event_id>/join', methods=['POST'])
+def join_waiting_room(event_id):
+    """Obtener un turno firmado en la sala de espera"""
+    sala = obtener_sala(event_id)
+    if not sala:
+        return jsonify({'error': 'El evento no tiene sala de espera activa'}), 404
+    
+    token, posicion = sala.unirse()
+    
+    return jsonify({
+        'success': True,
+        'token': token,
+        'status': sala.estado(posicion)
+    }), 201
+
+@queue_bp.route('/queue/<string:event_id>/status', methods=['GET'])
+def get_queue_position(event_id):
+    """Consultar la posición de un turno (se responde desde memoria, sin tocar la base de datos)"""
+    sala = obtener_sala(event_id)
+    if not sala:
+        return jsonify({'error': 'El evento no tiene sala de espera activa'}), 404
+    
+    posicion = sala.leer_turno(_token_de_peticion())
+    if posicion is None:
+        return jsonify({'error': 'Turno inválido'}), 403
+    
+    return jsonify({
+        'success': True,
+        'status': sala.estado(posicion)
+    })
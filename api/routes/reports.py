@@ -1,15 +1,18 @@
-from flask import Blueprint, request, jsonify, send_file, make_response
-from io import BytesIO
+import csv
+import json
+import tempfile
+from flask import Blueprint, Response, current_app, request, jsonify, send_file, make_response, stream_with_context
+from io import BytesIO, StringIO
 from datetime import datetime
-from api.models import db, Purchase, Event
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from api.models import db
+from api.utils.sales_report import (
+    COLUMNAS_DETALLE, filtros_ventas, grupos_compras, resumen_ventas, detalle_ventas, lotes_ventas, lotes_detalle_ventas
+)
+from api.utils.report_cache import clave_reporte
+from api.utils.report_jobs import FORMATOS_TRABAJO, filtros_trabajo
+from api.utils.sales_excel import escribir_excel_reporte
+from api.utils.sales_pdf import escribir_pdf_reporte
+from api.utils.sales_rollup import grupos_ventas, version_ventas
 
 reports_bp = Blueprint('reports', __name__)
 
@@ -22,89 +25,48 @@ def ventas_report():
         fecha_inicio = request.args.get('fecha_inicio')
         fecha_fin = request.args.get('fecha_fin')
         sector_id = request.args.get('sector_id')
-        formato = request.args.get('formato')  # 'json' | 'pdf' | 'excel'
-
-        # Construir consulta base: compras con estado diferente a 'cancelled' (por ejemplo)
-        query = Purchase.query
-
-        if evento_id:
-            query = query.filter(Purchase.event_id == str(evento_id))
-
-        if fecha_inicio:
-            try:
-                dt_inicio = datetime.fromisoformat(fecha_inicio)
-                query = query.filter(Purchase.purchase_date >= dt_inicio)
-            except Exception:
-                pass
-        if fecha_fin:
-            try:
-                dt_fin = datetime.fromisoformat(fecha_fin)
-                query = query.filter(Purchase.purchase_date <= dt_fin)
-            except Exception:
-                pass
-
-        purchases = query.order_by(Purchase.purchase_date.desc()).all()
-
-        # Agregar cálculos para el reporte
-        total_ventas = sum(p.total_price for p in purchases)
-        total_entradas = sum(p.quantity for p in purchases)
-        promedio_venta = (total_ventas / len(purchases)) if purchases else 0
-
-        # Análisis por sector (usamos Event.category)
-        analisis_por_sector = {}
-        analisis_por_evento = {}
-        datos_detallados = []
-
-        for p in purchases:
-            evento = p.event
-            sector = (evento.category or 'General') if evento else 'General'
-            if sector not in analisis_por_sector:
-                analisis_por_sector[sector] = {
-                    'entradas_vendidas': 0,
-                    'total_ventas': 0.0,
-                    'precio_promedio': 0.0
-                }
-
-            analisis_por_sector[sector]['entradas_vendidas'] += p.quantity
-            analisis_por_sector[sector]['total_ventas'] += p.total_price
-
-            # Evento
-            evento_nombre = evento.title if evento else f'Evento {p.event_id}'
-            if evento_nombre not in analisis_por_evento:
-                analisis_por_evento[evento_nombre] = {
-                    'total_ventas': 0.0,
-                    'total_entradas': 0
-                }
-            analisis_por_evento[evento_nombre]['total_ventas'] += p.total_price
-            analisis_por_evento[evento_nombre]['total_entradas'] += p.quantity
-
-            datos_detallados.append({
-                'id': p.id,
-                'fecha_venta': p.purchase_date.isoformat() if p.purchase_date else None,
-                'cantidad': p.quantity,
-                'precio_unitario': p.unit_price,
-                'total': p.total_price,
-                'cliente_nombre': p.user.name if p.user else 'Cliente',
-                'cliente_rut': getattr(p.user, 'rut', ''),
-                'metodo_pago': 'online',
-                'evento_nombre': evento.title if evento else '',
-                'fecha_evento': evento.date if evento else '',
-                'lugar': evento.venue if evento else '',
-                'sector_nombre': sector,
-            })
-
-        # Calcular precio_promedio por sector
-        for sector, data in analisis_por_sector.items():
-            entradas = data['entradas_vendidas']
-            data['precio_promedio'] = (data['total_ventas'] / entradas) if entradas else 0
-
-        resumen_ejecutivo = {
-            'total_ventas': total_ventas,
-            'total_entradas': total_entradas,
-            'promedio_venta': promedio_venta,
-            'sector_mas_vendido': max(analisis_por_sector.items(), key=lambda x: x[1]['entradas_vendidas'])[0] if analisis_por_sector else None,
-            'sector_mayor_ingreso': max(analisis_por_sector.items(), key=lambda x: x[1]['total_ventas'])[0] if analisis_por_sector else None
-        }
+        formato = request.args.get('formato')  # 'json' | 'pdf' | 'excel' | 'csv' | 'ndjson'
+
+        # CSV y NDJSON exportan solo las filas detalladas, transmitidas por lotes a medida que se leen
+        if formato == 'csv':
+            return generar_csv_reporte(filtros_ventas(evento_id, fecha_inicio, fecha_fin))
+        elif formato == 'ndjson':
+            return generar_ndjson_reporte(filtros_ventas(evento_id, fecha_inicio, fecha_fin))
+
+        # JSON, PDF y Excel pasan por la caché de reportes. La clave (que también es el ETag) combina
+        # los filtros normalizados y el formato con la versión de los datos de ventas, leída antes de
+        # generar: un reporte guardado puede incluir una compra posterior, pero nunca faltarle una
+        formato_reporte = formato if formato in FORMATOS_TRABAJO else 'json'
+        filtros = filtros_trabajo({**request.args.to_dict(), 'formato': formato_reporte})
+        if formato_reporte == 'pdf':
+            filtros['detalle'] = False
+        # El JSON repite los filtros tal como llegaron en filtros_aplicados
+        eco = (evento_id, fecha_inicio, fecha_fin, sector_id) if formato_reporte == 'json' else ()
+        clave = clave_reporte(filtros, version_ventas(), *eco)
+        if request.if_none_match.contains_weak(clave):
+            return _con_etag(Response(status=304), clave)
+
+        cache = current_app.extensions['cache_reportes']
+        entrada = cache.obtener(clave)
+        if entrada is not None:
+            cuerpo, mimetype, headers = entrada
+            return _con_etag(Response(cuerpo, mimetype=mimetype, headers=headers), clave)
+
+        # Las filas detalladas se piden con detalle=true (por defecto). El PDF solo usa los agregados
+        # y el Excel lee las filas por lotes mientras escribe su hoja de detalle
+        detalle = request.args.get('detalle', 'true').lower() == 'true'
+        incluir_detalle = detalle and formato not in ('pdf', 'excel')
+
+        # Totales y análisis por sector y evento agregados en la base. Sin filas detalladas
+        # se leen del resumen diario de ventas; con detalle, de purchases junto con las filas
+        condiciones = filtros_ventas(evento_id, fecha_inicio, fecha_fin)
+        if incluir_detalle:
+            grupos = grupos_compras(condiciones)
+            datos_detallados = detalle_ventas(condiciones)
+        else:
+            grupos = grupos_ventas(evento_id, fecha_inicio, fecha_fin)
+            datos_detallados = []
+        resumen_ejecutivo, analisis_por_sector, analisis_por_evento, cantidad_compras = resumen_ventas(grupos)
 
         response_json = {
             'success': True,
@@ -118,156 +80,134 @@ def ventas_report():
                 'fecha_fin': fecha_fin,
                 'sector_id': sector_id
             },
-            'total_registros': len(datos_detallados)
+            'total_registros': cantidad_compras
         }
 
         # Si piden un formato de archivo, devolvemos PDF o Excel real
         if formato == 'pdf':
-            return generar_pdf_reporte(response_json)
+            return _guardar_en_cache(cache, clave, generar_pdf_reporte(response_json))
         elif formato == 'excel':
-            return generar_excel_reporte(response_json)
+            return _guardar_en_cache(cache, clave, generar_excel_reporte(response_json, condiciones if detalle else None))
 
-        return jsonify(response_json)
+        return _guardar_en_cache(cache, clave, jsonify(response_json))
 
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@reports_bp.route('/reportes/jobs', methods=['POST'])
+def crear_trabajo_reporte():
+    """Encolar la generación de un reporte PDF o Excel con los mismos filtros que /reportes/ventas.
+
+    Los filtros se leen del cuerpo JSON o de la query string. Si ya hay un
+    trabajo en cola o en curso con los mismos filtros se retorna ese.
+    """
+    try:
+        datos = request.get_json(silent=True) or request.args.to_dict()
+        filtros = filtros_trabajo(datos)
+        if filtros['formato'] not in FORMATOS_TRABAJO:
+            return jsonify({'success': False, 'error': "El formato debe ser 'pdf' o 'excel'"}), 400
+
+        trabajo, nuevo = current_app.extensions['trabajos_reportes'].encolar(filtros)
+        return jsonify({
+            'success': True,
+            'message': 'Reporte encolado' if nuevo else 'Ya hay un reporte en curso con los mismos filtros',
+            'job': trabajo
+        }), 202
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@reports_bp.route('/reportes/jobs/<string:job_id>', methods=['GET'])
+def get_trabajo_reporte(job_id):
+    """Estado y avance de un trabajo de reporte"""
+    trabajo = current_app.extensions['trabajos_reportes'].obtener(job_id)
+    if not trabajo:
+        return jsonify({'success': False, 'error': 'Trabajo no encontrado'}), 404
+
+    return jsonify({'success': True, 'job': trabajo})
+
+
+@reports_bp.route('/reportes/jobs/<string:job_id>/archivo', methods=['GET'])
+def descargar_trabajo_reporte(job_id):
+    """Descargar el archivo de un trabajo de reporte terminado"""
+    cola = current_app.extensions['trabajos_reportes']
+    trabajo = cola.obtener(job_id)
+    if not trabajo:
+        return jsonify({'success': False, 'error': 'Trabajo no encontrado'}), 404
+    if trabajo['status'] != 'completed':
+        return jsonify({'success': False, 'error': f"El reporte no está listo (estado: {trabajo['status']})", 'job': trabajo}), 409
+
+    extension, mimetype = FORMATOS_TRABAJO[trabajo['filters']['formato']]
+    terminado = datetime.fromisoformat(trabajo['finishedAt'])
+    return send_file(
+        cola.ruta_archivo(trabajo),
+        mimetype=mimetype,
+        as_attachment=True,
+        download_name=f'reporte_ventas_{terminado.strftime("%Y%m%dT%H%M%SZ")}.{extension}'
+    )
+
+
+def _con_etag(response, clave):
+    # ETag débil: un PDF o Excel regenerado con la misma clave solo cambia en la fecha de generación
+    response.set_etag(clave, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _guardar_en_cache(cache, clave, resultado):
+    """Guardar en la caché de reportes una respuesta exitosa (si su tamaño lo permite) y agregarle el ETag"""
+    response = make_response(resultado)
+    if response.status_code != 200:
+        return response
+    if cache.admite(response.content_length):
+        response.direct_passthrough = False
+        headers = {'Content-Disposition': response.headers['Content-Disposition']} if 'Content-Disposition' in response.headers else {}
+        cache.guardar(clave, response.get_data(), response.mimetype, headers)
+    return _con_etag(response, clave)
+
+
+def _respuesta_streaming(generador, mimetype, extension):
+    filename = f'reporte_ventas_{datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")}.{extension}'
+    return Response(
+        stream_with_context(generador),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}', 'X-Accel-Buffering': 'no'}
+    )
+
+
+def generar_csv_reporte(condiciones):
+    """Exporta todas las ventas detalladas como CSV, sin armar el archivo completo en memoria"""
+    def generar():
+        buffer = StringIO()
+        escritor = csv.DictWriter(buffer, fieldnames=COLUMNAS_DETALLE)
+        escritor.writeheader()
+        yield buffer.getvalue()
+        for lote in lotes_detalle_ventas(condiciones):
+            buffer.seek(0)
+            buffer.truncate()
+            escritor.writerows(lote)
+            yield buffer.getvalue()
+
+    return _respuesta_streaming(generar(), 'text/csv', 'csv')
+
+
+def generar_ndjson_reporte(condiciones):
+    """Exporta todas las ventas detalladas como NDJSON (un objeto JSON por línea)"""
+    def generar():
+        for lote in lotes_detalle_ventas(condiciones):
+            yield ''.join(json.dumps(venta, ensure_ascii=False) + '\n' for venta in lote)
+
+    return _respuesta_streaming(generar(), 'application/x-ndjson', 'ndjson')
+
+
 def generar_pdf_reporte(data):
     """Genera un PDF profesional con los datos del reporte"""
     try:
         buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4, 
-                              rightMargin=72, leftMargin=72,
-                              topMargin=72, bottomMargin=18)
-        
-        # Container para los elementos del PDF
-        elements = []
-        
-        # Estilos
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#1e3a8a'),
-            spaceAfter=30,
-            alignment=TA_CENTER
-        )
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
-            fontSize=16,
-            textColor=colors.HexColor('#2563eb'),
-            spaceAfter=12,
-            spaceBefore=12
-        )
-        
-        # Título
-        elements.append(Paragraph("Reporte de Ventas", title_style))
-        elements.append(Paragraph(f"Generado: {datetime.now().strftime('%d/%m/%Y %H:%M')}", styles['Normal']))
-        elements.append(Spacer(1, 20))
-        
-        # Resumen Ejecutivo
-        elements.append(Paragraph("Resumen Ejecutivo", heading_style))
-        
-        resumen = data['resumen_ejecutivo']
-        resumen_data = [
-            ['Métrica', 'Valor'],
-            ['Total Ventas', f"${resumen['total_ventas']:,.0f} CLP"],
-            ['Total Entradas', f"{resumen['total_entradas']:,}"],
-            ['Promedio por Venta', f"${resumen['promedio_venta']:,.0f} CLP"],
-        ]
-        
-        if resumen.get('sector_mas_vendido'):
-            resumen_data.append(['Sector Más Vendido', resumen['sector_mas_vendido']])
-        if resumen.get('sector_mayor_ingreso'):
-            resumen_data.append(['Sector Mayor Ingreso', resumen['sector_mayor_ingreso']])
-        
-        resumen_table = Table(resumen_data, colWidths=[3*inch, 3*inch])
-        resumen_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2563eb')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 10),
-            ('TOPPADDING', (0, 1), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-        ]))
-        elements.append(resumen_table)
-        elements.append(Spacer(1, 20))
-        
-        # Análisis por Sector
-        if data['analisis_por_sector']:
-            elements.append(Paragraph("Análisis por Sector", heading_style))
-            
-            sector_data = [['Sector', 'Entradas', 'Ventas', 'Precio Prom.']]
-            for sector, analisis in data['analisis_por_sector'].items():
-                sector_data.append([
-                    sector,
-                    f"{analisis['entradas_vendidas']:,}",
-                    f"${analisis['total_ventas']:,.0f}",
-                    f"${analisis['precio_promedio']:,.0f}"
-                ])
-            
-            sector_table = Table(sector_data, colWidths=[2*inch, 1.5*inch, 1.5*inch, 1.5*inch])
-            sector_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2563eb')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 11),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 9),
-                ('TOPPADDING', (0, 1), (-1, -1), 6),
-                ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
-            ]))
-            elements.append(sector_table)
-            elements.append(Spacer(1, 20))
-        
-        # Análisis por Evento
-        if data['analisis_por_evento']:
-            elements.append(Paragraph("Análisis por Evento", heading_style))
-            
-            evento_data = [['Evento', 'Entradas', 'Ventas Totales']]
-            for evento, analisis in sorted(data['analisis_por_evento'].items(), 
-                                          key=lambda x: x[1]['total_ventas'], 
-                                          reverse=True):
-                evento_data.append([
-                    evento[:40] + '...' if len(evento) > 40 else evento,
-                    f"{analisis['total_entradas']:,}",
-                    f"${analisis['total_ventas']:,.0f}"
-                ])
-            
-            evento_table = Table(evento_data, colWidths=[3*inch, 1.5*inch, 2*inch])
-            evento_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2563eb')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('ALIGN', (1, 1), (2, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 11),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 9),
-                ('TOPPADDING', (0, 1), (-1, -1), 6),
-                ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
-            ]))
-            elements.append(evento_table)
-        
-        # Construir PDF
-        doc.build(elements)
+        escribir_pdf_reporte(data, buffer)
         buffer.seek(0)
         
         filename = f'reporte_ventas_{datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")}.pdf'
@@ -282,156 +222,27 @@ def generar_pdf_reporte(data):
         return jsonify({'success': False, 'error': f'Error generando PDF: {str(e)}'}), 500
 
 
-def generar_excel_reporte(data):
-    """Genera un archivo Excel profesional con los datos del reporte"""
+def generar_excel_reporte(data, condiciones=None):
+    """Genera un archivo Excel con el reporte; con `condiciones` incluye todas las ventas detalladas.
+
+    El libro se escribe en modo de solo escritura a un archivo temporal, que
+    se envía y se elimina al cerrar la respuesta.
+    """
     try:
-        buffer = BytesIO()
-        wb = openpyxl.Workbook()
-        
-        # Estilos
-        header_fill = PatternFill(start_color="2563eb", end_color="2563eb", fill_type="solid")
-        header_font = Font(color="FFFFFF", bold=True, size=12)
-        title_font = Font(bold=True, size=16, color="1e3a8a")
-        border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        
-        # Hoja 1: Resumen Ejecutivo
-        ws1 = wb.active
-        ws1.title = "Resumen Ejecutivo"
-        
-        # Título
-        ws1['A1'] = 'REPORTE DE VENTAS'
-        ws1['A1'].font = title_font
-        ws1.merge_cells('A1:B1')
-        
-        ws1['A2'] = f'Generado: {datetime.now().strftime("%d/%m/%Y %H:%M")}'
-        ws1.merge_cells('A2:B2')
-        
-        # Resumen
-        resumen = data['resumen_ejecutivo']
-        row = 4
-        ws1[f'A{row}'] = 'Métrica'
-        ws1[f'B{row}'] = 'Valor'
-        ws1[f'A{row}'].fill = header_fill
-        ws1[f'B{row}'].fill = header_fill
-        ws1[f'A{row}'].font = header_font
-        ws1[f'B{row}'].font = header_font
-        
-        row += 1
-        metricas = [
-            ('Total Ventas', f"${resumen['total_ventas']:,.0f} CLP"),
-            ('Total Entradas', f"{resumen['total_entradas']:,}"),
-            ('Promedio por Venta', f"${resumen['promedio_venta']:,.0f} CLP"),
-        ]
-        
-        if resumen.get('sector_mas_vendido'):
-            metricas.append(('Sector Más Vendido', resumen['sector_mas_vendido']))
-        if resumen.get('sector_mayor_ingreso'):
-            metricas.append(('Sector Mayor Ingreso', resumen['sector_mayor_ingreso']))
-        
-        for metrica, valor in metricas:
-            ws1[f'A{row}'] = metrica
-            ws1[f'B{row}'] = valor
-            ws1[f'A{row}'].border = border
-            ws1[f'B{row}'].border = border
-            row += 1
-        
-        # Ajustar ancho de columnas
-        ws1.column_dimensions['A'].width = 25
-        ws1.column_dimensions['B'].width = 30
-        
-        # Hoja 2: Análisis por Sector
-        if data['analisis_por_sector']:
-            ws2 = wb.create_sheet("Análisis por Sector")
-            ws2['A1'] = 'ANÁLISIS POR SECTOR'
-            ws2['A1'].font = title_font
-            ws2.merge_cells('A1:D1')
-            
-            # Headers
-            headers = ['Sector', 'Entradas Vendidas', 'Total Ventas', 'Precio Promedio']
-            for col, header in enumerate(headers, 1):
-                cell = ws2.cell(row=3, column=col)
-                cell.value = header
-                cell.fill = header_fill
-                cell.font = header_font
-                cell.border = border
-                cell.alignment = Alignment(horizontal='center')
-            
-            # Datos
-            row = 4
-            for sector, analisis in data['analisis_por_sector'].items():
-                ws2[f'A{row}'] = sector
-                ws2[f'B{row}'] = analisis['entradas_vendidas']
-                ws2[f'C{row}'] = f"${analisis['total_ventas']:,.0f}"
-                ws2[f'D{row}'] = f"${analisis['precio_promedio']:,.0f}"
-                
-                for col in ['A', 'B', 'C', 'D']:
-                    ws2[f'{col}{row}'].border = border
-                row += 1
-            
-            # Ajustar anchos
-            ws2.column_dimensions['A'].width = 20
-            ws2.column_dimensions['B'].width = 18
-            ws2.column_dimensions['C'].width = 18
-            ws2.column_dimensions['D'].width = 18
-        
-        # Hoja 3: Datos Detallados
-        if data['datos_detallados']:
-            ws3 = wb.create_sheet("Datos Detallados")
-            ws3['A1'] = 'VENTAS DETALLADAS'
-            ws3['A1'].font = title_font
-            ws3.merge_cells('A1:G1')
-            
-            # Headers
-            headers = ['Fecha Venta', 'Evento', 'Cliente', 'Sector', 'Cantidad', 'Precio Unit.', 'Total']
-            for col, header in enumerate(headers, 1):
-                cell = ws3.cell(row=3, column=col)
-                cell.value = header
-                cell.fill = header_fill
-                cell.font = header_font
-                cell.border = border
-                cell.alignment = Alignment(horizontal='center')
-            
-            # Datos
-            row = 4
-            for venta in data['datos_detallados'][:100]:  # Limitar a 100 registros
-                ws3[f'A{row}'] = datetime.fromisoformat(venta['fecha_venta']).strftime('%d/%m/%Y %H:%M') if venta['fecha_venta'] else 'N/A'
-                ws3[f'B{row}'] = venta['evento_nombre'][:30]
-                ws3[f'C{row}'] = venta['cliente_nombre']
-                ws3[f'D{row}'] = venta['sector_nombre']
-                ws3[f'E{row}'] = venta['cantidad']
-                ws3[f'F{row}'] = f"${venta['precio_unitario']:,.0f}"
-                ws3[f'G{row}'] = f"${venta['total']:,.0f}"
-                
-                for col in ['A', 'B', 'C', 'D', 'E', 'F', 'G']:
-                    ws3[f'{col}{row}'].border = border
-                row += 1
-            
-            # Ajustar anchos
-            ws3.column_dimensions['A'].width = 18
-            ws3.column_dimensions['B'].width = 25
-            ws3.column_dimensions['C'].width = 20
-            ws3.column_dimensions['D'].width = 15
-            ws3.column_dimensions['E'].width = 10
-            ws3.column_dimensions['F'].width = 15
-            ws3.column_dimensions['G'].width = 15
-        
-        # Guardar y enviar
-        wb.save(buffer)
-        buffer.seek(0)
+        archivo = tempfile.TemporaryFile()
+        escribir_excel_reporte(data, lotes_ventas(condiciones) if condiciones is not None else (), archivo)
+        tamano = archivo.tell()
+        archivo.seek(0)
         
         filename = f'reporte_ventas_{datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")}.xlsx'
-        return send_file(
-            buffer,
+        response = send_file(
+            archivo,
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
             as_attachment=True,
             download_name=filename
         )
+        response.content_length = tamano
+        return response
         
     except Exception as e:
         return jsonify({'success': False, 'error': f'Error generando Excel: {str(e)}'}), 500
-
@@ -0,0 +1,174 @@
+from flask import Blueprint, request, jsonify, current_app
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from api.models import db, Reservation, User, Event
+from api.utils.inventory import reservar_entradas, liberar_entradas
+from api.utils.orders import crear_compra, resumen_tickets
+from api.utils.waiting_room import tomar_turno
+import uuid
+
+reservations_bp = Blueprint('reservations', __name__)
+
+@reservations_bp.route('/reservations', methods=['POST'])
+def create_reservation():
+    """Retener entradas de un evento por un tiempo limitado"""
+    try:
+        data = request.get_json()
+
+        # Validar datos requeridos
+        required_fields = ['userId', 'eventId', 'quantity']
+        for field in required_fields:
+            if field not in data:
+                return jsonify({'error': f'Campo requerido: {field}'}), 400
+
+        quantity = data['quantity']
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+            return jsonify({'error': 'La cantidad debe ser un entero mayor a 0'}), 400
+
+        # Duración de la retención (acotada por la configuración)
+        ttl = data.get('ttlSeconds', current_app.config['RESERVATION_TTL_SECONDS'])
+        if not isinstance(ttl, int) or isinstance(ttl, bool) or ttl < 1:
+            return jsonify({'error': 'ttlSeconds debe ser un entero mayor a 0'}), 400
+        ttl = min(ttl, current_app.config['RESERVATION_MAX_TTL_SECONDS'])
+
+        # Con sala de espera activa, solo entran los turnos admitidos
+        rechazo = tomar_turno(data['eventId'], request.headers.get('X-Queue-Token'))
+        if rechazo:
+            mensaje, status = rechazo
+            return jsonify({'error': mensaje}), status
+
+        user = User.query.get(data['userId'])
+        if not user:
+            return jsonify({'error': 'Usuario no encontrado'}), 404
+
+        event = Event.query.get(data['eventId'])
+        if not event:
+            return jsonify({'error': 'Evento no encontrado'}), 404
+
+        # Las entradas retenidas se descuentan del inventario desde ya
+        if not reservar_entradas(event, quantity):
+            db.session.rollback()
+            return jsonify({'error': 'No hay suficientes entradas disponibles'}), 409
+
+        reservation = Reservation(
+            reservation_code=f"RES-{uuid.uuid4().hex[:12].upper()}",
+            user_id=user.id,
+            event_id=event.id,
+            quantity=quantity,
+            status='active',
+            expires_at=datetime.utcnow() + timedelta(seconds=ttl)
+        )
+
+        db.session.add(reservation)
+        db.session.commit()
+
+        return jsonify({
+            'success': True,
+            'message': 'Entradas reservadas exitosamente',
+            'reservation': reservation.to_dict()
+        }), 201
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Error interno del servidor: {str(e)}'}), 500
+
+@reservations_bp.route('/reservations/<string:reservation_code>', methods=['GET'])
+def get_reservation(reservation_code):
+    """Obtener una reserva por su código"""
+    try:
+        reservation = Reservation.query.filter_by(reservation_code=reservation_code).first()
+        if not reservation:
+            return jsonify({'error': 'Reserva no encontrada'}), 404
+
+        return jsonify({
+            'success': True,
+            'reservation': reservation.to_dict()
+        })
+
+    except Exception as e:
+        return jsonify({'error': f'Error interno del servidor: {str(e)}'}), 500
+
+@reservations_bp.route('/reservations/<string:reservation_code>/confirm', methods=['POST'])
+def confirm_reservation(reservation_code):
+    """Convertir una reserva vigente en una compra"""
+    try:
+        data = request.get_json()
+
+        required_fields = ['unitPrice', 'totalPrice']
+        for field in required_fields:
+            if field not in data:
+                return jsonify({'error': f'Campo requerido: {field}'}), 400
+
+        reservation = Reservation.query.filter_by(reservation_code=reservation_code).first()
+        if not reservation:
+            return jsonify({'error': 'Reserva no encontrada'}), 404
+
+        # Tomar la reserva solo si sigue activa y vigente: evita convertirla dos veces
+        # o convertir una que el barrido ya está liberando
+        ahora = datetime.utcnow()
+        result = db.session.execute(
+            update(Reservation)
+            .where(
+                Reservation.id == reservation.id,
+                Reservation.status == 'active',
+                Reservation.expires_at > ahora
+            )
+            .values(status='converted', updated_at=ahora)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            db.session.rollback()
+            return jsonify({'error': 'La reserva expiró o ya no está activa'}), 409
+
+        purchase, tickets = crear_compra(
+            reservation.user, reservation.event, reservation.quantity,
+            unit_price=data['unitPrice'],
+            total_price=data['totalPrice'],
+            service_charge=data.get('serviceCharge', 0)
+        )
+        reservation.purchase_id = purchase.id
+
+        db.session.commit()
+
+        return jsonify({
+            'success': True,
+            'message': 'Reserva confirmada exitosamente',
+            'reservation': reservation.to_dict(),
+            'purchase': purchase.to_dict(),
+            'tickets': resumen_tickets(tickets)
+        }), 201
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Error interno del servidor: {str(e)}'}), 500
+
+@reservations_bp.route('/reservations/<string:reservation_code>', methods=['DELETE'])
+def cancel_reservation(reservation_code):
+    """Cancelar una reserva activa y devolver sus entradas"""
+    try:
+        reservation = Reservation.query.filter_by(reservation_code=reservation_code).first()
+        if not reservation:
+            return jsonify({'error': 'Reserva no encontrada'}), 404
+
+        result = db.session.execute(
+            update(Reservation)
+            .where(Reservation.id == reservation.id, Reservation.status == 'active')
+            .values(status='cancelled', updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            db.session.rollback()
+            return jsonify({'error': 'La reserva ya no está activa'}), 409
+
+        liberar_entradas(reservation.event, reservation.quantity)
+        db.session.commit()
+
+        return jsonify({
+            'success': True,
+            'message': 'Reserva cancelada exitosamente',
+            'reservation': reservation.to_dict()
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Error interno del servidor: {str(e)}'}), 500
@@ -1,61 +1,313 @@
-from flask import Blueprint, request, jsonify
-from api.models import db, Ticket, Purchase
+from flask import Blueprint, request, jsonify, current_app, make_response
+from api.models import db, Ticket, Purchase, Event
+from api.utils.qr import digest_qr, es_qr_firmado, verificar_qr
+from api.utils.qr_images import clave_qr, iniciar_prerender, obtener_trabajo
+from api.utils.ticket_ids import normalizar_ticket_number
+from api.utils.attendance import registrar_admisiones
+from api.utils.validation import (
+    MAX_TICKETS_POR_VALIDACION, MAX_ESCANEOS_POR_SINCRONIZACION, BYTES_DIGEST_MANIFIESTO,
+    validar_tickets, generar_manifiesto, sincronizar_escaneos, leer_momento_escaneo
+)
 
 tickets_bp = Blueprint('tickets', __name__)
 
+def _en_caliente():
+    return current_app.extensions['validacion_en_caliente']
+
+def _ticket_dict(ticket):
+    """to_dict() del ticket, con is_used según el índice en memoria si su evento está en modo día de evento"""
+    data = ticket.to_dict()
+    usado = _en_caliente().usado(ticket.ticket_number)
+    if usado is not None:
+        data['isUsed'] = usado
+    return data
+
 @tickets_bp.route('/tickets/<string:ticket_number>', methods=['GET'])
 def get_ticket(ticket_number):
     """Obtener información de un ticket específico"""
     try:
-        ticket = Ticket.query.filter_by(ticket_number=ticket_number).first()
+        ticket_number = normalizar_ticket_number(ticket_number)
+        ticket = Ticket.query.filter_by(ticket_number=ticket_number).first() if ticket_number else None
         if not ticket:
             return jsonify({'error': 'Ticket no encontrado'}), 404
         
         return jsonify({
             'success': True,
-            'ticket': ticket.to_dict()
+            'ticket': _ticket_dict(ticket)
         })
         
     except Exception as e:
         return jsonify({'error': f'Error interno del servidor: {str(e)}'}), 500
 
+@tickets_bp.route('/tickets/<string:ticket_number>/qr.png', methods=['GET'])
+def get_ticket_qr_image(ticket_number):
+    """Imagen PNG del código QR de un ticket (desde la caché en disco)"""
+    try:
+        ticket_number = normalizar_ticket_number(ticket_number)
+        qr_data = db.session.query(Ticket.qr_code_data).filter_by(ticket_number=ticket_number).scalar() if ticket_number else None
+        if not qr_data:
+            return jsonify({'error': 'Ticket no encontrado'}), 404
+        
+        # La clave depende solo del contenido del QR: si el cliente ya tiene la imagen, no se reenvía
+        clave = clave_qr(qr_data)
+        if request.if_none_match.contains(clave):
+            response = make_response('', 304)
+        else:
+            response = make_response(current_app.extensions['cache_qr'].obtener(qr_data))
+            response.headers['Content-Type'] = 'image/png'
+        response.set_etag(clave)
+        response.headers['Cache-Control'] = 'private, max-age=86400'
+        return response
+        
+    except Exception as e:
+        return jsonify({'error': f'Error interno del servidor: {str(e)}'}), 500
+
 @tickets_bp.route('/tickets/<string:ticket_number>/validate', methods=['POST'])
 def validate_ticket(ticket_number):
     """Validar y marcar un ticket como usado"""
     try:
+        from datetime import datetime
+        ahora = datetime.utcnow()
+        
+        # Número compacto con dígito de control inválido: error de tipeo o ticket falso, sin consultar la base
+        ticket_number = normalizar_ticket_number(ticket_number)
+        if not ticket_number:
+            return jsonify({'error': 'Ticket no encontrado'}), 404
+        
+        # Evento en modo día de evento: responder desde el índice en memoria, sin consultar la base
+        admitido = _en_caliente().marcar(ticket_number)
+        if admitido is not None:
+            if not admitido:
+                return jsonify({'error': 'Ticket ya ha sido utilizado', 'used_at': None}), 400
+            return jsonify({
+                'success': True,
+                'message': 'Ticket validado exitosamente',
+                'ticket': {'ticketNumber': ticket_number, 'isUsed': True, 'usedAt': ahora.isoformat()}
+            })
+        
+        # Marcar como usado solo si aún no lo está: dos puertas no pueden admitir el mismo ticket
+        admitido = Ticket.query.filter_by(ticket_number=ticket_number, is_used=False).update(
+            {'is_used': True, 'used_at': ahora, 'updated_at': ahora},
+            synchronize_session=False
+        )
+        
         ticket = Ticket.query.filter_by(ticket_number=ticket_number).first()
         if not ticket:
+            db.session.rollback()
             return jsonify({'error': 'Ticket no encontrado'}), 404
         
-        if ticket.is_used:
+        if admitido:
+            registrar_admisiones(ticket.purchase.event_id, 1, ahora)
+        db.session.commit()
+        
+        if not admitido:
             return jsonify({
                 'error': 'Ticket ya ha sido utilizado',
                 'used_at': ticket.used_at.isoformat() if ticket.used_at else None
             }), 400
         
-        # Marcar ticket como usado
-        from datetime import datetime
-        ticket.is_used = True
-        ticket.used_at = datetime.utcnow()
-        ticket.updated_at = datetime.utcnow()
+        return jsonify({
+            'success': True,
+            'message': 'Ticket validado exitosamente',
+            'ticket': ticket.to_dict()
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Error interno del servidor: {str(e)}'}), 500
+
+@tickets_bp.route('/tickets/validate', methods=['POST'])
+def validate_tickets_batch():
+    """Validar en lote los tickets escaneados en una puerta"""
+    try:
+        data = request.get_json(silent=True) or {}
+        ticket_numbers = data.get('ticketNumbers')
         
+        if not isinstance(ticket_numbers, list) or not ticket_numbers:
+            return jsonify({'error': 'Campo requerido: ticketNumbers (lista no vacía)'}), 400
+        if not all(isinstance(n, str) and n for n in ticket_numbers):
+            return jsonify({'error': 'ticketNumbers debe contener números de ticket'}), 400
+        if len(ticket_numbers) > MAX_TICKETS_POR_VALIDACION:
+            return jsonify({'error': f'Máximo {MAX_TICKETS_POR_VALIDACION} tickets por petición'}), 400
+        
+        # Los números compactos con dígito de control inválido quedan tal cual y resultan 'unknown'
+        ticket_numbers = [normalizar_ticket_number(n) or n for n in ticket_numbers]
+        resultados = validar_tickets(ticket_numbers, _en_caliente())
         db.session.commit()
         
+        resumen = {'admitted': 0, 'already_used': 0, 'unknown': 0}
+        for resultado in resultados:
+            resumen[resultado['status']] += 1
+        
         return jsonify({
             'success': True,
-            'message': 'Ticket validado exitosamente',
-            'ticket': ticket.to_dict()
+            'results': resultados,
+            'summary': resumen
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Error interno del servidor: {str(e)}'}), 500
+
+@tickets_bp.route('/tickets/event/<string:event_id>/manifest', methods=['GET'])
+def get_gate_manifest(event_id):
+    """Manifiesto binario de tickets válidos de un evento para puertas sin conexión"""
+    try:
+        if not Event.query.get(event_id):
+            return jsonify({'error': 'Evento no encontrado'}), 404
+        
+        contenido, version, cantidad = generar_manifiesto(event_id)
+        
+        # La versión es el hash del contenido: si la puerta ya la tiene, no se reenvía
+        if request.if_none_match.contains(version):
+            response = make_response('', 304)
+        else:
+            response = make_response(contenido)
+            response.headers['Content-Type'] = 'application/octet-stream'
+        response.set_etag(version)
+        response.headers['X-Manifest-Version'] = version
+        response.headers['X-Manifest-Count'] = str(cantidad)
+        response.headers['X-Manifest-Digest-Bytes'] = str(BYTES_DIGEST_MANIFIESTO)
+        return response
+        
+    except Exception as e:
+        return jsonify({'error': f'Error interno del servidor: {str(e)}'}), 500
+
+@tickets_bp.route('/tickets/event/<string:event_id>/scans', methods=['POST'])
+def sync_gate_scans(event_id):
+    """Sincronizar escaneos registrados sin conexión por una puerta"""
+    try:
+        if not Event.query.get(event_id):
+            return jsonify({'error': 'Evento no encontrado'}), 404
+        
+        data = request.get_json(silent=True) or {}
+        escaneos = data.get('scans')
+        if not isinstance(escaneos, list) or not escaneos:
+            return jsonify({'error': 'Campo requerido: scans (lista no vacía)'}), 400
+        if len(escaneos) > MAX_ESCANEOS_POR_SINCRONIZACION:
+            return jsonify({'error': f'Máximo {MAX_ESCANEOS_POR_SINCRONIZACION} escaneos por petición'}), 400
+        
+        normalizados = []
+        for escaneo in escaneos:
+            if not isinstance(escaneo, dict) or not (escaneo.get('ticketNumber') or escaneo.get('qrCode')):
+                return jsonify({'error': 'Cada escaneo requiere ticketNumber o qrCode'}), 400
+            try:
+                scanned_at = leer_momento_escaneo(escaneo.get('scannedAt') or '')
+            except (TypeError, ValueError):
+                return jsonify({'error': 'Cada escaneo requiere scannedAt en formato ISO 8601'}), 400
+            normalizados.append({
+                'ticketNumber': normalizar_ticket_number(escaneo['ticketNumber']) or escaneo['ticketNumber'] if escaneo.get('ticketNumber') else None,
+                'qrCode': escaneo.get('qrCode'),
+                'gateId': escaneo.get('gateId'),
+                'scannedAt': scanned_at
+            })
+        
+        resultados = sincronizar_escaneos(event_id, normalizados)
+        db.session.commit()
+        
+        # Reflejar en el índice en memoria los escaneos ya registrados en la base
+        for resultado in resultados:
+            if resultado['status'] == 'accepted':
+                _en_caliente().marcar(resultado['ticketNumber'], escribir=False)
+        
+        resumen = {'accepted': 0, 'duplicate': 0, 'invalid': 0, 'unknown': 0}
+        for resultado in resultados:
+            resumen[resultado['status']] += 1
+        
+        return jsonify({
+            'success': True,
+            'results': resultados,
+            'summary': resumen
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Error interno del servidor: {str(e)}'}), 500
+
+@tickets_bp.route('/tickets/event/<string:event_id>/hot', methods=['PUT'])
+def enable_hot_validation(event_id):
+    """Activar el modo día de evento: precargar los tickets del evento en memoria (solo admin)"""
+    try:
+        if not Event.query.get(event_id):
+            return jsonify({'error': 'Evento no encontrado'}), 404
+        
+        indice = _en_caliente().activar(event_id)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Modo día de evento activado',
+            'hotValidation': indice.to_dict()
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Error interno del servidor: {str(e)}'}), 500
+
+@tickets_bp.route('/tickets/event/<string:event_id>/hot', methods=['DELETE'])
+def disable_hot_validation(event_id):
+    """Desactivar el modo día de evento, escribiendo en la base todas las admisiones (solo admin)"""
+    try:
+        estado = _en_caliente().desactivar(event_id)
+        if not estado:
+            return jsonify({'error': 'El evento no está en modo día de evento'}), 404
+        
+        return jsonify({
+            'success': True,
+            'message': 'Modo día de evento desactivado',
+            'hotValidation': estado
         })
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Error interno del servidor: {str(e)}'}), 500
 
+@tickets_bp.route('/tickets/event/<string:event_id>/hot', methods=['GET'])
+def get_hot_validation(event_id):
+    """Estado del modo día de evento de un evento"""
+    estado = _en_caliente().estado(event_id)
+    if not estado:
+        return jsonify({'error': 'El evento no está en modo día de evento'}), 404
+    
+    return jsonify({
+        'success': True,
+        'hotValidation': estado
+    })
+
+@tickets_bp.route('/tickets/event/<string:event_id>/qr-prerender', methods=['POST'])
+def prerender_event_qr_images(event_id):
+    """Renderizar en segundo plano las imágenes QR de todos los tickets de un evento (solo admin)"""
+    try:
+        if not Event.query.get(event_id):
+            return jsonify({'error': 'Evento no encontrado'}), 404
+        
+        trabajo = iniciar_prerender(current_app._get_current_object(), event_id)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Pre-render de imágenes QR iniciado',
+            'job': trabajo
+        }), 202
+        
+    except Exception as e:
+        return jsonify({'error': f'Error interno del servidor: {str(e)}'}), 500
+
+@tickets_bp.route('/tickets/qr-prerender/<string:job_id>', methods=['GET'])
+def get_qr_prerender_job(job_id):
+    """Estado de un pre-render de imágenes QR"""
+    trabajo = obtener_trabajo(current_app, job_id)
+    if not trabajo:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    
+    return jsonify({
+        'success': True,
+        'job': trabajo
+    })
+
 @tickets_bp.route('/tickets/purchase/<int:purchase_id>', methods=['GET'])
 def get_purchase_tickets(purchase_id):
     """Obtener todos los tickets de una compra"""
     try:
-        purchase = Purchase.query.get(purchase_id)
+        purchase = Purchase.query.options(*Purchase.opciones_carga()).get(purchase_id)
         if not purchase:
             return jsonify({'error': 'Compra no encontrada'}), 404
         
@@ -63,7 +315,7 @@ def get_purchase_tickets(purchase_id):
         
         return jsonify({
             'success': True,
-            'tickets': [ticket.to_dict() for ticket in tickets],
+            'tickets': [_ticket_dict(ticket) for ticket in tickets],
             'purchase': purchase.to_dict()
         })
         
@@ -74,15 +326,28 @@ def get_purchase_tickets(purchase_id):
 def validate_qr_code(qr_data):
     """Validar un código QR y obtener información del ticket"""
     try:
-        ticket = Ticket.query.filter_by(qr_code_data=qr_data).first()
+        if es_qr_firmado(qr_data):
+            # La firma se verifica en CPU: un QR falsificado nunca llega a la base de datos
+            verificado = verificar_qr(qr_data, current_app.config['QR_SIGNING_KEY'])
+            if not verificado:
+                return jsonify({'error': 'Código QR inválido'}), 404
+            ticket_number, _ = verificado
+            ticket = Ticket.query.filter_by(ticket_number=ticket_number).first()
+        elif current_app.config['QR_ALLOW_UNSIGNED']:
+            # QR sin firma de tickets anteriores: buscar por el digest indexado
+            ticket = Ticket.query.filter_by(qr_digest=digest_qr(qr_data)).first()
+        else:
+            ticket = None
+        
         if not ticket:
             return jsonify({'error': 'Código QR inválido'}), 404
         
+        ticket_dict = _ticket_dict(ticket)
         return jsonify({
             'success': True,
-            'ticket': ticket.to_dict(),
-            'valid': not ticket.is_used,
-            'message': 'Código QR válido' if not ticket.is_used else 'Ticket ya utilizado'
+            'ticket': ticket_dict,
+            'valid': not ticket_dict['isUsed'],
+            'message': 'Código QR válido' if not ticket_dict['isUsed'] else 'Ticket ya utilizado'
         })
         
     except Exception as e:
@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
 from api.models import db, User
+from api.utils.pagination import usa_cursor, paginar_por_cursor
 
 users_bp = Blueprint('users', __name__)
 
@@ -80,6 +81,19 @@ def list_users():
         page = request.args.get('page', 1, type=int)
         per_page = min(request.args.get('per_page', 50, type=int), 100)
         
+        # Paginación por cursor (keyset) si se pide; por página (OFFSET) por defecto
+        if usa_cursor(request.args):
+            users, pagination = paginar_por_cursor(
+                User.query, User, per_page,
+                cursor=request.args.get('cursor'),
+                incluir_total=request.args.get('include_total', 'false').lower() == 'true'
+            )
+            return jsonify({
+                'success': True,
+                'users': [user.to_dict() for user in users],
+                'pagination': pagination
+            })
+        
         users = User.query.order_by(User.created_at.desc()).paginate(
             page=page, per_page=per_page, error_out=False
         )
@@ -97,5 +111,7 @@ def list_users():
             }
         })
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'Error interno del servidor: {str(e)}'}), 500
\ No newline at end of file
@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta
+from sqlalchemy import case, func, select, update
+from sqlalchemy.exc import IntegrityError
+from api.models import db, EventAttendance, Purchase, SalesChange, Ticket
+
+# Estados de compra cuyas entradas no cuentan como vendidas (su inventario fue devuelto)
+ESTADOS_SIN_VENTA = ('cancelled', 'refunded')
+
+
+def registrar_venta(event_id, cantidad):
+    """Sumar (o restar, con cantidad negativa) entradas vendidas al contador del evento.
+
+    La llama aplicar_cambios_ventas en segundo plano con las ventas ya
+    confirmadas, no la transacción de cada compra: así las compras de un
+    mismo evento no esperan por la fila del contador. No hace commit.
+    """
+    def actualizar():
+        return db.session.execute(
+            update(EventAttendance)
+            .where(EventAttendance.event_id == event_id)
+            .values(tickets_sold=EventAttendance.tickets_sold + cantidad, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+    if not actualizar() and _crear_contadores(event_id) is None:
+        actualizar()
+
+
+def registrar_admisiones(event_id, cantidad, momento=None):
+    """Sumar admisiones al contador del evento y a su ventana del minuto actual.
+
+    Un único UPDATE rota la ventana por minuto: si el minuto registrado es el
+    actual se suma a él; si es el anterior, pasa a ser el minuto previo; si es
+    más antiguo, ambas ventanas se reinician. No hace commit.
+    """
+    if cantidad <= 0:
+        return
+    ahora = momento or datetime.utcnow()
+    minuto = ahora.replace(second=0, microsecond=0)
+    minuto_anterior = minuto - timedelta(minutes=1)
+
+    def actualizar():
+        # ordered_values: MySQL evalúa las asignaciones en orden, el resto usa los valores previos
+        return db.session.execute(
+            update(EventAttendance)
+            .where(EventAttendance.event_id == event_id)
+            .ordered_values(
+                (EventAttendance.tickets_admitted, EventAttendance.tickets_admitted + cantidad),
+                (EventAttendance.admissions_previous_minute, case(
+                    (EventAttendance.minute_start == minuto, EventAttendance.admissions_previous_minute),
+                    (EventAttendance.minute_start == minuto_anterior, EventAttendance.admissions_current_minute),
+                    else_=0
+                )),
+                (EventAttendance.admissions_current_minute, case(
+                    (EventAttendance.minute_start == minuto, EventAttendance.admissions_current_minute + cantidad),
+                    else_=cantidad
+                )),
+                (EventAttendance.minute_start, minuto),
+                (EventAttendance.updated_at, ahora)
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+    if not actualizar() and _crear_contadores(event_id, admisiones_minuto=cantidad, momento=ahora) is None:
+        actualizar()
+
+
+def obtener_contadores(event_id):
+    """Contadores de asistencia de un evento (una lectura por clave primaria)"""
+    contadores = db.session.get(EventAttendance, event_id)
+    if contadores is None:
+        contadores = _crear_contadores(event_id)
+        db.session.commit()
+        if contadores is None:
+            # Otra transacción creó la fila primero: leerla en una transacción nueva
+            contadores = db.session.get(EventAttendance, event_id)
+    return contadores
+
+
+def _crear_contadores(event_id, admisiones_minuto=0, momento=None):
+    """Crear la fila de contadores de un evento contando su estado actual (solo la primera vez).
+
+    El conteo se hace dentro de la transacción en curso, por lo que ya incluye
+    la admisión que originó la llamada. Las ventas se cuentan desde purchases
+    menos los cambios de sales_changes aún no aplicados (aplicar_cambios_ventas
+    los sumará después), en una sola consulta para leer ambos en el mismo
+    instante. La fila se inserta en un savepoint: retorna None si otra
+    transacción la creó primero, y quien llama debe repetir su UPDATE.
+    """
+    vendidas = db.session.execute(select(
+        select(func.coalesce(func.sum(Purchase.quantity), 0))
+        .where(Purchase.event_id == event_id, Purchase.status.notin_(ESTADOS_SIN_VENTA))
+        .scalar_subquery()
+        - select(func.coalesce(func.sum(SalesChange.tickets), 0))
+        .where(SalesChange.event_id == event_id)
+        .scalar_subquery()
+    )).scalar()
+    admitidas = db.session.execute(
+        select(func.count(Ticket.id))
+        .join(Purchase, Ticket.purchase_id == Purchase.id)
+        .where(Purchase.event_id == event_id, Ticket.is_used == True)
+    ).scalar()
+
+    ahora = momento or datetime.utcnow()
+    contadores = EventAttendance(
+        event_id=event_id,
+        tickets_sold=vendidas,
+        tickets_admitted=admitidas,
+        minute_start=ahora.replace(second=0, microsecond=0),
+        admissions_current_minute=admisiones_minuto,
+        admissions_previous_minute=0,
+        updated_at=ahora
+    )
+    try:
+        with db.session.begin_nested():
+            db.session.add(contadores)
+    except IntegrityError:
+        return None
+    return contadores
@@ -0,0 +1,24 @@
+import threading
+import time
+from api.models import db
+
+
+def iniciar_tarea_periodica(app, nombre, intervalo, tarea):
+    """Ejecutar `tarea()` cada `intervalo` segundos en un hilo en segundo plano.
+
+    Cada ejecución corre dentro de su propio contexto de aplicación; si la tarea
+    falla se hace rollback de la sesión y se reintenta en el siguiente ciclo.
+    """
+    def ejecutar():
+        while True:
+            time.sleep(intervalo)
+            with app.app_context():
+                try:
+                    tarea()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"⚠️  Error en tarea '{nombre}': {str(e)}")
+
+    hilo = threading.Thread(target=ejecutar, name=nombre, daemon=True)
+    hilo.start()
+    return hilo
@@ -0,0 +1,300 @@
+import hashlib
+import json
+import mmap
+import os
+import queue
+import threading
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import bindparam, select, update
+from api.models import db, Purchase, Ticket
+from api.utils.attendance import registrar_admisiones
+from api.utils.background import iniciar_tarea_periodica
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueos entre procesos, usar un único proceso de API
+    fcntl = None
+
+
+class IndiceValidacion:
+    """Índice compacto de los tickets de un evento: número de ticket -> slot, más un bitmap de is_used.
+
+    El bitmap vive en un archivo mapeado en memoria dentro del almacén local,
+    compartido por todos los procesos de API del servidor. Marcar un ticket es
+    un test-and-set del bit bajo un bloqueo del byte que lo contiene (fcntl
+    entre procesos, threading.Lock entre hilos), por lo que un ticket se admite
+    una sola vez aunque lo validen varios procesos a la vez.
+    """
+
+    def __init__(self, event_id, generacion, ticket_numbers, ruta_bitmap):
+        self.event_id = event_id
+        self.generacion = generacion
+        self._slots = {ticket_number: slot for slot, ticket_number in enumerate(ticket_numbers)}
+        self._archivo = open(ruta_bitmap, 'r+b')
+        self._bitmap = mmap.mmap(self._archivo.fileno(), 0)
+        self._lock = threading.Lock()
+
+    def __contains__(self, ticket_number):
+        return ticket_number in self._slots
+
+    def usado(self, ticket_number):
+        """Estado is_used de un ticket del índice, o None si el ticket no está en el índice"""
+        slot = self._slots.get(ticket_number)
+        if slot is None:
+            return None
+        return bool(self._bitmap[slot // 8] & (1 << (slot % 8)))
+
+    def marcar(self, ticket_number):
+        """Marcar un ticket como usado: True si esta llamada lo marcó, False si ya estaba usado"""
+        slot = self._slots[ticket_number]
+        posicion, bit = slot // 8, 1 << (slot % 8)
+        with self._lock, self._bloquear_byte(posicion):
+            if self._bitmap[posicion] & bit:
+                return False
+            self._bitmap[posicion] |= bit
+            return True
+
+    @contextmanager
+    def _bloquear_byte(self, posicion):
+        if fcntl is None:
+            yield
+            return
+        fcntl.lockf(self._archivo, fcntl.LOCK_EX, 1, posicion)
+        try:
+            yield
+        finally:
+            fcntl.lockf(self._archivo, fcntl.LOCK_UN, 1, posicion)
+
+    def ticket_numbers_usados(self):
+        return [n for n, slot in self._slots.items() if self._bitmap[slot // 8] & (1 << (slot % 8))]
+
+    def cerrar(self):
+        self._bitmap.close()
+        self._archivo.close()
+
+    def to_dict(self):
+        return {
+            'eventId': self.event_id,
+            'tickets': len(self._slots),
+            'used': int.from_bytes(self._bitmap, 'big').bit_count()
+        }
+
+
+class ValidacionEnCaliente:
+    """Modo día de evento: validaciones respondidas desde un índice en memoria.
+
+    Al activar un evento se precargan sus tickets en el almacén local
+    (HOT_VALIDATION_DIR): la lista de números de ticket en orden de slot y el
+    bitmap de is_used. Cada proceso de API detecta los eventos activos por los
+    archivos del almacén y carga el mismo índice. Las admisiones se escriben a
+    la base de datos de forma asíncrona, en lotes, con un UPDATE condicional
+    (solo tickets aún no usados) por el hilo de escritura de cada proceso.
+
+    Los tickets comprados después de activar el evento no están en el índice
+    y se validan directamente contra la base de datos.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.directorio = app.config['HOT_VALIDATION_DIR']
+        self.flush_interval = app.config['HOT_VALIDATION_FLUSH_INTERVAL']
+        self.flush_batch = app.config['HOT_VALIDATION_FLUSH_BATCH']
+        os.makedirs(self.directorio, exist_ok=True)
+        self._indices = {}  # event_id -> IndiceValidacion
+        self._version_almacen = None
+        self._lock = threading.Lock()
+        self._pendientes = queue.Queue()  # (event_id, ticket_number, used_at) por escribir en la base
+        self._escritor = None
+
+    # --- Almacén local compartido entre procesos ---
+
+    def _rutas(self, event_id):
+        clave = hashlib.sha256(event_id.encode('utf-8')).hexdigest()[:16]
+        base = os.path.join(self.directorio, clave)
+        return f'{base}.json', f'{base}.bitmap'
+
+    @contextmanager
+    def _bloquear_almacen(self):
+        with open(os.path.join(self.directorio, '.lock'), 'a+b') as archivo:
+            if fcntl is not None:
+                fcntl.flock(archivo, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(archivo, fcntl.LOCK_UN)
+
+    def _sincronizar(self):
+        """Cargar o descartar índices según los eventos activos en el almacén (solo si cambió)"""
+        version = os.stat(self.directorio).st_mtime_ns
+        if version == self._version_almacen:
+            return
+        with self._lock:
+            if version == self._version_almacen:
+                return
+            activos = {}
+            for nombre in os.listdir(self.directorio):
+                if nombre.endswith('.json'):
+                    with open(os.path.join(self.directorio, nombre)) as archivo:
+                        datos = json.load(archivo)
+                    activos[datos['eventId']] = datos
+
+            # Descartar eventos desactivados o reactivados (nueva generación de archivos)
+            for event_id, indice in list(self._indices.items()):
+                if event_id not in activos or activos[event_id]['generation'] != indice.generacion:
+                    self._indices.pop(event_id).cerrar()
+            for event_id, datos in activos.items():
+                if event_id not in self._indices:
+                    self._indices[event_id] = IndiceValidacion(
+                        event_id, datos['generation'], datos['tickets'], self._rutas(event_id)[1]
+                    )
+            self._version_almacen = version
+
+        if self._indices:
+            self._asegurar_escritor()
+
+    def activar(self, event_id):
+        """Precargar los tickets de un evento en el almacén local (idempotente)"""
+        ruta_indice, ruta_bitmap = self._rutas(event_id)
+        with self._bloquear_almacen():
+            if not os.path.exists(ruta_indice):
+                filas = db.session.execute(
+                    select(Ticket.ticket_number, Ticket.is_used)
+                    .join(Purchase, Ticket.purchase_id == Purchase.id)
+                    .where(Purchase.event_id == event_id)
+                    .order_by(Ticket.id)
+                ).all()
+
+                bitmap = bytearray(max(1, (len(filas) + 7) // 8))
+                for slot, (_, is_used) in enumerate(filas):
+                    if is_used:
+                        bitmap[slot // 8] |= 1 << (slot % 8)
+                with open(ruta_bitmap, 'wb') as archivo:
+                    archivo.write(bitmap)
+
+                # El índice se publica al final: su presencia indica que el evento está activo
+                temporal = f'{ruta_indice}.tmp'
+                with open(temporal, 'w') as archivo:
+                    json.dump({
+                        'eventId': event_id,
+                        'generation': uuid.uuid4().hex,
+                        'tickets': [n for n, _ in filas]
+                    }, archivo)
+                os.replace(temporal, ruta_indice)
+
+        self._sincronizar()
+        return self._indices[event_id]
+
+    def desactivar(self, event_id):
+        """Escribir en la base los tickets marcados en el bitmap y retirar el evento del almacén"""
+        self._sincronizar()
+        indice = self._indices.get(event_id)
+        if not indice:
+            return None
+
+        self.escribir_pendientes()
+        # Conciliar: cubre admisiones cuya escritura se perdió (p. ej. un proceso que terminó)
+        ahora = datetime.utcnow()
+        self._escribir([(event_id, n, ahora) for n in indice.ticket_numbers_usados()])
+        db.session.commit()
+
+        estado = indice.to_dict()
+        ruta_indice, ruta_bitmap = self._rutas(event_id)
+        with self._bloquear_almacen():
+            for ruta in (ruta_indice, ruta_bitmap):
+                if os.path.exists(ruta):
+                    os.remove(ruta)
+        self._sincronizar()
+        return estado
+
+    def estado(self, event_id):
+        self._sincronizar()
+        indice = self._indices.get(event_id)
+        if not indice:
+            return None
+        return {**indice.to_dict(), 'pendingWrites': self._pendientes.qsize()}
+
+    # --- Validación ---
+
+    def indice_de(self, ticket_number):
+        """Índice activo que contiene un ticket, o None"""
+        self._sincronizar()
+        for indice in list(self._indices.values()):
+            if ticket_number in indice:
+                return indice
+        return None
+
+    def usado(self, ticket_number):
+        """Estado is_used según el índice, o None si el ticket no está en modo día de evento"""
+        indice = self.indice_de(ticket_number)
+        return indice.usado(ticket_number) if indice else None
+
+    def marcar(self, ticket_number, escribir=True):
+        """Admitir un ticket desde el índice.
+
+        Retorna True si fue admitido en esta llamada, False si ya estaba usado,
+        o None si el ticket no está en modo día de evento. Con escribir=True la
+        admisión se encola para escribirse en la base de datos.
+        """
+        indice = self.indice_de(ticket_number)
+        if not indice:
+            return None
+        admitido = indice.marcar(ticket_number)
+        if admitido and escribir:
+            self._pendientes.put((indice.event_id, ticket_number, datetime.utcnow()))
+        return admitido
+
+    # --- Escritura asíncrona en la base de datos ---
+
+    def _asegurar_escritor(self):
+        with self._lock:
+            if self._escritor is None:
+                self._escritor = iniciar_tarea_periodica(
+                    self.app, 'validacion-en-caliente', self.flush_interval, self.escribir_pendientes
+                )
+
+    def escribir_pendientes(self):
+        """Escribir en la base las admisiones encoladas, en lotes de flush_batch"""
+        while True:
+            lote = []
+            try:
+                while len(lote) < self.flush_batch:
+                    lote.append(self._pendientes.get_nowait())
+            except queue.Empty:
+                pass
+            if not lote:
+                return
+            try:
+                self._escribir(lote)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                for pendiente in lote:
+                    self._pendientes.put(pendiente)
+                raise
+
+    def _escribir(self, admisiones):
+        por_evento = defaultdict(list)
+        for event_id, numero, momento in admisiones:
+            por_evento[event_id].append({'numero': numero, 'momento': momento})
+
+        tabla = Ticket.__table__
+        for event_id, filas in por_evento.items():
+            escritas = db.session.execute(
+                update(tabla)
+                .where(tabla.c.ticket_number == bindparam('numero'), tabla.c.is_used == False)
+                .values(is_used=True, used_at=bindparam('momento'), updated_at=bindparam('momento')),
+                filas
+            ).rowcount
+            # Solo las filas que pasaron de no usadas a usadas cuentan como admisiones
+            registrar_admisiones(event_id, escritas)
+
+
+def iniciar_validacion_en_caliente(app):
+    """Crear el modo día de evento de la aplicación (el hilo de escritura parte al activar un evento)"""
+    validacion = ValidacionEnCaliente(app)
+    app.extensions['validacion_en_caliente'] = validacion
+    return validacion
@@ -0,0 +1,78 @@
+import hashlib
+import json
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete
+from api.models import db, IdempotencyKey
+from api.utils.background import iniciar_tarea_periodica
+
+# Largo máximo aceptado para el header Idempotency-Key
+MAX_LARGO_CLAVE = 255
+
+
+def hash_peticion(data):
+    """Huella del cuerpo de la petición, para detectar una clave reutilizada con otros datos"""
+    canonico = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonico.encode('utf-8')).hexdigest()
+
+
+def buscar_respuesta(key):
+    """Obtener la respuesta guardada para una clave vigente, o None"""
+    return IdempotencyKey.query.filter(
+        IdempotencyKey.key == key,
+        IdempotencyKey.expires_at > datetime.utcnow()
+    ).first()
+
+
+def respuesta_guardada(registro):
+    """Reconstruir la respuesta HTTP original a partir de una clave guardada"""
+    response = current_app.response_class(
+        registro.response_body,
+        status=registro.status_code,
+        mimetype='application/json'
+    )
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def guardar_respuesta(key, request_hash, body, status_code):
+    """Registrar la respuesta de una clave en la transacción actual.
+
+    Debe llamarse antes del commit de la operación que protege, para que la
+    compra y su clave se confirmen (o se descarten) juntas.
+    """
+    # Una clave vencida que aún no fue purgada no debe bloquear su reutilización
+    db.session.execute(
+        delete(IdempotencyKey)
+        .where(IdempotencyKey.key == key, IdempotencyKey.expires_at <= datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    ttl = current_app.config['IDEMPOTENCY_KEY_TTL_SECONDS']
+    db.session.add(IdempotencyKey(
+        key=key,
+        request_hash=request_hash,
+        status_code=status_code,
+        response_body=json.dumps(body),
+        expires_at=datetime.utcnow() + timedelta(seconds=ttl)
+    ))
+
+
+def purgar_claves_expiradas():
+    """Eliminar las claves vencidas. Retorna la cantidad eliminada."""
+    result = db.session.execute(
+        delete(IdempotencyKey)
+        .where(IdempotencyKey.expires_at <= datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def iniciar_purga_claves(app):
+    """Iniciar un hilo en segundo plano que purga claves de idempotencia vencidas"""
+    def purgar():
+        eliminadas = purgar_claves_expiradas()
+        if eliminadas:
+            print(f"♻️  {eliminadas} claves de idempotencia vencidas eliminadas")
+
+    return iniciar_tarea_periodica(app, 'purga-idempotencia', app.config['IDEMPOTENCY_PURGE_INTERVAL'], purgar)
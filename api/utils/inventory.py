@@ -0,0 +1,126 @@
+import random
+from sqlalchemy import update, delete
+from api.models import db, Event, InventoryShard
+
+
+def reservar_entradas(event, quantity):
+    """Descontar entradas de un evento de forma atómica.
+
+    La verificación de disponibilidad y el descuento se hacen en un único
+    UPDATE condicional, por lo que dos compras concurrentes nunca pueden
+    dejar el inventario en negativo. Retorna True si se descontaron las
+    entradas y False si no había suficientes.
+    """
+    if event.inventory_shards:
+        return _reservar_en_shards(event, quantity)
+
+    result = db.session.execute(
+        update(Event)
+        .where(Event.id == event.id, Event.available_tickets >= quantity)
+        .values(available_tickets=Event.available_tickets - quantity)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def liberar_entradas(event, quantity):
+    """Devolver entradas al inventario de un evento de forma atómica"""
+    if event.inventory_shards:
+        # Devolver a un sub-contador al azar para no concentrar escrituras
+        shard_index = random.randrange(event.inventory_shards)
+        result = db.session.execute(
+            update(InventoryShard)
+            .where(InventoryShard.event_id == event.id, InventoryShard.shard_index == shard_index)
+            .values(available_tickets=InventoryShard.available_tickets + quantity)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    result = db.session.execute(
+        update(Event)
+        .where(Event.id == event.id)
+        .values(available_tickets=Event.available_tickets + quantity)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def _descontar_shard(event_id, shard_index, quantity):
+    result = db.session.execute(
+        update(InventoryShard)
+        .where(
+            InventoryShard.event_id == event_id,
+            InventoryShard.shard_index == shard_index,
+            InventoryShard.available_tickets >= quantity
+        )
+        .values(available_tickets=InventoryShard.available_tickets - quantity)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def _reservar_en_shards(event, quantity):
+    """Descontar de un sub-contador elegido al azar, recorriendo los demás si no alcanza.
+
+    Si ningún sub-contador tiene la cantidad completa (típico cerca del agotamiento),
+    se reparte el descuento entre varios dentro de un savepoint que se revierte
+    si la suma no alcanza.
+    """
+    k = event.inventory_shards
+    inicio = random.randrange(k)
+    orden = [(inicio + i) % k for i in range(k)]
+
+    for shard_index in orden:
+        if _descontar_shard(event.id, shard_index, quantity):
+            return True
+
+    savepoint = db.session.begin_nested()
+    disponibles = dict(
+        db.session.query(InventoryShard.shard_index, InventoryShard.available_tickets)
+        .filter(InventoryShard.event_id == event.id)
+        .all()
+    )
+    restante = quantity
+    for shard_index in orden:
+        tomar = min(disponibles.get(shard_index, 0), restante)
+        if tomar <= 0:
+            continue
+        if not _descontar_shard(event.id, shard_index, tomar):
+            break
+        restante -= tomar
+        if restante == 0:
+            savepoint.commit()
+            return True
+
+    savepoint.rollback()
+    return False
+
+
+def activar_shards(event, k):
+    """Repartir el inventario de un evento en k sub-contadores (k <= 1 vuelve al contador único).
+
+    Consolida primero los sub-contadores existentes, por lo que también sirve
+    para cambiar la cantidad de shards de un evento ya repartido. Pensado para
+    ejecutarse antes de abrir la venta, no con compras en curso.
+    """
+    db.session.refresh(event)
+    disponibles = event.entradas_disponibles
+    db.session.execute(
+        delete(InventoryShard)
+        .where(InventoryShard.event_id == event.id)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.expire(event, ['shards'])
+
+    if k <= 1:
+        event.inventory_shards = 0
+        event.available_tickets = disponibles
+        return
+
+    base, resto = divmod(disponibles, k)
+    db.session.add_all([
+        InventoryShard(event_id=event.id, shard_index=i, available_tickets=base + (1 if i < resto else 0))
+        for i in range(k)
+    ])
+    event.inventory_shards = k
+    event.available_tickets = 0
@@ -0,0 +1,98 @@
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import insert
+from api.models import db, Purchase, Ticket
+from api.utils.qr import digest_qr, firmar_qr
+from api.utils.ticket_ids import nuevo_ticket_id
+from api.utils.sales_rollup import registrar_venta_diaria
+import uuid
+
+# Parámetros por INSERT multi-fila: el límite por defecto de SQLite anterior a 3.32
+# (SQLITE_MAX_VARIABLE_NUMBER); las filas por INSERT se derivan de las columnas de cada fila
+PARAMETROS_POR_INSERT = 999
+
+
+def generar_numero_orden():
+    """Generar número de orden único"""
+    return f"ORD-{datetime.now().strftime('%Y%m%d')}-{uuid.uuid4().hex[:8].upper()}"
+
+
+def crear_compra(user, event, quantity, unit_price, total_price, service_charge=0,
+                 order_number=None, purchase_date=None):
+    """Crear una compra completada con sus tickets individuales.
+
+    No toca el inventario del evento: quien llama debe haber descontado
+    (o retenido) las entradas previamente. Retorna (purchase, tickets), donde
+    tickets son diccionarios con ticket_number y qr_code_data.
+    """
+    order_number = order_number or generar_numero_orden()
+
+    # Crear la compra con estado 'completed' (el pago ya fue procesado en el frontend)
+    purchase = Purchase(
+        order_number=order_number,
+        user_id=user.id,
+        event_id=event.id,
+        quantity=quantity,
+        unit_price=unit_price,
+        service_charge=service_charge,
+        total_price=total_price,
+        status='completed',  # Estado completado porque el pago ya fue simulado
+        qr_code_data=f"ORD:{order_number}:USER:{user.email}:QTY:{quantity}",
+        purchase_date=purchase_date or datetime.utcnow()  # Registrar fecha de compra
+    )
+
+    db.session.add(purchase)
+    db.session.flush()  # Para obtener el ID de la compra
+
+    # Generar todos los tickets por adelantado e insertarlos con INSERTs multi-fila,
+    # sin crear un objeto ORM por entrada
+    tickets = generar_tickets(quantity)
+    insertar_tickets(purchase.id, tickets)
+    registrar_venta_diaria(purchase, event)
+
+    return purchase, tickets
+
+
+def generar_tickets(quantity):
+    """Generar números de ticket compactos, datos QR firmados y su digest"""
+    clave = current_app.config['QR_SIGNING_KEY']
+    tickets = []
+    for _ in range(quantity):
+        ticket_number = nuevo_ticket_id()
+        qr_code_data = firmar_qr(ticket_number, clave)
+        tickets.append({
+            'ticket_number': ticket_number,
+            'qr_code_data': qr_code_data,
+            'qr_digest': digest_qr(qr_code_data)
+        })
+    return tickets
+
+
+def insertar_tickets(purchase_id, tickets):
+    """Insertar tickets de una compra con INSERTs multi-fila de hasta PARAMETROS_POR_INSERT parámetros"""
+    ahora = datetime.utcnow()
+    filas = [
+        {
+            'purchase_id': purchase_id,
+            'ticket_number': t['ticket_number'],
+            'qr_code_data': t['qr_code_data'],
+            'qr_digest': t['qr_digest'],
+            'is_used': False,
+            'created_at': ahora,
+            'updated_at': ahora
+        }
+        for t in tickets
+    ]
+    if not filas:
+        return
+    por_insert = PARAMETROS_POR_INSERT // len(filas[0])
+    for inicio in range(0, len(filas), por_insert):
+        db.session.execute(insert(Ticket).values(filas[inicio:inicio + por_insert]))
+
+
+def resumen_tickets(tickets):
+    """Resumen liviano de los tickets de una compra (el detalle completo está en /tickets/purchase/<id>)"""
+    return [
+        {'ticketNumber': t['ticket_number'], 'qrCodeData': t['qr_code_data'], 'isUsed': False}
+        for t in tickets
+    ]
@@ -0,0 +1,70 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+
+def usa_cursor(args):
+    """Indica si la petición pide paginación por cursor (?cursor=... o ?pagination=cursor)"""
+    return 'cursor' in args or args.get('pagination') == 'cursor'
+
+
+def codificar_cursor(item):
+    """Cursor opaco con la posición (created_at, id) de un elemento"""
+    posicion = [item.created_at.isoformat() if item.created_at else None, item.id]
+    return base64.urlsafe_b64encode(json.dumps(posicion).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Retornar (created_at, id) de un cursor; lanza ValueError si el cursor es inválido"""
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        created_at, item_id = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        return (datetime.fromisoformat(created_at) if created_at is not None else None), item_id
+    except Exception:
+        raise ValueError('Cursor de paginación inválido')
+
+
+def paginar_por_cursor(query, modelo, per_page, cursor=None, incluir_total=False):
+    """Paginar una consulta por (created_at, id) descendente, sin OFFSET.
+
+    Cada página continúa estrictamente después del último elemento de la
+    anterior, por lo que el costo no crece con la profundidad de la página.
+    Los elementos sin created_at van al final, ordenados por id, en una
+    segunda pasada que empieza cuando se acaban los elementos con fecha:
+    así cada consulta ordena exactamente por el índice (created_at, id).
+    El COUNT(*) total solo se calcula si se pide explícitamente.
+    Retorna (items, pagination).
+    """
+    per_page = max(1, per_page)
+    created_at, item_id = decodificar_cursor(cursor) if cursor else (None, None)
+
+    # Pedir un elemento extra para saber si hay página siguiente
+    items = []
+    if not cursor or created_at is not None:
+        con_fecha = query.filter(modelo.created_at.isnot(None))
+        if cursor:
+            # La cota simple sobre created_at deja el rango del índice acotado; el OR desempata por id
+            con_fecha = con_fecha.filter(modelo.created_at <= created_at, or_(
+                modelo.created_at < created_at,
+                and_(modelo.created_at == created_at, modelo.id < item_id)
+            ))
+        items = con_fecha.order_by(modelo.created_at.desc(), modelo.id.desc()).limit(per_page + 1).all()
+    if len(items) <= per_page:
+        sin_fecha = query.filter(modelo.created_at.is_(None))
+        if cursor and created_at is None:
+            sin_fecha = sin_fecha.filter(modelo.id < item_id)
+        items += sin_fecha.order_by(modelo.id.desc()).limit(per_page + 1 - len(items)).all()
+    has_next = len(items) > per_page
+    items = items[:per_page]
+
+    pagination = {
+        'mode': 'cursor',
+        'per_page': per_page,
+        'has_next': has_next,
+        'next_cursor': codificar_cursor(items[-1]) if has_next else None
+    }
+    if incluir_total:
+        pagination['total'] = query.order_by(None).count()
+
+    return items, pagination
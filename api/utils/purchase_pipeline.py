@@ -0,0 +1,197 @@
+import queue
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from datetime import datetime
+from api.models import db, User, Event
+from api.utils.inventory import reservar_entradas
+from api.utils.orders import crear_compra, generar_numero_orden
+from api.utils.idempotency import guardar_respuesta
+
+# Segundos que se recuerda una orden fallida para que el cliente pueda consultarla
+TTL_ORDENES_FALLIDAS = 600
+
+
+class PipelineCompras:
+    """Compras aceptadas en memoria y confirmadas en lote por un hilo en segundo plano.
+
+    El endpoint valida la compra, la acepta contra el inventario disponible
+    menos lo ya aceptado y aún no confirmado, y la encola. El hilo trabajador
+    confirma muchas órdenes por transacción; el descuento en la base sigue
+    siendo el UPDATE condicional de reservar_entradas, por lo que nunca hay
+    sobreventa aunque la aceptación en memoria haya sido optimista.
+
+    El estado vive en el proceso: el modo diferido requiere un único proceso
+    de API (o enrutamiento fijo por evento).
+    """
+
+    def __init__(self, app, batch_size=200, batch_wait=0.05):
+        self.app = app
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self._cola = queue.Queue()
+        self._lock = threading.Lock()
+        self._pendientes = defaultdict(int)  # event_id -> entradas aceptadas sin confirmar
+        self._ordenes = {}  # order_number -> orden aceptada aún no confirmada
+        self._fallidas = OrderedDict()  # order_number -> (error, momento)
+        self._claves = {}  # Idempotency-Key -> order_number de órdenes aún no confirmadas
+
+    def aceptar(self, user, event, quantity, unit_price, total_price, service_charge=0,
+                idempotency_key=None, request_hash=None):
+        """Aceptar y encolar una compra.
+
+        Retorna (orden, nueva): la orden aceptada y si fue creada en esta llamada
+        (False si la Idempotency-Key ya tenía una orden en cola), o (None, False)
+        si no hay entradas suficientes.
+        """
+        # `event` fue leído en esta misma petición: su disponibilidad ya refleja lo confirmado
+        disponibles = event.entradas_disponibles
+        with self._lock:
+            if idempotency_key and idempotency_key in self._claves:
+                return self._ordenes.get(self._claves[idempotency_key]), False
+            if disponibles - self._pendientes[event.id] < quantity:
+                return None, False
+
+            orden = {
+                'order_number': generar_numero_orden(),
+                'user_id': user.id,
+                'event_id': event.id,
+                'quantity': quantity,
+                'unit_price': unit_price,
+                'total_price': total_price,
+                'service_charge': service_charge,
+                'accepted_at': datetime.utcnow(),
+                'idempotency_key': idempotency_key,
+                'request_hash': request_hash
+            }
+            self._pendientes[event.id] += quantity
+            self._ordenes[orden['order_number']] = orden
+            if idempotency_key:
+                self._claves[idempotency_key] = orden['order_number']
+
+        self._cola.put(orden)
+        return orden, True
+
+    def respuesta_aceptada(self, orden):
+        return {
+            'success': True,
+            'message': 'Compra aceptada, pendiente de confirmación',
+            'orderNumber': orden['order_number'],
+            'status': 'queued',
+            'acceptedAt': orden['accepted_at'].isoformat()
+        }
+
+    def orden_pendiente(self, idempotency_key):
+        """Orden aún en cola para una Idempotency-Key, o None"""
+        with self._lock:
+            order_number = self._claves.get(idempotency_key)
+            return self._ordenes.get(order_number) if order_number else None
+
+    def estado_orden(self, order_number):
+        """Estado en memoria de una orden no confirmada: ('queued', None), ('failed', error) o None"""
+        with self._lock:
+            if order_number in self._ordenes:
+                return 'queued', None
+            if order_number in self._fallidas:
+                return 'failed', self._fallidas[order_number][0]
+        return None
+
+    def iniciar(self):
+        hilo = threading.Thread(target=self._trabajar, name='pipeline-compras', daemon=True)
+        hilo.start()
+        return hilo
+
+    def _trabajar(self):
+        while True:
+            lote = [self._cola.get()]
+            limite = time.monotonic() + self.batch_wait
+            while len(lote) < self.batch_size:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(self._cola.get(timeout=restante))
+                except queue.Empty:
+                    break
+
+            with self.app.app_context():
+                self._confirmar_lote(lote)
+
+    def _confirmar_lote(self, lote):
+        """Confirmar un lote en una sola transacción; si falla, reintentar orden por orden"""
+        try:
+            resultados = self._confirmar(lote)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"⚠️  Error confirmando lote de {len(lote)} compras, reintentando una a una: {str(e)}")
+            resultados = {}
+            for orden in lote:
+                try:
+                    resultados.update(self._confirmar([orden]))
+                    db.session.commit()
+                except Exception as e_orden:
+                    db.session.rollback()
+                    resultados[orden['order_number']] = f'Error interno del servidor: {str(e_orden)}'
+
+        self._registrar_resultados(lote, resultados)
+
+    def _confirmar(self, lote):
+        """Crear las compras de un lote en la transacción actual. Retorna {order_number: error o None}."""
+        users = {u.id: u for u in User.query.filter(User.id.in_({o['user_id'] for o in lote}))}
+        events = {e.id: e for e in Event.query.filter(Event.id.in_({o['event_id'] for o in lote}))}
+
+        resultados = {}
+        for orden in lote:
+            event = events.get(orden['event_id'])
+            user = users.get(orden['user_id'])
+            if not event or not user:
+                resultados[orden['order_number']] = 'Usuario o evento no encontrado'
+                continue
+            if not reservar_entradas(event, orden['quantity']):
+                resultados[orden['order_number']] = 'No hay suficientes entradas disponibles'
+                continue
+
+            crear_compra(
+                user, event, orden['quantity'],
+                unit_price=orden['unit_price'],
+                total_price=orden['total_price'],
+                service_charge=orden['service_charge'],
+                order_number=orden['order_number'],
+                purchase_date=orden['accepted_at']
+            )
+            if orden['idempotency_key']:
+                guardar_respuesta(orden['idempotency_key'], orden['request_hash'], self.respuesta_aceptada(orden), 202)
+            resultados[orden['order_number']] = None
+
+        return resultados
+
+    def _registrar_resultados(self, lote, resultados):
+        ahora = time.monotonic()
+        with self._lock:
+            for orden in lote:
+                self._pendientes[orden['event_id']] -= orden['quantity']
+                self._ordenes.pop(orden['order_number'], None)
+                if orden['idempotency_key']:
+                    self._claves.pop(orden['idempotency_key'], None)
+                error = resultados.get(orden['order_number'])
+                if error:
+                    self._fallidas[orden['order_number']] = (error, ahora)
+
+            while self._fallidas and ahora - next(iter(self._fallidas.values()))[1] > TTL_ORDENES_FALLIDAS:
+                self._fallidas.popitem(last=False)
+
+        confirmadas = sum(1 for error in resultados.values() if error is None)
+        print(f"✅ Lote confirmado: {confirmadas}/{len(lote)} compras")
+
+
+def iniciar_pipeline(app):
+    """Crear e iniciar el pipeline de compras diferidas de la aplicación"""
+    pipeline = PipelineCompras(
+        app,
+        batch_size=app.config['PURCHASE_PIPELINE_BATCH_SIZE'],
+        batch_wait=app.config['PURCHASE_PIPELINE_BATCH_WAIT']
+    )
+    app.extensions['pipeline_compras'] = pipeline
+    pipeline.iniciar()
+    return pipeline
@@ -0,0 +1,94 @@
+import base64
+import hashlib
+import hmac
+from sqlalchemy import select, update
+from api.models import db, Ticket
+
+# Filas por lote al completar digests de tickets existentes
+DIGESTS_POR_LOTE = 5000
+
+# QR firmados de tickets nuevos: TK2.<ticket_number>.<firma>, todo en mayúsculas y base32
+# para que el QR use el modo alfanumérico (menos módulos y decodificación más rápida en la puerta)
+PREFIJO_QR_FIRMADO = 'TK2'
+# QR firmados emitidos antes de los números compactos: TK1.<ticket_number>.<event_id>.<firma base64>
+PREFIJO_QR_FIRMADO_V1 = 'TK1'
+# Bytes de HMAC-SHA256 que se conservan en la firma (128 bits)
+LARGO_FIRMA = 16
+
+
+def digest_qr(qr_data):
+    """Digest de ancho fijo (sha256 hex, 64 caracteres) de los datos de un QR"""
+    return hashlib.sha256(qr_data.encode('utf-8')).hexdigest()
+
+
+def firmar_qr(ticket_number, clave):
+    """Datos QR compactos firmados con HMAC-SHA256 para un ticket"""
+    cuerpo = f"{PREFIJO_QR_FIRMADO}.{ticket_number}"
+    return f"{cuerpo}.{_firma_base32(cuerpo, clave)}"
+
+
+def es_qr_firmado(qr_data):
+    return qr_data.startswith((PREFIJO_QR_FIRMADO + '.', PREFIJO_QR_FIRMADO_V1 + '.'))
+
+
+def verificar_qr(qr_data, clave):
+    """Verificar la firma de un QR solo con CPU, sin consultar la base de datos.
+
+    Retorna (ticket_number, event_id) si la firma es válida, o None si el QR
+    está mal formado o fue alterado. Los QR TK2 no incluyen el evento
+    (event_id es None): el número de ticket ya es único.
+    """
+    cuerpo, _, firma = qr_data.rpartition('.')
+    partes = cuerpo.split('.', 2)
+    if len(partes) == 2 and partes[0] == PREFIJO_QR_FIRMADO:
+        esperada, resultado = _firma_base32(cuerpo, clave), (partes[1], None)
+    elif len(partes) == 3 and partes[0] == PREFIJO_QR_FIRMADO_V1:
+        esperada, resultado = _firma(cuerpo, clave), (partes[1], partes[2])
+    else:
+        return None
+    if not hmac.compare_digest(firma.encode('utf-8'), esperada.encode('utf-8')):
+        return None
+    return resultado
+
+
+def _hmac(cuerpo, clave):
+    return hmac.new(clave.encode('utf-8'), cuerpo.encode('utf-8'), hashlib.sha256).digest()[:LARGO_FIRMA]
+
+
+def _firma(cuerpo, clave):
+    return base64.urlsafe_b64encode(_hmac(cuerpo, clave)).decode('ascii').rstrip('=')
+
+
+def _firma_base32(cuerpo, clave):
+    return base64.b32encode(_hmac(cuerpo, clave)).decode('ascii').rstrip('=')
+
+
+def completar_digests_qr(batch_size=DIGESTS_POR_LOTE):
+    """Calcular qr_digest de los tickets creados antes de que existiera la columna.
+
+    Recorre los tickets sin digest en lotes por id, para no cargar toda la
+    tabla en memoria. Retorna la cantidad de tickets actualizados.
+    """
+    total = 0
+    ultimo_id = 0
+    while True:
+        filas = db.session.execute(
+            select(Ticket.id, Ticket.qr_code_data)
+            .where(Ticket.qr_digest.is_(None), Ticket.id > ultimo_id)
+            .order_by(Ticket.id)
+            .limit(batch_size)
+        ).all()
+        if not filas:
+            break
+
+        db.session.execute(update(Ticket), [
+            {'id': ticket_id, 'qr_digest': digest_qr(qr_code_data)}
+            for ticket_id, qr_code_data in filas
+        ])
+        db.session.commit()
+        total += len(filas)
+        ultimo_id = filas[-1][0]
+
+    if total:
+        print(f"🛠️  Digest QR calculado para {total} tickets existentes")
+    return total
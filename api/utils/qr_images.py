@@ -0,0 +1,318 @@
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import qrcode
+from sqlalchemy import select
+from api.models import db, Purchase, Ticket
+
+# Parámetros de render; cambiar VERSION_RENDER invalida todas las imágenes cacheadas
+VERSION_RENDER = 'v1'
+TAMANO_MODULO = 10
+BORDE = 4
+
+# Escrituras entre revisiones del tamaño total de la caché
+ESCRITURAS_POR_REVISION = 100
+
+# QR por tarea enviada al pool de procesos durante un pre-render
+QR_POR_TAREA = 200
+
+# Estado de los pre-render: un archivo por trabajo en este subdirectorio de la caché
+DIRECTORIO_TRABAJOS = 'prerender'
+# Segundos entre latidos de un pre-render en curso; sin latido por LATIDOS_PERDIDOS latidos se da por abandonado
+LATIDO_TRABAJOS = 5
+LATIDOS_PERDIDOS = 6
+# Los trabajos terminados se eliminan tras este tiempo (segundos)
+TTL_TRABAJOS = 86400
+
+
+def renderizar_qr_png(qr_data):
+    """Renderizar los datos de un QR como imagen PNG"""
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, box_size=TAMANO_MODULO, border=BORDE)
+    qr.add_data(qr_data)
+    qr.make(fit=True)
+    buffer = io.BytesIO()
+    qr.make_image(fill_color='black', back_color='white').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def clave_qr(qr_data):
+    """Clave de contenido de la imagen de un QR: sirve como nombre de archivo y como ETag"""
+    return hashlib.sha256(f'{VERSION_RENDER}:{qr_data}'.encode('utf-8')).hexdigest()
+
+
+def ruta_qr(directorio, clave):
+    return os.path.join(directorio, clave[:2], f'{clave}.png')
+
+
+def _escribir_atomico(ruta, contenido):
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    temporal = f'{ruta}.{uuid.uuid4().hex[:8]}.tmp'
+    with open(temporal, 'wb') as archivo:
+        archivo.write(contenido)
+    os.replace(temporal, ruta)
+
+
+def _renderizar_lote(directorio, lote):
+    """Tarea del pool de procesos: renderizar y guardar en disco los QR que aún no están"""
+    renderizados = 0
+    for qr_data in lote:
+        ruta = ruta_qr(directorio, clave_qr(qr_data))
+        if not os.path.exists(ruta):
+            _escribir_atomico(ruta, renderizar_qr_png(qr_data))
+            renderizados += 1
+    return renderizados
+
+
+class CacheImagenesQR:
+    """Caché en disco de imágenes QR direccionada por contenido, con expulsión LRU por tamaño.
+
+    Cada imagen se guarda con el sha256 de sus datos y parámetros de render
+    como nombre, por lo que nunca hay que invalidar entradas: un QR distinto
+    es otro archivo. Un acierto actualiza la fecha de modificación del
+    archivo; cuando el tamaño total supera max_bytes se eliminan las imágenes
+    usadas hace más tiempo. El directorio puede compartirse entre procesos.
+    """
+
+    def __init__(self, directorio, max_bytes):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._escrituras = 0
+        os.makedirs(directorio, exist_ok=True)
+
+    def obtener(self, qr_data):
+        """PNG de un QR desde la caché, renderizándolo y guardándolo si no está"""
+        ruta = ruta_qr(self.directorio, clave_qr(qr_data))
+        try:
+            with open(ruta, 'rb') as archivo:
+                contenido = archivo.read()
+            os.utime(ruta)
+            return contenido
+        except FileNotFoundError:
+            pass
+
+        contenido = renderizar_qr_png(qr_data)
+        _escribir_atomico(ruta, contenido)
+        with self._lock:
+            self._escrituras += 1
+            revisar = self._escrituras >= ESCRITURAS_POR_REVISION
+            if revisar:
+                self._escrituras = 0
+        if revisar:
+            self.expulsar()
+        return contenido
+
+    def contiene(self, qr_data):
+        return os.path.exists(ruta_qr(self.directorio, clave_qr(qr_data)))
+
+    def expulsar(self):
+        """Eliminar las imágenes menos usadas hasta quedar bajo el 90% de max_bytes"""
+        archivos = []
+        total = 0
+        for subdirectorio in os.scandir(self.directorio):
+            if not subdirectorio.is_dir():
+                continue
+            for entrada in os.scandir(subdirectorio.path):
+                if entrada.name.endswith('.png'):
+                    estado = entrada.stat()
+                    archivos.append((estado.st_mtime, estado.st_size, entrada.path))
+                    total += estado.st_size
+
+        if total <= self.max_bytes:
+            return 0
+
+        eliminados = 0
+        objetivo = self.max_bytes * 0.9
+        for _, tamano, ruta in sorted(archivos):
+            if total <= objetivo:
+                break
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass
+            total -= tamano
+            eliminados += 1
+        return eliminados
+
+
+def iniciar_cache_qr(app):
+    """Crear la caché de imágenes QR de la aplicación"""
+    cache = CacheImagenesQR(app.config['QR_CACHE_DIR'], app.config['QR_CACHE_MAX_BYTES'])
+    app.extensions['cache_qr'] = cache
+    return cache
+
+
+def _ruta_trabajos(app, nombre):
+    return os.path.join(app.extensions['cache_qr'].directorio, DIRECTORIO_TRABAJOS, nombre)
+
+
+def _leer_trabajo(app, job_id):
+    # Los job_id son uuid4 en hexadecimal: cualquier otro valor no es un trabajo
+    if not job_id or len(job_id) != 32 or any(c not in '0123456789abcdef' for c in job_id):
+        return None
+    try:
+        with open(_ruta_trabajos(app, f'{job_id}.json')) as archivo:
+            return json.load(archivo)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _guardar_trabajo(app, trabajo):
+    _escribir_atomico(_ruta_trabajos(app, f"{trabajo['jobId']}.json"), json.dumps(trabajo).encode('utf-8'))
+
+
+def _vigente(app, trabajo):
+    """Pre-render en cola o en curso con latido reciente; si su proceso terminó se marca como fallido"""
+    if trabajo is None or trabajo['status'] not in ('queued', 'running'):
+        return False
+    try:
+        latido = os.stat(_ruta_trabajos(app, f"{trabajo['jobId']}.json")).st_mtime
+    except FileNotFoundError:
+        return False
+    if time.time() - latido <= LATIDO_TRABAJOS * LATIDOS_PERDIDOS:
+        return True
+    trabajo.update(
+        status='failed',
+        error='El proceso que ejecutaba el pre-render terminó',
+        finishedAt=datetime.utcnow().isoformat()
+    )
+    _guardar_trabajo(app, trabajo)
+    return False
+
+
+def _purgar_trabajos(app):
+    """Eliminar los archivos de estado de pre-render terminados hace más de TTL_TRABAJOS segundos"""
+    limite = time.time() - TTL_TRABAJOS
+    for entrada in os.scandir(_ruta_trabajos(app, '')):
+        if entrada.name.endswith('.json') and entrada.stat().st_mtime < limite:
+            trabajo = _leer_trabajo(app, entrada.name[:-len('.json')])
+            if trabajo is not None and not _vigente(app, trabajo):
+                try:
+                    os.remove(entrada.path)
+                except FileNotFoundError:
+                    pass
+
+
+def iniciar_prerender(app, event_id):
+    """Renderizar en segundo plano, con un pool de procesos, los QR de todos los tickets de un evento.
+
+    Si el evento ya tiene un pre-render en curso (en cualquier proceso de la
+    API) se retorna ese trabajo. El estado vive en `<job_id>.json` dentro de
+    la caché, por lo que cualquier proceso puede consultarlo; `<evento>.active`
+    apunta al pre-render en curso de cada evento. Retorna el diccionario de
+    estado del trabajo.
+    """
+    os.makedirs(_ruta_trabajos(app, ''), exist_ok=True)
+    _purgar_trabajos(app)
+    trabajo = {
+        'jobId': uuid.uuid4().hex,
+        'eventId': event_id,
+        'status': 'queued',
+        'total': 0,
+        'alreadyCached': 0,
+        'rendered': 0,
+        'createdAt': datetime.utcnow().isoformat(),
+        'finishedAt': None,
+        'error': None
+    }
+    _guardar_trabajo(app, trabajo)
+
+    # Tomar `<evento>.active` de forma atómica: si otro proceso ya lo creó, se retorna su trabajo
+    ruta_activo = _ruta_trabajos(app, f"{hashlib.sha256(event_id.encode('utf-8')).hexdigest()[:16]}.active")
+    while True:
+        try:
+            descriptor = os.open(ruta_activo, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                with open(ruta_activo) as archivo:
+                    existente = _leer_trabajo(app, archivo.read().strip())
+            except FileNotFoundError:
+                continue
+            if _vigente(app, existente):
+                os.remove(_ruta_trabajos(app, f"{trabajo['jobId']}.json"))
+                return existente
+            # El pre-render anterior terminó sin liberar el evento
+            try:
+                os.remove(ruta_activo)
+            except FileNotFoundError:
+                pass
+            continue
+        with os.fdopen(descriptor, 'w') as archivo:
+            archivo.write(trabajo['jobId'])
+        break
+
+    hilo = threading.Thread(
+        target=_ejecutar_prerender, args=(app, trabajo, ruta_activo), name='prerender-qr', daemon=True
+    )
+    hilo.start()
+    return dict(trabajo)
+
+
+def obtener_trabajo(app, job_id):
+    trabajo = _leer_trabajo(app, job_id)
+    if trabajo is not None:
+        _vigente(app, trabajo)
+    return trabajo
+
+
+def _ejecutar_prerender(app, trabajo, ruta_activo):
+    cache = app.extensions['cache_qr']
+    terminado = threading.Event()
+
+    def latir():
+        # Renovar la fecha de modificación del estado mientras el pre-render siga en curso
+        while not terminado.wait(LATIDO_TRABAJOS):
+            try:
+                os.utime(_ruta_trabajos(app, f"{trabajo['jobId']}.json"))
+            except FileNotFoundError:
+                pass
+
+    def actualizar(**cambios):
+        trabajo.update(cambios)
+        _guardar_trabajo(app, trabajo)
+
+    threading.Thread(target=latir, name='prerender-qr-latido', daemon=True).start()
+    try:
+        with app.app_context():
+            qr_datas = db.session.execute(
+                select(Ticket.qr_code_data)
+                .join(Purchase, Ticket.purchase_id == Purchase.id)
+                .where(Purchase.event_id == trabajo['eventId'])
+            ).scalars().all()
+            db.session.remove()
+
+        pendientes = [qr_data for qr_data in qr_datas if not cache.contiene(qr_data)]
+        actualizar(status='running', total=len(qr_datas), alreadyCached=len(qr_datas) - len(pendientes))
+
+        lotes = [pendientes[i:i + QR_POR_TAREA] for i in range(0, len(pendientes), QR_POR_TAREA)]
+        if lotes:
+            workers = app.config['QR_RENDER_WORKERS'] or os.cpu_count()
+            # spawn: los procesos hijos no heredan hilos ni conexiones de la API
+            contexto = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=min(workers, len(lotes)), mp_context=contexto) as pool:
+                futuros = [pool.submit(_renderizar_lote, cache.directorio, lote) for lote in lotes]
+                for futuro in futuros:
+                    renderizados = futuro.result()
+                    actualizar(rendered=trabajo['rendered'] + renderizados)
+
+        cache.expulsar()
+        actualizar(status='completed', finishedAt=datetime.utcnow().isoformat())
+        print(f"✅ Pre-render QR del evento {trabajo['eventId']}: {trabajo['rendered']} imágenes nuevas de {trabajo['total']}")
+    except Exception as e:
+        actualizar(status='failed', error=str(e), finishedAt=datetime.utcnow().isoformat())
+        print(f"⚠️  Error en pre-render QR del evento {trabajo['eventId']}: {str(e)}")
+    finally:
+        terminado.set()
+        try:
+            with open(ruta_activo) as archivo:
+                if archivo.read().strip() == trabajo['jobId']:
+                    os.remove(ruta_activo)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,65 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+
+def clave_reporte(filtros, version, *extra):
+    """Clave de un reporte: filtros normalizados (con el formato) y versión de los datos de ventas.
+
+    Sirve como clave de la caché y como ETag. `extra` agrega valores que
+    cambian la respuesta sin cambiar los filtros normalizados (por ejemplo
+    los filtros tal como llegaron, que el JSON repite en filtros_aplicados).
+    """
+    contenido = json.dumps([filtros, version, extra], sort_keys=True)
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+
+class CacheReportes:
+    """Caché en memoria de respuestas de reportes ya generadas, con expulsión LRU por tamaño.
+
+    Las claves incluyen la versión de los datos de ventas, por lo que nunca
+    hay que invalidar entradas: tras una compra las claves nuevas no
+    coinciden y las antiguas dejan de pedirse hasta ser expulsadas. Cuando
+    el total supera max_bytes se eliminan las entradas usadas hace más
+    tiempo; una respuesta mayor a max_bytes / 4 no se guarda.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.max_entrada = max_bytes // 4
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()  # clave -> (cuerpo, mimetype, headers)
+        self._bytes = 0
+
+    def obtener(self, clave):
+        """(cuerpo, mimetype, headers) de una respuesta cacheada, o None"""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                self._entradas.move_to_end(clave)
+            return entrada
+
+    def admite(self, tamano):
+        return tamano is not None and tamano <= self.max_entrada
+
+    def guardar(self, clave, cuerpo, mimetype, headers=None):
+        if not self.admite(len(cuerpo)):
+            return False
+        with self._lock:
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self._bytes -= len(anterior[0])
+            self._entradas[clave] = (cuerpo, mimetype, dict(headers or {}))
+            self._bytes += len(cuerpo)
+            while self._bytes > self.max_bytes:
+                _, (expulsado, _, _) = self._entradas.popitem(last=False)
+                self._bytes -= len(expulsado)
+        return True
+
+
+def iniciar_cache_reportes(app):
+    """Crear la caché de reportes de ventas de la aplicación"""
+    cache = CacheReportes(app.config['REPORT_CACHE_MAX_BYTES'])
+    app.extensions['cache_reportes'] = cache
+    return cache
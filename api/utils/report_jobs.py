@@ -0,0 +1,358 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from flask import Flask
+from api.models import db
+from api.utils.background import iniciar_tarea_periodica
+from api.utils.sales_excel import escribir_excel_reporte
+from api.utils.sales_pdf import escribir_pdf_reporte
+from api.utils.sales_report import filtros_ventas, lotes_ventas, periodo_ventas, resumen_ventas
+from api.utils.sales_rollup import grupos_ventas
+
+# Formatos que se generan como trabajo: extensión y tipo MIME del archivo
+FORMATOS_TRABAJO = {
+    'pdf': ('pdf', 'application/pdf'),
+    'excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+ESTADOS_ACTIVOS = ('queued', 'running')
+
+# Latidos sin renovar tras los cuales un trabajo activo se da por abandonado
+LATIDOS_PERDIDOS = 6
+
+# Aplicación mínima (solo la base de datos) de cada proceso del pool
+_app_proceso = None
+
+
+def filtros_trabajo(datos):
+    """Filtros normalizados de un reporte: dos peticiones equivalentes producen el mismo diccionario.
+
+    Las fechas se llevan a ISO completo y las inválidas se descartan (el
+    reporte las ignora igual); detalle es booleano y por defecto verdadero.
+    """
+    def texto(clave):
+        valor = datos.get(clave)
+        valor = str(valor).strip() if valor is not None else ''
+        return valor or None
+
+    desde, hasta = periodo_ventas(texto('fecha_inicio'), texto('fecha_fin'))
+    detalle = datos.get('detalle', True)
+    if not isinstance(detalle, bool):
+        detalle = str(detalle).lower() == 'true'
+    return {
+        'formato': (texto('formato') or '').lower(),
+        'evento_id': texto('evento_id'),
+        'fecha_inicio': desde.isoformat() if desde else None,
+        'fecha_fin': hasta.isoformat() if hasta else None,
+        'sector_id': texto('sector_id'),
+        'detalle': detalle,
+    }
+
+
+def clave_filtros(filtros):
+    return hashlib.sha256(json.dumps(filtros, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def datos_resumen(filtros):
+    """Agregados del reporte (sin filas detalladas) para unos filtros normalizados"""
+    grupos = grupos_ventas(filtros['evento_id'], filtros['fecha_inicio'], filtros['fecha_fin'])
+    resumen_ejecutivo, analisis_por_sector, analisis_por_evento, cantidad_compras = resumen_ventas(grupos)
+    return {
+        'resumen_ejecutivo': resumen_ejecutivo,
+        'analisis_por_sector': analisis_por_sector,
+        'analisis_por_evento': analisis_por_evento,
+        'filtros_aplicados': {
+            'evento_id': filtros['evento_id'],
+            'fecha_inicio': filtros['fecha_inicio'],
+            'fecha_fin': filtros['fecha_fin'],
+            'sector_id': filtros['sector_id']
+        },
+        'total_registros': cantidad_compras
+    }
+
+
+def _escribir_progreso(ruta, **progreso):
+    temporal = f'{ruta}.tmp'
+    with open(temporal, 'w') as archivo:
+        json.dump(progreso, archivo)
+    os.replace(temporal, ruta)
+
+
+def _iniciar_proceso(database_url):
+    """Preparar un proceso del pool: una aplicación Flask mínima con la misma base que la API"""
+    global _app_proceso
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    _app_proceso = app
+
+
+def _generar_reporte(filtros, ruta, ruta_progreso):
+    """Tarea del pool de procesos: generar el archivo del reporte en `ruta` informando el avance"""
+    with _app_proceso.app_context():
+        _escribir_progreso(ruta_progreso, stage='summary', rows=0, totalRows=None)
+        data = datos_resumen(filtros)
+        total = data['total_registros']
+
+        temporal = f'{ruta}.{uuid.uuid4().hex[:8]}.tmp'
+        try:
+            if filtros['formato'] == 'pdf':
+                _escribir_progreso(ruta_progreso, stage='render', rows=0, totalRows=0)
+                escribir_pdf_reporte(data, temporal)
+                filas = 0
+            else:
+                def lotes():
+                    escritas = 0
+                    for lote in lotes_ventas(filtros_ventas(filtros['evento_id'], filtros['fecha_inicio'], filtros['fecha_fin'])):
+                        yield lote
+                        escritas += len(lote)
+                        _escribir_progreso(ruta_progreso, stage='render', rows=escritas, totalRows=total)
+
+                _escribir_progreso(ruta_progreso, stage='render', rows=0, totalRows=total if filtros['detalle'] else 0)
+                filas = escribir_excel_reporte(data, lotes() if filtros['detalle'] else (), temporal)
+            os.replace(temporal, ruta)
+        finally:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            db.session.remove()
+
+    return {'rows': filas, 'size': os.path.getsize(ruta)}
+
+
+class ColaReportes:
+    """Trabajos de reportes PDF/Excel generados en un pool de procesos, con el archivo final en disco.
+
+    El estado de cada trabajo vive en `<job_id>.json` dentro de
+    REPORT_JOBS_DIR, de modo que cualquier worker de la API (gunicorn con
+    varios procesos) puede consultarlo y servir el archivo, no solo el que
+    lo encoló; el directorio debe ser compartido por todos los workers.
+    Un trabajo con los mismos filtros normalizados que otro en cola o en
+    curso no se encola de nuevo: `<clave>.active` apunta al existente. El
+    avance lo escribe el proceso en `<job_id>.progress`. Mientras un trabajo
+    está en cola o en curso, el worker que lo encoló renueva la fecha de
+    modificación de `<job_id>.json` cada `heartbeat` segundos; un trabajo
+    activo sin renovar hace más de LATIDOS_PERDIDOS latidos se da por
+    fallido (su worker terminó). La tarea periódica de cada worker elimina
+    los trabajos terminados hace más de `ttl` segundos, junto con sus archivos.
+    """
+
+    def __init__(self, app):
+        self.directorio = app.config['REPORT_JOBS_DIR']
+        self.workers = app.config['REPORT_JOBS_WORKERS'] or os.cpu_count()
+        self.ttl = app.config['REPORT_JOBS_TTL']
+        self.heartbeat = app.config['REPORT_JOBS_HEARTBEAT_INTERVAL']
+        os.makedirs(self.directorio, exist_ok=True)
+        self._pool = None
+        self._lock = threading.Lock()
+        self._en_curso = set()  # job_id de los trabajos de este worker aún sin terminar
+
+    def _obtener_pool(self):
+        if self._pool is None:
+            # spawn: los procesos no heredan hilos ni conexiones de la API
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_iniciar_proceso,
+                initargs=(db.engine.url.render_as_string(hide_password=False),)
+            )
+        return self._pool
+
+    def ruta_archivo(self, trabajo):
+        extension, _ = FORMATOS_TRABAJO[trabajo['filters']['formato']]
+        return os.path.join(self.directorio, f"{trabajo['jobId']}.{extension}")
+
+    def _ruta_progreso(self, job_id):
+        return os.path.join(self.directorio, f'{job_id}.progress')
+
+    def _ruta_estado(self, job_id):
+        return os.path.join(self.directorio, f'{job_id}.json')
+
+    def _ruta_activo(self, clave):
+        return os.path.join(self.directorio, f'{clave}.active')
+
+    def _leer_estado(self, job_id):
+        """Estado guardado de un trabajo, o None"""
+        # Los job_id son uuid4 en hexadecimal: cualquier otro valor no es un trabajo
+        if not job_id or len(job_id) != 32 or any(c not in '0123456789abcdef' for c in job_id):
+            return None
+        try:
+            with open(self._ruta_estado(job_id)) as archivo:
+                return json.load(archivo)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _guardar_estado(self, trabajo):
+        _escribir_progreso(self._ruta_estado(trabajo['jobId']), **trabajo)
+
+    def _vigente(self, trabajo):
+        """Trabajo en cola o en curso cuyo worker sigue renovando el latido; si no, se marca como fallido"""
+        if trabajo is None or trabajo['status'] not in ESTADOS_ACTIVOS:
+            return False
+        try:
+            latido = os.stat(self._ruta_estado(trabajo['jobId'])).st_mtime
+        except FileNotFoundError:
+            return False
+        if time.time() - latido <= self.heartbeat * LATIDOS_PERDIDOS:
+            return True
+        trabajo.update(
+            status='failed',
+            error='El worker que encoló el reporte terminó antes de generarlo',
+            finishedAt=datetime.utcnow().isoformat()
+        )
+        self._guardar_estado(trabajo)
+        return False
+
+    def encolar(self, filtros):
+        """Encolar un reporte; retorna (trabajo, nuevo). Requiere contexto de aplicación."""
+        clave = clave_filtros(filtros)
+        ruta_activo = self._ruta_activo(clave)
+        trabajo = {
+            'jobId': uuid.uuid4().hex,
+            'status': 'queued',
+            'filters': filtros,
+            'progress': None,
+            'rows': None,
+            'size': None,
+            'downloadUrl': None,
+            'createdAt': datetime.utcnow().isoformat(),
+            'finishedAt': None,
+            'error': None
+        }
+        self._guardar_estado(trabajo)
+
+        # Tomar `<clave>.active` de forma atómica: si otro worker ya lo creó, se retorna su trabajo
+        while True:
+            try:
+                descriptor = os.open(ruta_activo, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    with open(ruta_activo) as archivo:
+                        existente = self._leer_estado(archivo.read().strip())
+                except FileNotFoundError:
+                    continue
+                if self._vigente(existente):
+                    self._eliminar(self._ruta_estado(trabajo['jobId']))
+                    return self._estado(existente), False
+                # El trabajo anterior terminó sin liberar la clave
+                self._eliminar(ruta_activo)
+                continue
+            with os.fdopen(descriptor, 'w') as archivo:
+                archivo.write(trabajo['jobId'])
+            break
+
+        argumentos = (filtros, self.ruta_archivo(trabajo), self._ruta_progreso(trabajo['jobId']))
+        with self._lock:
+            self._en_curso.add(trabajo['jobId'])
+            try:
+                futuro = self._obtener_pool().submit(_generar_reporte, *argumentos)
+            except BrokenProcessPool:
+                # Un proceso del pool terminó de forma abrupta: se reemplaza el pool completo
+                self._pool = None
+                futuro = self._obtener_pool().submit(_generar_reporte, *argumentos)
+
+        futuro.add_done_callback(lambda futuro: self._terminar(trabajo, clave, futuro))
+        return self._estado(trabajo), True
+
+    def obtener(self, job_id):
+        trabajo = self._leer_estado(job_id)
+        if trabajo is None:
+            return None
+        self._vigente(trabajo)
+        return self._estado(trabajo)
+
+    def _estado(self, trabajo):
+        """Copia pública del trabajo con el avance informado por el proceso"""
+        estado = dict(trabajo)
+        if estado['status'] in ESTADOS_ACTIVOS:
+            try:
+                with open(self._ruta_progreso(trabajo['jobId'])) as archivo:
+                    estado['progress'] = json.load(archivo)
+                estado['status'] = 'running'
+            except (FileNotFoundError, ValueError):
+                pass
+        return estado
+
+    def _terminar(self, trabajo, clave, futuro):
+        cambios = {'finishedAt': datetime.utcnow().isoformat()}
+        try:
+            resultado = futuro.result()
+            cambios.update(
+                status='completed',
+                rows=resultado['rows'],
+                size=resultado['size'],
+                progress={'stage': 'done', 'rows': resultado['rows'], 'totalRows': resultado['rows']},
+                downloadUrl=f"/api/reportes/jobs/{trabajo['jobId']}/archivo"
+            )
+        except Exception as e:
+            cambios.update(status='failed', error=str(e) or e.__class__.__name__)
+            if isinstance(e, BrokenProcessPool):
+                with self._lock:
+                    self._pool = None
+
+        trabajo.update(cambios)
+        self._guardar_estado(trabajo)
+        with self._lock:
+            self._en_curso.discard(trabajo['jobId'])
+        try:
+            with open(self._ruta_activo(clave)) as archivo:
+                if archivo.read().strip() == trabajo['jobId']:
+                    os.remove(self._ruta_activo(clave))
+        except FileNotFoundError:
+            pass
+        self._eliminar(self._ruta_progreso(trabajo['jobId']))
+        if cambios['status'] == 'completed':
+            print(f"✅ Reporte {trabajo['filters']['formato']} {trabajo['jobId']}: {cambios['rows']} filas, {cambios['size']} bytes")
+        else:
+            print(f"⚠️  Error generando reporte {trabajo['jobId']}: {cambios['error']}")
+
+    def mantener(self):
+        """Tarea periódica: renovar el latido de los trabajos de este worker y purgar los vencidos"""
+        with self._lock:
+            en_curso = list(self._en_curso)
+        for job_id in en_curso:
+            try:
+                os.utime(self._ruta_estado(job_id))
+            except FileNotFoundError:
+                pass
+        self._purgar()
+
+    def _purgar(self):
+        """Eliminar los trabajos terminados hace más de ttl segundos, junto con sus archivos"""
+        limite = (datetime.utcnow() - timedelta(seconds=self.ttl)).isoformat()
+        for nombre in os.listdir(self.directorio):
+            if not nombre.endswith('.json'):
+                continue
+            trabajo = self._leer_estado(nombre[:-len('.json')])
+            # Un trabajo activo sin latido queda como fallido y se purga tras ttl
+            if trabajo is None or self._vigente(trabajo) or not trabajo['finishedAt'] or trabajo['finishedAt'] >= limite:
+                continue
+            for ruta in (self.ruta_archivo(trabajo), self._ruta_progreso(trabajo['jobId']), self._ruta_estado(trabajo['jobId'])):
+                self._eliminar(ruta)
+
+    def _eliminar(self, ruta):
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+
+    def cerrar(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+
+def iniciar_trabajos_reportes(app):
+    """Crear la cola de trabajos de reportes de la aplicación (el pool parte con el primer trabajo)"""
+    cola = ColaReportes(app)
+    app.extensions['trabajos_reportes'] = cola
+    iniciar_tarea_periodica(app, 'trabajos-reportes', cola.heartbeat, cola.mantener)
+    return cola
@@ -0,0 +1,72 @@
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import select, update
+from api.models import db, Event, Reservation
+from api.utils.background import iniciar_tarea_periodica
+from api.utils.inventory import liberar_entradas
+
+
+def liberar_reservas_expiradas(batch_size=500):
+    """Marcar como expiradas las reservas vencidas y devolver sus entradas.
+
+    Trabaja por lotes: un SELECT ... FOR UPDATE SKIP LOCKED toma el lote
+    (otro proceso que barre en paralelo salta esas filas), un UPDATE por id lo
+    marca y luego se hace un único UPDATE de inventario por evento afectado.
+    No usa UPDATE ... RETURNING ni LIMIT en subconsultas, que MySQL no admite.
+    Como el UPDATE solo toca reservas aún 'active', una reserva confirmada o
+    cancelada en paralelo nunca se libera dos veces: si el UPDATE no marca el
+    lote completo (SQLite no bloquea filas), el lote se revierte y queda para
+    el siguiente ciclo. Retorna la cantidad de reservas liberadas.
+    """
+    total_liberadas = 0
+
+    while True:
+        ahora = datetime.utcnow()
+        filas = db.session.execute(
+            select(Reservation.id, Reservation.event_id, Reservation.quantity)
+            .where(Reservation.status == 'active', Reservation.expires_at <= ahora)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+
+        if not filas:
+            db.session.commit()
+            break
+
+        marcadas = db.session.execute(
+            update(Reservation)
+            .where(Reservation.id.in_([reservation_id for reservation_id, _, _ in filas]), Reservation.status == 'active')
+            .values(status='expired', updated_at=ahora)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if marcadas != len(filas):
+            db.session.rollback()
+            break
+
+        # Agrupar por evento para devolver el inventario con un solo UPDATE por evento
+        por_evento = defaultdict(int)
+        for _, event_id, quantity in filas:
+            por_evento[event_id] += quantity
+        eventos = Event.query.filter(Event.id.in_(por_evento.keys())).all()
+        for event in eventos:
+            liberar_entradas(event, por_evento[event.id])
+
+        db.session.commit()
+        total_liberadas += len(filas)
+
+        if len(filas) < batch_size:
+            break
+
+    return total_liberadas
+
+
+def iniciar_barrido_reservas(app):
+    """Iniciar un hilo en segundo plano que libera reservas vencidas periódicamente"""
+    batch_size = app.config['RESERVATION_SWEEP_BATCH_SIZE']
+
+    def barrer():
+        liberadas = liberar_reservas_expiradas(batch_size)
+        if liberadas:
+            print(f"♻️  {liberadas} reservas vencidas liberadas")
+
+    return iniciar_tarea_periodica(app, 'barrido-reservas', app.config['RESERVATION_SWEEP_INTERVAL'], barrer)
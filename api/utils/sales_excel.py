@@ -0,0 +1,145 @@
+from datetime import datetime
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+
+# Filas de datos por hoja de detalle: el máximo de Excel (1.048.576) menos título, línea en blanco y encabezados
+MAX_FILAS_HOJA = 1_048_576 - 3
+
+FORMATO_MONTO = '"$"#,##0'
+FORMATO_FECHA = 'dd/mm/yyyy hh:mm'
+
+ENCABEZADOS_DETALLE = ['Fecha Venta', 'Evento', 'Cliente', 'Sector', 'Cantidad', 'Precio Unit.', 'Total']
+ANCHOS_DETALLE = [18, 25, 20, 15, 10, 15, 15]
+
+
+def _estilos(wb):
+    """Registrar en el libro los estilos compartidos por todas las celdas con formato"""
+    borde = Side(style='thin')
+    estilos = [
+        NamedStyle(
+            'encabezado',
+            font=Font(color="FFFFFF", bold=True, size=12),
+            fill=PatternFill(start_color="2563eb", end_color="2563eb", fill_type="solid"),
+            border=Border(left=borde, right=borde, top=borde, bottom=borde),
+            alignment=Alignment(horizontal='center')
+        ),
+        NamedStyle('titulo', font=Font(bold=True, size=16, color="1e3a8a")),
+        NamedStyle('celda', border=Border(left=borde, right=borde, top=borde, bottom=borde)),
+    ]
+    for estilo in estilos:
+        wb.add_named_style(estilo)
+
+
+def _celda(ws, valor, estilo):
+    celda = WriteOnlyCell(ws, valor)
+    celda.style = estilo
+    return celda
+
+
+def _celda_con_formato(ws, formato):
+    celda = WriteOnlyCell(ws)
+    celda.number_format = formato
+    return celda
+
+
+def _hoja(wb, titulo, encabezado, columnas, anchos):
+    """Hoja con título (fila 1), una fila en blanco y los encabezados de columna (fila 3)"""
+    ws = wb.create_sheet(titulo)
+    for letra, ancho in zip('ABCDEFG', anchos):
+        ws.column_dimensions[letra].width = ancho
+    ws.merged_cells.add(f'A1:{"ABCDEFG"[len(columnas) - 1]}1')
+    ws.append([_celda(ws, encabezado, 'titulo')])
+    ws.append([])
+    ws.append([_celda(ws, columna, 'encabezado') for columna in columnas])
+    return ws
+
+
+def escribir_excel_reporte(data, lotes, destino):
+    """Escribir el reporte de ventas como Excel en `destino` (ruta o archivo binario).
+
+    Usa hojas de solo escritura: cada fila se serializa al agregarla y no
+    queda en memoria. `lotes` es un iterable de listas de filas de
+    lotes_ventas; todas van a la hoja de detalle (que continúa en hojas
+    adicionales si supera el máximo de filas de Excel). Las filas de detalle
+    reutilizan las mismas celdas con formato de fecha y monto en vez de crear
+    una celda con estilo por valor. Retorna la cantidad de filas de detalle.
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    _estilos(wb)
+
+    # Hoja 1: Resumen Ejecutivo
+    ws1 = wb.create_sheet("Resumen Ejecutivo")
+    ws1.column_dimensions['A'].width = 25
+    ws1.column_dimensions['B'].width = 30
+    ws1.merged_cells.add('A1:B1')
+    ws1.merged_cells.add('A2:B2')
+    ws1.append([_celda(ws1, 'REPORTE DE VENTAS', 'titulo')])
+    ws1.append([f'Generado: {datetime.now().strftime("%d/%m/%Y %H:%M")}'])
+    ws1.append([])
+
+    resumen = data['resumen_ejecutivo']
+    metricas = [
+        ('Total Ventas', f"${resumen['total_ventas']:,.0f} CLP"),
+        ('Total Entradas', f"{resumen['total_entradas']:,}"),
+        ('Promedio por Venta', f"${resumen['promedio_venta']:,.0f} CLP"),
+    ]
+    if resumen.get('sector_mas_vendido'):
+        metricas.append(('Sector Más Vendido', resumen['sector_mas_vendido']))
+    if resumen.get('sector_mayor_ingreso'):
+        metricas.append(('Sector Mayor Ingreso', resumen['sector_mayor_ingreso']))
+
+    ws1.append([_celda(ws1, 'Métrica', 'encabezado'), _celda(ws1, 'Valor', 'encabezado')])
+    for metrica, valor in metricas:
+        ws1.append([_celda(ws1, metrica, 'celda'), _celda(ws1, valor, 'celda')])
+
+    # Hoja 2: Análisis por Sector
+    if data['analisis_por_sector']:
+        ws2 = _hoja(
+            wb, "Análisis por Sector", 'ANÁLISIS POR SECTOR',
+            ['Sector', 'Entradas Vendidas', 'Total Ventas', 'Precio Promedio'], [20, 18, 18, 18]
+        )
+        for sector, analisis in data['analisis_por_sector'].items():
+            ws2.append([_celda(ws2, valor, 'celda') for valor in (
+                sector,
+                analisis['entradas_vendidas'],
+                f"${analisis['total_ventas']:,.0f}",
+                f"${analisis['precio_promedio']:,.0f}"
+            )])
+
+    # Hojas de Datos Detallados: se crean con el primer lote, así un reporte sin ventas no las incluye
+    ws3 = None
+    hojas = 0
+    en_hoja = 0
+    escritas = 0
+    for filas in lotes:
+        for _, purchase_date, cantidad, precio_unitario, total_precio, user_id, nombre, evento_id, titulo, _, _, sector in filas:
+            if ws3 is None or en_hoja == MAX_FILAS_HOJA:
+                hojas += 1
+                ws3 = _hoja(
+                    wb, "Datos Detallados" if hojas == 1 else f"Datos Detallados ({hojas})", 'VENTAS DETALLADAS',
+                    ENCABEZADOS_DETALLE, ANCHOS_DETALLE
+                )
+                ws3.freeze_panes = 'A4'
+                fecha = _celda_con_formato(ws3, FORMATO_FECHA)
+                precio = _celda_con_formato(ws3, FORMATO_MONTO)
+                total = _celda_con_formato(ws3, FORMATO_MONTO)
+                en_hoja = 0
+
+            fecha.value = purchase_date if purchase_date else 'N/A'
+            precio.value = precio_unitario
+            total.value = total_precio
+            ws3.append((
+                fecha,
+                titulo[:30] if evento_id is not None else '',
+                nombre if user_id is not None else 'Cliente',
+                sector,
+                cantidad,
+                precio,
+                total
+            ))
+            en_hoja += 1
+        escritas += len(filas)
+
+    wb.save(destino)
+    return escritas
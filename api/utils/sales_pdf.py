@@ -0,0 +1,145 @@
+from datetime import datetime
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.lib.enums import TA_CENTER
+
+
+def escribir_pdf_reporte(data, destino):
+    """Escribir el reporte de ventas como PDF en `destino` (ruta o archivo binario).
+
+    Solo usa los agregados de `data` (resumen_ejecutivo, analisis_por_sector,
+    analisis_por_evento), por lo que puede ejecutarse en un proceso aparte.
+    """
+    doc = SimpleDocTemplate(destino, pagesize=A4, 
+                          rightMargin=72, leftMargin=72,
+                          topMargin=72, bottomMargin=18)
+    
+    # Container para los elementos del PDF
+    elements = []
+    
+    # Estilos
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#1e3a8a'),
+        spaceAfter=30,
+        alignment=TA_CENTER
+    )
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=16,
+        textColor=colors.HexColor('#2563eb'),
+        spaceAfter=12,
+        spaceBefore=12
+    )
+    
+    # Título
+    elements.append(Paragraph("Reporte de Ventas", title_style))
+    elements.append(Paragraph(f"Generado: {datetime.now().strftime('%d/%m/%Y %H:%M')}", styles['Normal']))
+    elements.append(Spacer(1, 20))
+    
+    # Resumen Ejecutivo
+    elements.append(Paragraph("Resumen Ejecutivo", heading_style))
+    
+    resumen = data['resumen_ejecutivo']
+    resumen_data = [
+        ['Métrica', 'Valor'],
+        ['Total Ventas', f"${resumen['total_ventas']:,.0f} CLP"],
+        ['Total Entradas', f"{resumen['total_entradas']:,}"],
+        ['Promedio por Venta', f"${resumen['promedio_venta']:,.0f} CLP"],
+    ]
+    
+    if resumen.get('sector_mas_vendido'):
+        resumen_data.append(['Sector Más Vendido', resumen['sector_mas_vendido']])
+    if resumen.get('sector_mayor_ingreso'):
+        resumen_data.append(['Sector Mayor Ingreso', resumen['sector_mayor_ingreso']])
+    
+    resumen_table = Table(resumen_data, colWidths=[3*inch, 3*inch])
+    resumen_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2563eb')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 10),
+        ('TOPPADDING', (0, 1), (-1, -1), 8),
+        ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
+    ]))
+    elements.append(resumen_table)
+    elements.append(Spacer(1, 20))
+    
+    # Análisis por Sector
+    if data['analisis_por_sector']:
+        elements.append(Paragraph("Análisis por Sector", heading_style))
+        
+        sector_data = [['Sector', 'Entradas', 'Ventas', 'Precio Prom.']]
+        for sector, analisis in data['analisis_por_sector'].items():
+            sector_data.append([
+                sector,
+                f"{analisis['entradas_vendidas']:,}",
+                f"${analisis['total_ventas']:,.0f}",
+                f"${analisis['precio_promedio']:,.0f}"
+            ])
+        
+        sector_table = Table(sector_data, colWidths=[2*inch, 1.5*inch, 1.5*inch, 1.5*inch])
+        sector_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2563eb')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 11),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 9),
+            ('TOPPADDING', (0, 1), (-1, -1), 6),
+            ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
+        ]))
+        elements.append(sector_table)
+        elements.append(Spacer(1, 20))
+    
+    # Análisis por Evento
+    if data['analisis_por_evento']:
+        elements.append(Paragraph("Análisis por Evento", heading_style))
+        
+        evento_data = [['Evento', 'Entradas', 'Ventas Totales']]
+        for evento, analisis in sorted(data['analisis_por_evento'].items(), 
+                                      key=lambda x: x[1]['total_ventas'], 
+                                      reverse=True):
+            evento_data.append([
+                evento[:40] + '...' if len(evento) > 40 else evento,
+                f"{analisis['total_entradas']:,}",
+                f"${analisis['total_ventas']:,.0f}"
+            ])
+        
+        evento_table = Table(evento_data, colWidths=[3*inch, 1.5*inch, 2*inch])
+        evento_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2563eb')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('ALIGN', (1, 1), (2, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 11),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 9),
+            ('TOPPADDING', (0, 1), (-1, -1), 6),
+            ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
+        ]))
+        elements.append(evento_table)
+    
+    # Construir PDF
+    doc.build(elements)
@@ -0,0 +1,192 @@
+from datetime import datetime
+from sqlalchemy import and_, func, or_, select
+from api.models import db, Event, Purchase, User
+from api.utils.attendance import ESTADOS_SIN_VENTA
+
+# Sector de una compra: categoría del evento, o 'General' si no tiene (o el evento no existe)
+SECTOR = func.coalesce(func.nullif(Event.category, ''), 'General')
+
+# Columnas de cada fila detallada, en el orden de las exportaciones CSV
+COLUMNAS_DETALLE = (
+    'id', 'fecha_venta', 'cantidad', 'precio_unitario', 'total', 'cliente_nombre', 'cliente_rut',
+    'metodo_pago', 'evento_nombre', 'fecha_evento', 'lugar', 'sector_nombre'
+)
+
+# Filas leídas por consulta al recorrer el detalle completo de ventas
+FILAS_POR_LOTE = 2000
+
+
+def periodo_ventas(fecha_inicio=None, fecha_fin=None):
+    """Fechas del filtro del reporte como datetime (las fechas inválidas se ignoran)"""
+    periodo = []
+    for valor in (fecha_inicio, fecha_fin):
+        try:
+            periodo.append(datetime.fromisoformat(valor) if valor else None)
+        except ValueError:
+            periodo.append(None)
+    return tuple(periodo)
+
+
+def filtros_ventas(evento_id=None, fecha_inicio=None, fecha_fin=None):
+    """Condiciones WHERE sobre Purchase para los filtros del reporte.
+
+    Las compras canceladas o reembolsadas no cuentan como ventas.
+    """
+    desde, hasta = periodo_ventas(fecha_inicio, fecha_fin)
+    condiciones = [Purchase.status.notin_(ESTADOS_SIN_VENTA)]
+    if evento_id:
+        condiciones.append(Purchase.event_id == str(evento_id))
+    if desde:
+        condiciones.append(Purchase.purchase_date >= desde)
+    if hasta:
+        condiciones.append(Purchase.purchase_date <= hasta)
+    return condiciones
+
+
+def grupos_compras(condiciones):
+    """Ventas agrupadas por evento (con su sector) directamente desde purchases.
+
+    Retorna filas (event_id, titulo, sector, compras, entradas, total, ultima_compra).
+    """
+    return db.session.execute(
+        select(
+            Purchase.event_id, Event.title, SECTOR, func.count(Purchase.id), func.sum(Purchase.quantity),
+            func.sum(Purchase.total_price), func.max(Purchase.purchase_date)
+        )
+        .select_from(Purchase)
+        .outerjoin(Event, Purchase.event_id == Event.id)
+        .where(*condiciones)
+        .group_by(Purchase.event_id, Event.title, SECTOR)
+    ).all()
+
+
+def resumen_ventas(grupos):
+    """Resumen ejecutivo y análisis por sector y por evento a partir de ventas agrupadas por evento.
+
+    Sectores y eventos se ordenan por su compra más reciente, igual que
+    cuando se recorrían las compras de la más nueva a la más antigua: así los
+    empates de sector_mas_vendido y sector_mayor_ingreso se resuelven igual.
+
+    Retorna (resumen_ejecutivo, analisis_por_sector, analisis_por_evento, cantidad_compras).
+    """
+    grupos = sorted(grupos, key=lambda grupo: grupo[6] or datetime.min, reverse=True)
+
+    analisis_por_sector = {}
+    analisis_por_evento = {}
+    for event_id, titulo, sector, _, entradas, total, _ in grupos:
+        analisis = analisis_por_sector.setdefault(sector, {'entradas_vendidas': 0, 'total_ventas': 0.0, 'precio_promedio': 0.0})
+        analisis['entradas_vendidas'] += entradas
+        analisis['total_ventas'] += total
+
+        # Eventos con el mismo título se reportan juntos
+        nombre = titulo if titulo is not None else f'Evento {event_id}'
+        analisis = analisis_por_evento.setdefault(nombre, {'total_ventas': 0.0, 'total_entradas': 0})
+        analisis['total_ventas'] += total
+        analisis['total_entradas'] += entradas
+
+    for analisis in analisis_por_sector.values():
+        entradas = analisis['entradas_vendidas']
+        analisis['precio_promedio'] = (analisis['total_ventas'] / entradas) if entradas else 0
+
+    cantidad_compras = sum(grupo[3] for grupo in grupos)
+    total_ventas = sum(grupo[5] for grupo in grupos)
+    resumen_ejecutivo = {
+        'total_ventas': total_ventas,
+        'total_entradas': sum(grupo[4] for grupo in grupos),
+        'promedio_venta': (total_ventas / cantidad_compras) if cantidad_compras else 0,
+        'sector_mas_vendido': max(analisis_por_sector.items(), key=lambda x: x[1]['entradas_vendidas'])[0] if analisis_por_sector else None,
+        'sector_mayor_ingreso': max(analisis_por_sector.items(), key=lambda x: x[1]['total_ventas'])[0] if analisis_por_sector else None
+    }
+    return resumen_ejecutivo, analisis_por_sector, analisis_por_evento, cantidad_compras
+
+
+def _consulta_detalle(condiciones):
+    return (
+        select(
+            Purchase.id, Purchase.purchase_date, Purchase.quantity, Purchase.unit_price, Purchase.total_price,
+            User.id.label('user_id'), User.name, Event.id.label('evento_id'), Event.title, Event.date, Event.venue,
+            SECTOR.label('sector')
+        )
+        .select_from(Purchase)
+        .outerjoin(User, Purchase.user_id == User.id)
+        .outerjoin(Event, Purchase.event_id == Event.id)
+        .where(*condiciones)
+    )
+
+
+def _fila_detalle(fila):
+    id_, fecha, cantidad, precio_unitario, total, user_id, nombre, evento_id, titulo, fecha_evento, lugar, sector = fila
+    con_evento = evento_id is not None
+    return {
+        'id': id_,
+        'fecha_venta': fecha.isoformat() if fecha else None,
+        'cantidad': cantidad,
+        'precio_unitario': precio_unitario,
+        'total': total,
+        'cliente_nombre': nombre if user_id is not None else 'Cliente',
+        'cliente_rut': '',
+        'metodo_pago': 'online',
+        'evento_nombre': titulo if con_evento else '',
+        'fecha_evento': fecha_evento if con_evento else '',
+        'lugar': lugar if con_evento else '',
+        'sector_nombre': sector,
+    }
+
+
+def detalle_ventas(condiciones, limite=None):
+    """Filas detalladas del reporte (una por compra, de la más reciente a la más antigua).
+
+    Una sola consulta con las columnas necesarias, sin cargar objetos ORM ni
+    relaciones por fila.
+    """
+    consulta = _consulta_detalle(condiciones).order_by(Purchase.purchase_date.desc())
+    if limite is not None:
+        consulta = consulta.limit(limite)
+
+    return [_fila_detalle(fila) for fila in db.session.execute(consulta)]
+
+
+def lotes_ventas(condiciones, tamano=FILAS_POR_LOTE):
+    """Compras del reporte en lotes de hasta `tamano` filas, de la más reciente a la más antigua.
+
+    Pensado para exportar todas las ventas con memoria acotada: cada lote es
+    una consulta paginada por clave (purchase_date, id) sobre el índice
+    ix_purchases_purchase_date_id, y entre lotes se cierra la transacción de
+    lectura para que una descarga lenta no bloquee las compras en SQLite.
+    Las compras sin fecha van al final. Cada fila trae (id, purchase_date,
+    quantity, unit_price, total_price, user_id, name, evento_id, title, date,
+    venue, sector).
+    """
+    for con_fecha in (True, False):
+        ultima = None
+        while True:
+            if con_fecha:
+                consulta = _consulta_detalle(condiciones).where(Purchase.purchase_date.isnot(None))
+                if ultima is not None:
+                    # La cota simple sobre purchase_date deja el rango del índice acotado; el OR desempata por id
+                    consulta = consulta.where(Purchase.purchase_date <= ultima.purchase_date, or_(
+                        Purchase.purchase_date < ultima.purchase_date,
+                        and_(Purchase.purchase_date == ultima.purchase_date, Purchase.id < ultima.id)
+                    ))
+                consulta = consulta.order_by(Purchase.purchase_date.desc(), Purchase.id.desc())
+            else:
+                consulta = _consulta_detalle(condiciones).where(Purchase.purchase_date.is_(None))
+                if ultima is not None:
+                    consulta = consulta.where(Purchase.id < ultima.id)
+                consulta = consulta.order_by(Purchase.id.desc())
+
+            try:
+                filas = db.session.execute(consulta.limit(tamano)).all()
+            finally:
+                db.session.rollback()
+            if filas:
+                yield filas
+            if len(filas) < tamano:
+                break
+            ultima = filas[-1]
+
+
+def lotes_detalle_ventas(condiciones, tamano=FILAS_POR_LOTE):
+    """Filas detalladas del reporte (diccionarios como los de detalle_ventas) en lotes; ver lotes_ventas"""
+    for filas in lotes_ventas(condiciones, tamano):
+        yield [_fila_detalle(fila) for fila in filas]
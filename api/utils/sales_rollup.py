@@ -0,0 +1,359 @@
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import case, delete, func, insert, select, union_all, update
+from sqlalchemy.exc import IntegrityError
+from api.models import db, Event, Purchase, SalesChange, SalesDailyRollup, SalesDataVersion
+from api.utils.attendance import ESTADOS_SIN_VENTA, registrar_venta
+from api.utils.background import iniciar_tarea_periodica
+from api.utils.sales_report import SECTOR, filtros_ventas, grupos_compras, periodo_ventas
+
+# Diferencia máxima aceptada entre montos del resumen y de purchases (sumas de punto flotante)
+TOLERANCIA_MONTOS = 0.01
+
+# Cambios de sales_changes aplicados por transacción
+CAMBIOS_POR_LOTE = 1000
+
+
+def categoria_venta(categoria):
+    """Categoría con la que se agrupan las ventas de un evento (igual que el sector del reporte)"""
+    return categoria or 'General'
+
+
+def version_ventas():
+    """Versión actual de los datos de ventas, como texto: cambia con cada escritura que afecta los reportes.
+
+    Combina la fila de sales_data_version con la cantidad y el id máximo de
+    sales_changes. Las compras solo insertan en sales_changes (la cantidad
+    crece), y quien elimina cambios (aplicar_cambios_ventas, reconstruir_resumen)
+    aumenta la versión en la misma transacción; así ninguna compra escribe
+    sobre una fila compartida. Se lee en una sola consulta.
+    """
+    version, cambios, ultimo = db.session.execute(select(
+        select(SalesDataVersion.version).where(SalesDataVersion.id == 1).scalar_subquery(),
+        select(func.count(SalesChange.id)).scalar_subquery(),
+        select(func.max(SalesChange.id)).scalar_subquery()
+    )).one()
+    return f'{version or 0}.{cambios}.{ultimo or 0}'
+
+
+def incrementar_version_ventas():
+    """Aumentar la versión de los datos de ventas en la transacción actual. No hace commit.
+
+    Llamar en las escrituras administrativas o de segundo plano que cambien
+    el resultado de un reporte (no en cada compra: las compras cambian la
+    versión al insertar en sales_changes).
+    """
+    def actualizar():
+        return db.session.execute(
+            update(SalesDataVersion)
+            .where(SalesDataVersion.id == 1)
+            .values(version=SalesDataVersion.version + 1, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+    if actualizar():
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(SalesDataVersion).values(id=1, version=1, updated_at=datetime.utcnow()))
+    except IntegrityError:
+        actualizar()
+
+
+def registrar_venta_diaria(purchase, event, signo=1):
+    """Registrar (signo=1) o descontar (signo=-1) una compra para el resumen diario de ventas.
+
+    Solo inserta una fila en sales_changes: la transacción de la compra no
+    actualiza filas compartidas con otras compras del mismo evento y día.
+    aplicar_cambios_ventas la suma al resumen y a las vendidas del evento en
+    segundo plano. No hace commit.
+    """
+    db.session.execute(insert(SalesChange).values(
+        event_id=event.id,
+        day=purchase.purchase_date.date(),
+        purchases=signo,
+        tickets=signo * purchase.quantity,
+        revenue=signo * purchase.total_price,
+        purchase_date=purchase.purchase_date if signo > 0 else None,
+        created_at=datetime.utcnow()
+    ))
+
+
+def _sumar_al_resumen(dia, event_id, categoria, compras, entradas, total, ultima):
+    """Sumar ventas a la fila (día, evento, categoría) del resumen.
+
+    Un UPDATE atómico; si la fila aún no existe se inserta dentro de un
+    savepoint, y si otra transacción la insertó primero se repite el UPDATE.
+    """
+    clave = (
+        SalesDailyRollup.day == dia,
+        SalesDailyRollup.event_id == event_id,
+        SalesDailyRollup.category == categoria
+    )
+    valores = {
+        'purchases': SalesDailyRollup.purchases + compras,
+        'tickets': SalesDailyRollup.tickets + entradas,
+        'revenue': SalesDailyRollup.revenue + total,
+        'updated_at': datetime.utcnow()
+    }
+    if ultima is not None:
+        valores['last_purchase_at'] = case(
+            (SalesDailyRollup.last_purchase_at >= ultima, SalesDailyRollup.last_purchase_at),
+            else_=ultima
+        )
+
+    def actualizar():
+        return db.session.execute(
+            update(SalesDailyRollup).where(*clave).values(**valores).execution_options(synchronize_session=False)
+        ).rowcount
+
+    if actualizar():
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(SalesDailyRollup).values(
+                day=dia,
+                event_id=event_id,
+                category=categoria,
+                purchases=compras,
+                tickets=entradas,
+                revenue=total,
+                last_purchase_at=ultima,
+                updated_at=datetime.utcnow()
+            ))
+    except IntegrityError:
+        actualizar()
+
+
+def aplicar_cambios_ventas():
+    """Sumar al resumen diario y a las vendidas de cada evento los cambios pendientes de sales_changes.
+
+    Retorna los cambios aplicados.
+
+    Cada lote se aplica y se elimina en una transacción. Las filas se
+    eliminan antes de aplicarlas: si otro proceso ya eliminó alguna (la está
+    aplicando en paralelo) el lote se revierte y queda para el siguiente ciclo.
+    """
+    aplicados = 0
+    while True:
+        cambios = db.session.execute(
+            select(
+                SalesChange.id, SalesChange.event_id, SalesChange.day, SalesChange.purchases,
+                SalesChange.tickets, SalesChange.revenue, SalesChange.purchase_date
+            )
+            .order_by(SalesChange.id)
+            .limit(CAMBIOS_POR_LOTE)
+        ).all()
+        if not cambios:
+            db.session.rollback()
+            return aplicados
+
+        ids = [cambio[0] for cambio in cambios]
+        eliminados = db.session.execute(
+            delete(SalesChange).where(SalesChange.id.in_(ids)).execution_options(synchronize_session=False)
+        ).rowcount
+        if eliminados != len(ids):
+            db.session.rollback()
+            return aplicados
+
+        por_fila = {}  # (dia, event_id) -> [compras, entradas, total, ultima]
+        por_evento = {}  # event_id -> entradas
+        for _, event_id, dia, compras, entradas, total, fecha in cambios:
+            por_evento[event_id] = por_evento.get(event_id, 0) + entradas
+            fila = por_fila.setdefault((dia, event_id), [0, 0, 0.0, None])
+            fila[0] += compras
+            fila[1] += entradas
+            fila[2] += total
+            if fecha is not None and (fila[3] is None or fecha > fila[3]):
+                fila[3] = fecha
+
+        categorias = dict(db.session.execute(
+            select(Event.id, Event.category).where(Event.id.in_({event_id for _, event_id in por_fila}))
+        ).all())
+        for (dia, event_id), (compras, entradas, total, ultima) in por_fila.items():
+            _sumar_al_resumen(dia, event_id, categoria_venta(categorias.get(event_id)), compras, entradas, total, ultima)
+        for event_id, entradas in por_evento.items():
+            if entradas:
+                registrar_venta(event_id, entradas)
+        incrementar_version_ventas()
+        db.session.commit()
+
+        aplicados += len(cambios)
+        if len(cambios) < CAMBIOS_POR_LOTE:
+            return aplicados
+
+
+def recategorizar_ventas(event_id, categoria):
+    """Mover las ventas de un evento a su nueva categoría en el resumen diario. No hace commit."""
+    incrementar_version_ventas()
+    db.session.execute(
+        update(SalesDailyRollup)
+        .where(SalesDailyRollup.event_id == event_id)
+        .values(category=categoria_venta(categoria), updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def grupos_ventas(evento_id=None, fecha_inicio=None, fecha_fin=None):
+    """Ventas agrupadas por evento para el reporte, con los días completos leídos del resumen diario.
+
+    Los días que el filtro cubre solo en parte (el del inicio, si no empieza
+    a medianoche, y el del fin, que incluye solo hasta la hora indicada) se
+    leen de purchases. Los cambios de sales_changes aún no aplicados se suman
+    al resumen, por lo que el reporte incluye todas las compras confirmadas.
+    Retorna filas con el mismo formato que grupos_compras.
+    """
+    desde, hasta = periodo_ventas(fecha_inicio, fecha_fin)
+    primer_dia = None
+    ultimo_dia = None
+    if desde:
+        primer_dia = desde.date() if desde.time() == time.min else desde.date() + timedelta(days=1)
+    if hasta:
+        ultimo_dia = hasta.date() - timedelta(days=1)
+    if primer_dia and ultimo_dia and primer_dia > ultimo_dia:
+        return grupos_compras(filtros_ventas(evento_id, fecha_inicio, fecha_fin))
+
+    def condiciones(tabla):
+        resultado = []
+        if evento_id:
+            resultado.append(tabla.event_id == str(evento_id))
+        if primer_dia:
+            resultado.append(tabla.day >= primer_dia)
+        if ultimo_dia:
+            resultado.append(tabla.day <= ultimo_dia)
+        return resultado
+
+    ventas = union_all(
+        select(
+            SalesDailyRollup.event_id, SalesDailyRollup.category.label('category'), SalesDailyRollup.purchases,
+            SalesDailyRollup.tickets, SalesDailyRollup.revenue, SalesDailyRollup.last_purchase_at.label('ultima')
+        ).where(*condiciones(SalesDailyRollup)),
+        select(
+            SalesChange.event_id, SECTOR.label('category'), SalesChange.purchases,
+            SalesChange.tickets, SalesChange.revenue, SalesChange.purchase_date.label('ultima')
+        )
+        .select_from(SalesChange)
+        .outerjoin(Event, SalesChange.event_id == Event.id)
+        .where(*condiciones(SalesChange))
+    ).subquery()
+    grupos = db.session.execute(
+        select(
+            ventas.c.event_id, Event.title, ventas.c.category, func.sum(ventas.c.purchases),
+            func.sum(ventas.c.tickets), func.sum(ventas.c.revenue), func.max(ventas.c.ultima)
+        )
+        .select_from(ventas)
+        .outerjoin(Event, ventas.c.event_id == Event.id)
+        .group_by(ventas.c.event_id, Event.title, ventas.c.category)
+        .having(func.sum(ventas.c.purchases) > 0)
+    ).all()
+
+    # Días parciales en los extremos del filtro
+    if desde and desde.time() != time.min:
+        grupos += grupos_compras(filtros_ventas(evento_id) + [
+            Purchase.purchase_date >= desde,
+            Purchase.purchase_date < datetime.combine(primer_dia, time.min)
+        ])
+    if hasta:
+        grupos += grupos_compras(filtros_ventas(evento_id) + [
+            Purchase.purchase_date >= datetime.combine(hasta.date(), time.min),
+            Purchase.purchase_date <= hasta
+        ])
+    return grupos
+
+
+def _ventas_por_dia():
+    """Ventas de purchases agrupadas por (día, evento): {(dia, event_id): (categoria, compras, entradas, total, ultima)}"""
+    dia = func.date(Purchase.purchase_date)
+    filas = db.session.execute(
+        select(
+            dia, Purchase.event_id, Event.category, func.count(Purchase.id), func.sum(Purchase.quantity),
+            func.sum(Purchase.total_price), func.max(Purchase.purchase_date)
+        )
+        .select_from(Purchase)
+        .outerjoin(Event, Purchase.event_id == Event.id)
+        .where(Purchase.status.notin_(ESTADOS_SIN_VENTA), Purchase.purchase_date.isnot(None))
+        .group_by(dia, Purchase.event_id, Event.category)
+    ).all()
+    return {
+        (date.fromisoformat(dia) if isinstance(dia, str) else dia, event_id): (categoria_venta(categoria), compras, entradas, total, ultima)
+        for dia, event_id, categoria, compras, entradas, total, ultima in filas
+    }
+
+
+def reconstruir_resumen():
+    """Recalcular desde cero el resumen diario a partir de purchases. Hace commit; retorna las filas escritas.
+
+    Descarta también los cambios pendientes de sales_changes, que ya están
+    contados en purchases. Pensado para ejecutarse sin compras en curso.
+    """
+    ventas = _ventas_por_dia()
+    db.session.execute(delete(SalesChange))
+    db.session.execute(delete(SalesDailyRollup))
+    ahora = datetime.utcnow()
+    if ventas:
+        db.session.execute(insert(SalesDailyRollup), [
+            {
+                'day': dia, 'event_id': event_id, 'category': categoria, 'purchases': compras,
+                'tickets': entradas, 'revenue': total, 'last_purchase_at': ultima, 'updated_at': ahora
+            }
+            for (dia, event_id), (categoria, compras, entradas, total, ultima) in ventas.items()
+        ])
+    incrementar_version_ventas()
+    db.session.commit()
+    return len(ventas)
+
+
+def verificar_resumen():
+    """Comparar el resumen diario (más los cambios aún no aplicados) con purchases.
+
+    Retorna una lista de diferencias (vacía si coinciden).
+    """
+    esperado = {clave: valores[:4] for clave, valores in _ventas_por_dia().items()}
+    sumas = {}
+    for fila in db.session.execute(select(SalesDailyRollup)).scalars():
+        sumas[(fila.day, fila.event_id)] = [fila.category, fila.purchases, fila.tickets, fila.revenue]
+    pendientes = db.session.execute(
+        select(
+            SalesChange.day, SalesChange.event_id, Event.category, func.sum(SalesChange.purchases),
+            func.sum(SalesChange.tickets), func.sum(SalesChange.revenue)
+        )
+        .select_from(SalesChange)
+        .outerjoin(Event, SalesChange.event_id == Event.id)
+        .group_by(SalesChange.day, SalesChange.event_id, Event.category)
+    ).all()
+    for dia, event_id, categoria, compras, entradas, total in pendientes:
+        suma = sumas.setdefault((dia, event_id), [categoria_venta(categoria), 0, 0, 0.0])
+        suma[1] += compras
+        suma[2] += entradas
+        suma[3] += total
+    actual = {
+        clave: tuple(suma) for clave, suma in sumas.items()
+        if suma[1] or suma[2] or abs(suma[3]) > TOLERANCIA_MONTOS
+    }
+
+    diferencias = []
+    for clave in sorted(set(esperado) | set(actual), key=lambda c: (c[0], c[1])):
+        vacio = (None, 0, 0, 0.0)
+        categoria, compras, entradas, total = esperado.get(clave, vacio)
+        categoria_r, compras_r, entradas_r, total_r = actual.get(clave, vacio)
+        if (categoria, compras, entradas) != (categoria_r, compras_r, entradas_r) or abs(total - total_r) > TOLERANCIA_MONTOS:
+            diferencias.append(
+                f"{clave[0]} {clave[1]}: purchases={(categoria, compras, entradas, total)} resumen={(categoria_r, compras_r, entradas_r, total_r)}"
+            )
+    return diferencias
+
+
+def completar_resumen_ventas():
+    """Construir el resumen diario de bases que ya tenían compras antes de que existiera la tabla"""
+    if db.session.execute(select(SalesDailyRollup.day).limit(1)).first():
+        return 0
+    if not db.session.execute(select(Purchase.id).limit(1)).first():
+        return 0
+    filas = reconstruir_resumen()
+    if filas:
+        print(f"🛠️  Resumen diario de ventas construido: {filas} filas")
+    return filas
+
+
+def iniciar_resumen_ventas(app):
+    """Aplicar en segundo plano los cambios de sales_changes al resumen diario de ventas"""
+    return iniciar_tarea_periodica(app, 'resumen-ventas', app.config['SALES_ROLLUP_INTERVAL'], aplicar_cambios_ventas)
@@ -0,0 +1,42 @@
+from sqlalchemy import inspect, text
+from api.models import db
+
+
+def actualizar_esquema():
+    """Agregar a las tablas existentes las columnas e índices nuevos de los modelos.
+
+    db.create_all() solo crea tablas que no existen; esta función completa las
+    tablas de bases ya creadas con las columnas agregadas posteriormente a los
+    modelos (ALTER TABLE ... ADD COLUMN) y crea los índices que falten.
+    """
+    inspector = inspect(db.engine)
+    dialect = db.engine.dialect
+
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+
+        existentes = {columna['name'] for columna in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existentes:
+                continue
+
+            ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=dialect)}'
+            default = column.default.arg if column.default is not None and column.default.is_scalar else None
+            if default is not None:
+                ddl += f' DEFAULT {_literal(default)}'
+            db.session.execute(text(ddl))
+            print(f"🛠️  Columna agregada: {table.name}.{column.name}")
+
+        db.session.commit()
+
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+
+
+def _literal(valor):
+    if isinstance(valor, bool):
+        return 'TRUE' if valor else 'FALSE'
+    if isinstance(valor, (int, float)):
+        return str(valor)
+    return "'" + str(valor).replace("'", "''") + "'"
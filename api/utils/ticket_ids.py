@@ -0,0 +1,50 @@
+import secrets
+
+# Alfabeto base32 de Crockford: sin I, L, O ni U para evitar confusiones al dictar o tipear
+ALFABETO = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+_VALORES = {caracter: valor for valor, caracter in enumerate(ALFABETO)}
+_VALORES.update({'O': 0, 'I': 1, 'L': 1})
+
+# 12 caracteres aleatorios (60 bits) más un dígito de control
+CARACTERES_ALEATORIOS = 12
+LARGO_TICKET_ID = CARACTERES_ALEATORIOS + 1
+
+
+def nuevo_ticket_id():
+    """Número de ticket compacto: 60 bits aleatorios en base32 de Crockford más un dígito de control.
+
+    Con 60 bits la probabilidad de repetir un número ya emitido es
+    despreciable (~1e-12 por ticket con un millón emitidos) y, de ocurrir, el
+    índice único de ticket_number rechaza la compra.
+    """
+    valor = secrets.randbits(5 * CARACTERES_ALEATORIOS)
+    cuerpo = ''.join(ALFABETO[(valor >> (5 * i)) & 31] for i in reversed(range(CARACTERES_ALEATORIOS)))
+    return cuerpo + _digito_control(cuerpo)
+
+
+def _digito_control(cuerpo):
+    """Dígito de control Luhn mod 32: detecta cualquier carácter cambiado y casi todas las transposiciones"""
+    suma = 0
+    factor = 2
+    for caracter in reversed(cuerpo):
+        producto = factor * _VALORES[caracter]
+        suma += producto // 32 + producto % 32
+        factor = 3 - factor
+    return ALFABETO[-suma % 32]
+
+
+def normalizar_ticket_number(valor):
+    """Forma canónica de un número de ticket para buscarlo en la base.
+
+    Los números compactos se aceptan en minúsculas, con guiones o espacios y
+    con O/I/L en vez de 0/1; si su dígito de control no coincide se retorna
+    None sin consultar la base. Los números del formato anterior
+    (ORD-...-T001) se retornan sin cambios.
+    """
+    compacto = valor.replace('-', '').replace(' ', '').upper()
+    if len(compacto) != LARGO_TICKET_ID or any(caracter not in _VALORES for caracter in compacto):
+        return valor
+    compacto = ''.join(ALFABETO[_VALORES[caracter]] for caracter in compacto)
+    if _digito_control(compacto[:-1]) != compacto[-1]:
+        return None
+    return compacto
@@ -0,0 +1,235 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+import qrcode
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfgen import canvas
+from api.models import db, Ticket
+
+# Cambiar VERSION_PDF invalida todos los PDF cacheados (p. ej. al modificar el diseño)
+VERSION_PDF = 'v1'
+
+COLOR_PRIMARIO = colors.Color(99 / 255, 102 / 255, 241 / 255)  # Mismo índigo que el PDF del frontend
+COLOR_SECUNDARIO = colors.Color(107 / 255, 114 / 255, 128 / 255)
+TAMANO_QR = 55 * mm
+
+
+def datos_pdf(purchase):
+    """Datos de una compra necesarios para su PDF de entradas (diccionario serializable)"""
+    tickets = db.session.query(Ticket.ticket_number, Ticket.qr_code_data).filter_by(
+        purchase_id=purchase.id
+    ).order_by(Ticket.id).all()
+    event = purchase.event
+    user = purchase.user
+    return {
+        'orderNumber': purchase.order_number,
+        'purchaseDate': purchase.purchase_date.strftime('%d/%m/%Y %H:%M') if purchase.purchase_date else '',
+        'event': {
+            'title': event.title,
+            'artist': event.artist,
+            'date': event.date,
+            'time': event.time or 'TBD',
+            'venue': event.venue,
+            'location': event.location or 'Santiago, Chile'
+        },
+        'buyer': {
+            'name': f'{user.name} {user.last_name}',
+            'email': user.email
+        },
+        'tickets': [{'ticketNumber': numero, 'qrCodeData': qr} for numero, qr in tickets]
+    }
+
+
+def huella_pdf(datos):
+    """Hash del contenido de un PDF: cambia si cambia cualquier dato impreso o el diseño"""
+    serializado = json.dumps(datos, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(f'{VERSION_PDF}:{serializado}'.encode('utf-8')).hexdigest()[:32]
+
+
+def _dibujar_qr(pdf, qr_data, x, y, tamano):
+    """Dibujar un código QR vectorial: un único trazado con un rectángulo por tramo horizontal de módulos"""
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, border=0)
+    qr.add_data(qr_data)
+    qr.make(fit=True)
+    matriz = qr.get_matrix()
+    modulo = tamano / len(matriz)
+
+    trazado = pdf.beginPath()
+    for fila, modulos in enumerate(matriz):
+        y_fila = y + tamano - (fila + 1) * modulo
+        columna = 0
+        while columna < len(modulos):
+            if not modulos[columna]:
+                columna += 1
+                continue
+            inicio = columna
+            while columna < len(modulos) and modulos[columna]:
+                columna += 1
+            trazado.rect(x + inicio * modulo, y_fila, (columna - inicio) * modulo, modulo)
+    pdf.setFillColor(colors.black)
+    pdf.drawPath(trazado, stroke=0, fill=1)
+
+
+def generar_pdf_tickets(datos):
+    """Generar el PDF de entradas de una compra: una página A4 por ticket, con su código QR.
+
+    Es una función pura sobre `datos` (ver datos_pdf) para poder ejecutarse
+    en un proceso del pool sin acceso a la base de datos.
+    """
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4, pageCompression=1)
+    pdf.setTitle(f"Entradas {datos['orderNumber']}")
+    ancho, alto = A4
+    event = datos['event']
+    total = len(datos['tickets'])
+
+    for posicion, ticket in enumerate(datos['tickets'], start=1):
+        # Encabezado
+        pdf.setFillColor(COLOR_PRIMARIO)
+        pdf.rect(0, alto - 40 * mm, ancho, 40 * mm, stroke=0, fill=1)
+        pdf.setFillColor(colors.white)
+        pdf.setFont('Helvetica-Bold', 24)
+        pdf.drawCentredString(ancho / 2, alto - 20 * mm, 'EVENTOS VIÑA')
+        pdf.setFont('Helvetica-Bold', 14)
+        pdf.drawCentredString(ancho / 2, alto - 32 * mm, 'ENTRADA DIGITAL')
+
+        # Evento
+        pdf.setFillColor(colors.black)
+        pdf.setFont('Helvetica-Bold', 16)
+        pdf.drawCentredString(ancho / 2, alto - 60 * mm, event['title'])
+        pdf.setFont('Helvetica', 12)
+        y = alto - 80 * mm
+        for linea in (f"Artista: {event['artist']}", f"Fecha: {event['date']}", f"Hora: {event['time']}",
+                      f"Lugar: {event['venue']}", event['location']):
+            pdf.drawString(20 * mm, y, linea)
+            y -= 10 * mm
+
+        # Comprador
+        pdf.setFont('Helvetica-Bold', 12)
+        pdf.drawString(20 * mm, alto - 140 * mm, 'DATOS DEL COMPRADOR')
+        pdf.setFont('Helvetica', 12)
+        pdf.drawString(20 * mm, alto - 150 * mm, f"Nombre: {datos['buyer']['name']}")
+        pdf.drawString(20 * mm, alto - 160 * mm, f"Email: {datos['buyer']['email']}")
+        pdf.drawString(20 * mm, alto - 170 * mm, f"Entrada {posicion} de {total}")
+
+        # Número de orden
+        pdf.setFillColor(COLOR_PRIMARIO)
+        pdf.rect(20 * mm, alto - 195 * mm, ancho - 40 * mm, 15 * mm, stroke=0, fill=1)
+        pdf.setFillColor(colors.white)
+        pdf.setFont('Helvetica-Bold', 12)
+        pdf.drawCentredString(ancho / 2, alto - 189.5 * mm, f"NÚMERO DE ORDEN: {datos['orderNumber']}")
+
+        _dibujar_qr(pdf, ticket['qrCodeData'], ancho - 20 * mm - TAMANO_QR, alto - 265 * mm, TAMANO_QR)
+
+        pdf.setFillColor(COLOR_SECUNDARIO)
+        pdf.setFont('Helvetica', 10)
+        pdf.drawString(20 * mm, alto - 215 * mm, f"Ticket: {ticket['ticketNumber']}")
+        pdf.drawString(20 * mm, alto - 222 * mm, f"Compra: {datos['purchaseDate']}")
+        pdf.drawString(20 * mm, alto - 229 * mm, 'Presenta este código QR en el acceso al evento.')
+        pdf.showPage()
+
+    pdf.save()
+    return buffer.getvalue()
+
+
+def _iniciar_proceso():
+    """Calentar un proceso del pool: cargar reportlab y sus fuentes antes de la primera petición"""
+    generar_pdf_tickets({
+        'orderNumber': '-', 'purchaseDate': '',
+        'event': {'title': '', 'artist': '', 'date': '', 'time': '', 'venue': '', 'location': ''},
+        'buyer': {'name': '', 'email': ''},
+        'tickets': [{'ticketNumber': '-', 'qrCodeData': '-'}]
+    })
+
+
+class ServicioPdfTickets:
+    """Generación de PDF de entradas en un pool de procesos, con caché en disco por número de orden.
+
+    El pool se crea con la primera petición y se mantiene vivo, con reportlab
+    ya cargado en cada proceso. Cada PDF se guarda como
+    `<sha256(order_number)>-<huella>.pdf`: si cambian los datos impresos
+    (p. ej. el evento cambia de recinto) la huella cambia, se genera un PDF
+    nuevo y se borra la versión anterior de esa orden. Peticiones simultáneas
+    por el mismo PDF esperan una única generación.
+    """
+
+    def __init__(self, app):
+        self.directorio = app.config['TICKET_PDF_CACHE_DIR']
+        self.workers = app.config['TICKET_PDF_WORKERS'] or os.cpu_count()
+        self.timeout = app.config['TICKET_PDF_TIMEOUT']
+        os.makedirs(self.directorio, exist_ok=True)
+        self._pool = None
+        self._lock = threading.Lock()
+        self._en_curso = {}  # huella -> Future
+
+    def _obtener_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn: los procesos no heredan hilos ni conexiones de la API
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_iniciar_proceso
+                )
+            return self._pool
+
+    def _prefijo(self, order_number):
+        return hashlib.sha256(order_number.encode('utf-8')).hexdigest()[:16]
+
+    def obtener(self, datos, huella=None):
+        """PDF de entradas de una compra desde la caché, generándolo en el pool si no está"""
+        huella = huella or huella_pdf(datos)
+        prefijo = self._prefijo(datos['orderNumber'])
+        ruta = os.path.join(self.directorio, f'{prefijo}-{huella}.pdf')
+        try:
+            with open(ruta, 'rb') as archivo:
+                return archivo.read()
+        except FileNotFoundError:
+            pass
+
+        pool = self._obtener_pool()
+        with self._lock:
+            futuro = self._en_curso.get(huella)
+            propio = futuro is None
+            if propio:
+                futuro = self._en_curso[huella] = pool.submit(generar_pdf_tickets, datos)
+        try:
+            contenido = futuro.result(timeout=self.timeout)
+        finally:
+            if propio:
+                with self._lock:
+                    self._en_curso.pop(huella, None)
+
+        if propio:
+            temporal = f'{ruta}.{uuid.uuid4().hex[:8]}.tmp'
+            with open(temporal, 'wb') as archivo:
+                archivo.write(contenido)
+            os.replace(temporal, ruta)
+            # Retirar versiones anteriores del PDF de esta orden
+            for nombre in os.listdir(self.directorio):
+                if nombre.startswith(f'{prefijo}-') and nombre.endswith('.pdf') and nombre != os.path.basename(ruta):
+                    try:
+                        os.remove(os.path.join(self.directorio, nombre))
+                    except FileNotFoundError:
+                        pass
+        return contenido
+
+    def cerrar(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+
+def iniciar_pdf_tickets(app):
+    """Crear el servicio de PDF de entradas de la aplicación (el pool parte con la primera petición)"""
+    servicio = ServicioPdfTickets(app)
+    app.extensions['pdf_tickets'] = servicio
+    return servicio
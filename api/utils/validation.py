@@ -0,0 +1,273 @@
+import hashlib
+from collections import Counter
+from datetime import datetime, timezone
+from sqlalchemy import bindparam, or_, select, update
+from api.models import db, Purchase, Ticket
+from api.utils.qr import digest_qr
+from api.utils.attendance import registrar_admisiones
+
+# Máximo de tickets por petición de validación en lote
+MAX_TICKETS_POR_VALIDACION = 500
+
+# Máximo de escaneos por sincronización de una puerta
+MAX_ESCANEOS_POR_SINCRONIZACION = 2000
+
+# Bytes del digest QR que se conservan por ticket en el manifiesto de puerta.
+# Con 4 bytes un evento de 50.000 tickets ocupa ~200 KB y la probabilidad de
+# que un QR inexistente coincida con alguno es ~1e-5 (los QR firmados además
+# se rechazan por firma antes de consultar el manifiesto).
+BYTES_DIGEST_MANIFIESTO = 4
+
+ADMITIDO = 'admitted'
+YA_USADO = 'already_used'
+DESCONOCIDO = 'unknown'
+
+ACEPTADO = 'accepted'
+DUPLICADO = 'duplicate'
+ANULADO = 'invalid'
+
+
+def validar_tickets(ticket_numbers, en_caliente=None):
+    """Marcar como usados los tickets de un lote de escaneos y retornar un veredicto por ticket.
+
+    Un UPDATE condicional (solo tickets aún no usados) decide qué tickets se
+    admiten: si dos puertas escanean el mismo ticket a la vez, solo una de
+    ellas lo marca (ver _admitir_tickets). Los demás se clasifican
+    con una lectura posterior en 'already_used' o 'unknown'. Un ticket repetido
+    dentro del mismo lote se admite una sola vez.
+
+    Con `en_caliente` (ValidacionEnCaliente), los tickets de eventos en modo
+    día de evento se resuelven desde el índice en memoria y solo el resto
+    llega a la base de datos.
+
+    Retorna una lista de diccionarios en el mismo orden de ticket_numbers.
+    No hace commit.
+    """
+    ahora = datetime.utcnow()
+    desde_indice = {}
+    if en_caliente:
+        for posicion, ticket_number in enumerate(ticket_numbers):
+            admitido = en_caliente.marcar(ticket_number)
+            if admitido is not None:
+                desde_indice[posicion] = ADMITIDO if admitido else YA_USADO
+    if desde_indice:
+        restantes = [n for posicion, n in enumerate(ticket_numbers) if posicion not in desde_indice]
+        resultados = iter(validar_tickets(restantes) if restantes else [])
+        return [
+            {
+                'ticketNumber': ticket_number,
+                'status': desde_indice[posicion],
+                'usedAt': ahora.isoformat() if desde_indice[posicion] == ADMITIDO else None
+            } if posicion in desde_indice else next(resultados)
+            for posicion, ticket_number in enumerate(ticket_numbers)
+        ]
+
+    distintos = list(dict.fromkeys(ticket_numbers))
+
+    filas = _admitir_tickets(distintos, ahora)
+    admitidos = {ticket_number for ticket_number, _ in filas}
+
+    # Contadores de asistencia: admisiones por evento, resolviendo el evento de cada compra
+    por_compra = Counter(purchase_id for _, purchase_id in filas)
+    por_evento = Counter()
+    if por_compra:
+        for purchase_id, event_id in db.session.execute(
+            select(Purchase.id, Purchase.event_id).where(Purchase.id.in_(por_compra.keys()))
+        ):
+            por_evento[event_id] += por_compra[purchase_id]
+    for event_id, cantidad in por_evento.items():
+        registrar_admisiones(event_id, cantidad, ahora)
+
+    restantes = [n for n in distintos if n not in admitidos]
+    usados = dict(db.session.execute(
+        select(Ticket.ticket_number, Ticket.used_at).where(Ticket.ticket_number.in_(restantes))
+    ).all()) if restantes else {}
+
+    resultados = []
+    vistos = set()
+    for ticket_number in ticket_numbers:
+        if ticket_number in admitidos and ticket_number not in vistos:
+            veredicto, used_at = ADMITIDO, ahora
+        elif ticket_number in admitidos:
+            veredicto, used_at = YA_USADO, ahora
+        elif ticket_number in usados:
+            veredicto, used_at = YA_USADO, usados[ticket_number]
+        else:
+            veredicto, used_at = DESCONOCIDO, None
+        vistos.add(ticket_number)
+        resultados.append({
+            'ticketNumber': ticket_number,
+            'status': veredicto,
+            'usedAt': used_at.isoformat() if used_at else None
+        })
+
+    return resultados
+
+
+def _admitir_tickets(ticket_numbers, ahora):
+    """Marcar como usados los tickets aún no usados del lote. Retorna [(ticket_number, purchase_id)] de los marcados.
+
+    Con UPDATE ... RETURNING (PostgreSQL, SQLite 3.35+) es una sola sentencia.
+    Sin él (MySQL) los candidatos se bloquean con SELECT ... FOR UPDATE y se
+    marcan con un UPDATE: otra puerta que escanee los mismos tickets espera
+    el commit y ya no los encuentra sin usar. SQLite anterior a 3.35 no
+    bloquea filas, por lo que cada candidato se marca con su propio UPDATE
+    condicional.
+    """
+    pendientes = (Ticket.ticket_number.in_(ticket_numbers), Ticket.is_used == False)
+    if db.engine.dialect.update_returning:
+        return db.session.execute(
+            update(Ticket)
+            .where(*pendientes)
+            .values(is_used=True, used_at=ahora, updated_at=ahora)
+            .returning(Ticket.ticket_number, Ticket.purchase_id)
+            .execution_options(synchronize_session=False)
+        ).all()
+
+    def marcar(*condiciones):
+        return db.session.execute(
+            update(Ticket)
+            .where(*condiciones, Ticket.is_used == False)
+            .values(is_used=True, used_at=ahora, updated_at=ahora)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+    candidatos = db.session.execute(
+        select(Ticket.ticket_number, Ticket.purchase_id).where(*pendientes).with_for_update()
+    ).all()
+    if db.engine.dialect.name == 'sqlite':
+        return [
+            (ticket_number, purchase_id) for ticket_number, purchase_id in candidatos
+            if marcar(Ticket.ticket_number == ticket_number)
+        ]
+    if candidatos:
+        marcar(Ticket.ticket_number.in_([ticket_number for ticket_number, _ in candidatos]))
+    return candidatos
+
+
+def generar_manifiesto(event_id):
+    """Manifiesto compacto de los tickets válidos de un evento para puertas sin conexión.
+
+    Es un arreglo binario ordenado con los primeros BYTES_DIGEST_MANIFIESTO
+    bytes del qr_digest (sha256 del contenido del QR) de cada ticket de una
+    compra completada aún no usado. La puerta calcula el sha256 del QR
+    escaneado y lo busca con búsqueda binaria. La versión es un hash del
+    contenido: cambia solo cuando cambia el conjunto de tickets válidos.
+
+    Retorna (contenido, version, cantidad).
+    """
+    digests = db.session.execute(
+        select(Ticket.qr_digest)
+        .join(Purchase, Ticket.purchase_id == Purchase.id)
+        .where(
+            Purchase.event_id == event_id,
+            Purchase.status == 'completed',
+            Ticket.is_used == False,
+            Ticket.qr_digest.isnot(None)
+        )
+    ).scalars()
+
+    prefijos = sorted(bytes.fromhex(digest[:2 * BYTES_DIGEST_MANIFIESTO]) for digest in digests)
+    contenido = b''.join(prefijos)
+    version = hashlib.sha256(contenido).hexdigest()[:16]
+    return contenido, version, len(prefijos)
+
+
+def sincronizar_escaneos(event_id, escaneos):
+    """Registrar escaneos hechos sin conexión; ante conflictos gana el escaneo más antiguo.
+
+    Cada escaneo es un diccionario con ticketNumber o qrCode, scannedAt
+    (datetime UTC) y opcionalmente gateId. Un ticket queda marcado como usado
+    con used_at igual al escaneo más antiguo conocido, ya sea de este lote, de
+    otra puerta o de una validación en línea. El UPDATE solo adelanta used_at
+    (nunca lo atrasa), por lo que sincronizaciones concurrentes convergen al
+    mismo resultado. El veredicto de cada escaneo es 'accepted' si es el que
+    quedó registrado, 'duplicate' si el ticket ya se había usado antes,
+    'invalid' si su compra no está completada (cancelada o reembolsada; no
+    figura en el manifiesto y no se marca como usado) o 'unknown' si no
+    corresponde a un ticket del evento.
+
+    Retorna una lista de resultados en el orden de escaneos. No hace commit.
+    """
+    numeros = {e['ticketNumber'] for e in escaneos if e.get('ticketNumber')}
+    digests = {digest_qr(e['qrCode']) for e in escaneos if e.get('qrCode')}
+
+    tickets = db.session.execute(
+        select(Ticket.id, Ticket.ticket_number, Ticket.qr_digest, Ticket.is_used, Purchase.status)
+        .join(Purchase, Ticket.purchase_id == Purchase.id)
+        .where(
+            Purchase.event_id == event_id,
+            or_(Ticket.ticket_number.in_(numeros), Ticket.qr_digest.in_(digests))
+        )
+    ).all()
+    por_numero = {t.ticket_number: t for t in tickets}
+    por_digest = {t.qr_digest: t for t in tickets}
+
+    def ticket_de(escaneo):
+        if escaneo.get('ticketNumber'):
+            return por_numero.get(escaneo['ticketNumber'])
+        return por_digest.get(digest_qr(escaneo['qrCode']))
+
+    # Escaneo más antiguo de este lote por ticket
+    primeros = {}
+    for escaneo in escaneos:
+        ticket = ticket_de(escaneo)
+        if ticket and ticket.status == 'completed' and (ticket.id not in primeros or escaneo['scannedAt'] < primeros[ticket.id]):
+            primeros[ticket.id] = escaneo['scannedAt']
+
+    if primeros:
+        ahora = datetime.utcnow()
+        db.session.execute(
+            update(Ticket.__table__)
+            .where(
+                Ticket.__table__.c.id == bindparam('ticket_id'),
+                or_(
+                    Ticket.__table__.c.is_used == False,
+                    Ticket.__table__.c.used_at.is_(None),
+                    Ticket.__table__.c.used_at > bindparam('scanned_at')
+                )
+            )
+            .values(is_used=True, used_at=bindparam('scanned_at'), updated_at=ahora),
+            [{'ticket_id': ticket_id, 'scanned_at': scanned_at} for ticket_id, scanned_at in primeros.items()]
+        )
+
+    registrados = dict(db.session.execute(
+        select(Ticket.id, Ticket.used_at).where(Ticket.id.in_(primeros.keys()))
+    ).all()) if primeros else {}
+
+    resultados = []
+    aceptados = set()
+    nuevas_admisiones = 0
+    for escaneo in escaneos:
+        ticket = ticket_de(escaneo)
+        used_at = registrados.get(ticket.id) if ticket else None
+        if not ticket:
+            veredicto = DESCONOCIDO
+        elif ticket.status != 'completed':
+            veredicto = ANULADO
+        elif used_at == escaneo['scannedAt'] and ticket.id not in aceptados:
+            veredicto = ACEPTADO
+            aceptados.add(ticket.id)
+        else:
+            veredicto = DUPLICADO
+        if veredicto == ACEPTADO and not ticket.is_used:
+            nuevas_admisiones += 1
+        resultados.append({
+            'ticketNumber': ticket.ticket_number if ticket else escaneo.get('ticketNumber'),
+            'gateId': escaneo.get('gateId'),
+            'scannedAt': escaneo['scannedAt'].isoformat(),
+            'status': veredicto,
+            'usedAt': used_at.isoformat() if used_at else None
+        })
+
+    # Solo cuentan como admisiones los tickets que no estaban usados antes de sincronizar
+    registrar_admisiones(event_id, nuevas_admisiones)
+    return resultados
+
+
+def leer_momento_escaneo(valor):
+    """Convertir scannedAt (ISO 8601) a datetime UTC sin zona horaria; lanza ValueError si es inválido"""
+    momento = datetime.fromisoformat(valor)
+    if momento.tzinfo is not None:
+        momento = momento.astimezone(timezone.utc).replace(tzinfo=None)
+    return momento
@@ -0,0 +1,320 @@
+import hashlib
+import json
+import math
+import os
+import struct
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from flask import after_this_request, current_app
+from itsdangerous import URLSafeSerializer, BadSignature
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueos entre procesos, usar un único proceso de API
+    fcntl = None
+
+# Cabecera del archivo de estado: turnos emitidos, admitidos, último avance (time.time()) y turnos usados.
+# Tras la cabecera va el bitmap de turnos usados (un bit por posición).
+_CABECERA = struct.Struct('<qddq')
+
+
+class SalaDeEspera:
+    """Cola de admisión para la salida a venta de un evento, compartida por los procesos de API.
+
+    Cada cliente recibe un turno correlativo firmado. Los turnos se admiten
+    a razón de `rate` por segundo, sin acumular cupo mientras la cola está
+    vacía, y cada turno admitido puede usarse una sola vez en la ruta de compra.
+    Los contadores y el bitmap de turnos usados viven en un archivo del
+    almacén local (QUEUE_DIR) que se actualiza bajo un bloqueo (fcntl entre
+    procesos, threading.Lock entre hilos): el ritmo de admisión es el mismo
+    con uno o varios procesos.
+    """
+
+    def __init__(self, datos, ruta_estado, secret_key):
+        self.event_id = datos['eventId']
+        self.rate = float(datos['rate'])
+        self.cache_ttl = datos['cacheTtl']
+        self.generacion = datos['generation']
+        self.abierta_en = datetime.fromisoformat(datos['openedAt'])
+        self._serializer = URLSafeSerializer(secret_key, salt='sala-espera')
+        self._lock = threading.Lock()
+        self._archivo = open(ruta_estado, 'r+b', buffering=0)
+        self._evento_cache = None
+        self._evento_cache_en = 0.0
+
+    @contextmanager
+    def _contadores(self):
+        """Contadores de la sala bajo bloqueo, con los admitidos avanzados según el tiempo transcurrido.
+
+        Entrega un diccionario (emitidos, admitidos, usados) que se escribe de
+        vuelta al salir del bloque.
+        """
+        with self._lock:
+            if fcntl is not None:
+                fcntl.lockf(self._archivo, fcntl.LOCK_EX, _CABECERA.size, 0)
+            try:
+                self._archivo.seek(0)
+                emitidos, admitidos, ultimo_avance, usados = _CABECERA.unpack(self._archivo.read(_CABECERA.size))
+                # Admitir turnos según el tiempo transcurrido, sin superar los emitidos
+                ahora = time.time()
+                contadores = {
+                    'emitidos': emitidos,
+                    'admitidos': min(emitidos, admitidos + max(0.0, ahora - ultimo_avance) * self.rate),
+                    'usados': usados
+                }
+                yield contadores
+                self._archivo.seek(0)
+                self._archivo.write(_CABECERA.pack(
+                    contadores['emitidos'], contadores['admitidos'], ahora, contadores['usados']
+                ))
+            finally:
+                if fcntl is not None:
+                    fcntl.lockf(self._archivo, fcntl.LOCK_UN, _CABECERA.size, 0)
+
+    def _usado(self, posicion):
+        """Bit de turno usado de una posición (debe llamarse dentro de _contadores)"""
+        self._archivo.seek(_CABECERA.size + posicion // 8)
+        byte = self._archivo.read(1)
+        return bool(byte and byte[0] & (1 << (posicion % 8)))
+
+    def _marcar(self, posicion, usado):
+        self._archivo.seek(_CABECERA.size + posicion // 8)
+        byte = self._archivo.read(1)
+        byte = byte[0] if byte else 0
+        bit = 1 << (posicion % 8)
+        self._archivo.seek(_CABECERA.size + posicion // 8)
+        self._archivo.write(bytes([byte | bit if usado else byte & ~bit]))
+
+    def unirse(self):
+        """Emitir un nuevo turno. Retorna (token, posición)."""
+        with self._contadores() as contadores:
+            contadores['emitidos'] += 1
+            posicion = contadores['emitidos']
+        token = self._serializer.dumps({'e': self.event_id, 'g': self.generacion, 'p': posicion})
+        return token, posicion
+
+    def leer_turno(self, token):
+        """Validar la firma del token y retornar su posición, o None si no es válido"""
+        if not token:
+            return None
+        try:
+            datos = self._serializer.loads(token)
+        except BadSignature:
+            return None
+        if datos.get('e') != self.event_id or datos.get('g') != self.generacion:
+            return None
+        return datos.get('p')
+
+    def estado(self, posicion):
+        with self._contadores() as contadores:
+            admitidos = int(contadores['admitidos'])
+            emitidos = contadores['emitidos']
+            usado = self._usado(posicion)
+        delante = max(0, posicion - admitidos - 1)
+        return {
+            'eventId': self.event_id,
+            'position': posicion,
+            'ahead': delante,
+            'admitted': posicion <= admitidos,
+            'used': usado,
+            'queueLength': emitidos - admitidos,
+            'estimatedWaitSeconds': math.ceil(delante / self.rate) if delante else 0
+        }
+
+    def consumir_turno(self, token):
+        """Usar un turno admitido para entrar a la ruta de compra.
+
+        Retorna None si el turno es válido, o (mensaje, status) si debe rechazarse.
+        """
+        posicion = self.leer_turno(token)
+        if posicion is None:
+            return 'Se requiere un turno válido de la sala de espera (X-Queue-Token)', 403
+        with self._contadores() as contadores:
+            if posicion > int(contadores['admitidos']):
+                return 'Tu turno aún no ha sido admitido', 429
+            if self._usado(posicion):
+                return 'El turno ya fue utilizado', 409
+            self._marcar(posicion, True)
+            contadores['usados'] += 1
+        return None
+
+    def liberar_turno(self, token):
+        """Devolver un turno consumido para que pueda usarse de nuevo"""
+        posicion = self.leer_turno(token)
+        if posicion is None:
+            return
+        with self._contadores() as contadores:
+            if self._usado(posicion):
+                self._marcar(posicion, False)
+                contadores['usados'] -= 1
+
+    def evento_cacheado(self, cargar):
+        """Retornar el detalle del evento cacheado por `cache_ttl` segundos (evita golpear la fila del evento)"""
+        ahora = time.monotonic()
+        if self._evento_cache is None or ahora - self._evento_cache_en > self.cache_ttl:
+            self._evento_cache = cargar()
+            self._evento_cache_en = ahora
+        return self._evento_cache
+
+    def to_dict(self):
+        with self._contadores() as contadores:
+            admitidos = int(contadores['admitidos'])
+            emitidos = contadores['emitidos']
+            usados = contadores['usados']
+        return {
+            'eventId': self.event_id,
+            'admissionRate': self.rate,
+            'issued': emitidos,
+            'admitted': admitidos,
+            'used': usados,
+            'queueLength': emitidos - admitidos,
+            'openedAt': self.abierta_en.isoformat()
+        }
+
+
+class SalasDeEspera:
+    """Salas de espera abiertas, publicadas en el almacén local QUEUE_DIR.
+
+    Cada sala son dos archivos: `<clave>.json` con la configuración y la
+    generación (su presencia indica que la sala está abierta) y
+    `<clave>-<generación>.state` con los contadores. Cada proceso de API
+    abre las salas que encuentra en el almacén, de modo que abrir o cerrar
+    una sala y los turnos emitidos valen en todos los procesos del servidor.
+    """
+
+    def __init__(self, app):
+        self.directorio = app.config['QUEUE_DIR']
+        self.secret_key = app.config['SECRET_KEY']
+        os.makedirs(self.directorio, exist_ok=True)
+        self._salas = {}  # event_id -> ((inodo, mtime) del .json, SalaDeEspera)
+        self._lock = threading.Lock()
+
+    def _ruta_sala(self, event_id):
+        clave = hashlib.sha256(str(event_id).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.directorio, f'{clave}.json')
+
+    def _ruta_estado(self, event_id, generacion):
+        return f'{self._ruta_sala(event_id)[:-len(".json")]}-{generacion}.state'
+
+    def abrir(self, event_id, rate, cache_ttl=1.0):
+        """Abrir (o reabrir) la sala de espera de un evento; los turnos anteriores quedan inválidos"""
+        ruta = self._ruta_sala(event_id)
+        datos = {
+            'eventId': event_id,
+            'rate': float(rate),
+            'cacheTtl': cache_ttl,
+            'generation': uuid.uuid4().hex[:8],
+            'openedAt': datetime.utcnow().isoformat()
+        }
+        with open(self._ruta_estado(event_id, datos['generation']), 'wb') as archivo:
+            archivo.write(_CABECERA.pack(0, 0.0, time.time(), 0))
+
+        anterior = self._leer(ruta)
+        # La configuración se publica al final: su presencia indica que la sala está abierta
+        temporal = f'{ruta}.{datos["generation"]}.tmp'
+        with open(temporal, 'w') as archivo:
+            json.dump(datos, archivo)
+        os.replace(temporal, ruta)
+        if anterior:
+            self._eliminar(self._ruta_estado(event_id, anterior['generation']))
+        return self.obtener(event_id)
+
+    def cerrar(self, event_id):
+        """Cerrar la sala de un evento; retorna la sala cerrada (para informar sus contadores) o None"""
+        sala = self.obtener(event_id)
+        if not sala:
+            return None
+        self._eliminar(self._ruta_sala(event_id))
+        self._eliminar(self._ruta_estado(event_id, sala.generacion))
+        with self._lock:
+            self._salas.pop(sala.event_id, None)
+        return sala
+
+    def obtener(self, event_id):
+        """Sala abierta de un evento, o None. Solo relee la configuración si el archivo cambió."""
+        event_id = str(event_id)
+        ruta = self._ruta_sala(event_id)
+        try:
+            informacion = os.stat(ruta)
+        except FileNotFoundError:
+            with self._lock:
+                self._salas.pop(event_id, None)
+            return None
+
+        # os.replace publica un archivo nuevo: el inodo distingue una reapertura en el mismo instante
+        marca = (informacion.st_ino, informacion.st_mtime_ns)
+        with self._lock:
+            cacheada = self._salas.get(event_id)
+            if cacheada and cacheada[0] == marca:
+                return cacheada[1]
+            datos = self._leer(ruta)
+            if datos is None:
+                self._salas.pop(event_id, None)
+                return None
+            try:
+                sala = SalaDeEspera(datos, self._ruta_estado(event_id, datos['generation']), self.secret_key)
+            except FileNotFoundError:
+                # La sala se cerró o se reabrió mientras se leía
+                return None
+            self._salas[event_id] = (marca, sala)
+            return sala
+
+    def _leer(self, ruta):
+        try:
+            with open(ruta) as archivo:
+                return json.load(archivo)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _eliminar(self, ruta):
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+
+
+def iniciar_salas_espera(app):
+    """Crear el registro de salas de espera de la aplicación"""
+    salas = SalasDeEspera(app)
+    app.extensions['salas_espera'] = salas
+    return salas
+
+
+def abrir_sala(event_id, rate, cache_ttl=1.0):
+    return current_app.extensions['salas_espera'].abrir(event_id, rate, cache_ttl)
+
+
+def cerrar_sala(event_id):
+    return current_app.extensions['salas_espera'].cerrar(event_id)
+
+
+def obtener_sala(event_id):
+    return current_app.extensions['salas_espera'].obtener(event_id)
+
+
+def tomar_turno(event_id, token):
+    """Exigir un turno admitido si el evento tiene sala de espera. Requiere contexto de petición.
+
+    Retorna None si la petición puede continuar, o (mensaje, status) si debe
+    rechazarse. El turno se marca como usado de inmediato (dos peticiones con
+    el mismo token no pueden pasar a la vez) y se devuelve a la sala si la
+    respuesta termina en error: un dato mal escrito o un 409 por falta de
+    entradas no hacen perder el turno.
+    """
+    sala = obtener_sala(event_id)
+    if not sala:
+        return None
+    rechazo = sala.consumir_turno(token)
+    if rechazo:
+        return rechazo
+
+    @after_this_request
+    def devolver_turno(response):
+        if response.status_code >= 400:
+            sala.liberar_turno(token)
+        return response
+
+    return None
@@ -0,0 +1,131 @@
+"""
+Benchmark de la caché de reportes de ventas (GET /api/reportes/ventas).
+
+Carga la base con compras y, para los formatos JSON, PDF y Excel, mide la
+primera petición (genera el reporte), una petición repetida (se sirve desde
+la caché) y una petición condicional con If-None-Match (responde 304 sin
+cuerpo). Luego registra una compra y comprueba que la versión de los datos
+de ventas cambió: el ETag anterior ya no responde 304.
+
+Uso:
+    python benchmark_cache_reportes.py [filas]
+    python benchmark_cache_reportes.py 200000
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Usar una base de datos temporal para no tocar la base de desarrollo
+_tmp_dir = tempfile.mkdtemp(prefix='benchmark_cache_reportes_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp_dir, 'benchmark.db')}"
+os.environ['RESERVATION_SWEEPER_ENABLED'] = 'False'
+
+from sqlalchemy import insert
+from api.app import create_app
+from api.models import db, Event, Purchase, User
+from api.utils.orders import crear_compra
+from api.utils.sales_rollup import reconstruir_resumen
+
+EVENTOS = 20
+FILAS_POR_INSERT = 50_000
+REPETICIONES = 5
+
+# Reporte de un evento en un rango que no empieza a medianoche: combina el resumen diario con purchases
+URL = '/api/reportes/ventas?evento_id=cache-0&fecha_inicio=2025-02-01T12:00&fecha_fin=2025-11-30'
+
+
+def preparar_base(app, filas):
+    inicio = datetime(2025, 1, 1)
+    with app.app_context():
+        eventos = [
+            Event(
+                id=f'cache-{i}', title=f'Evento {i}', artist='Varios', date='2025-01-01',
+                venue='Estadio', location='Santiago, Chile', price=1000, category=['Rock', 'Pop', ''][i % 3],
+                available_tickets=1000, total_tickets=1000
+            )
+            for i in range(EVENTOS)
+        ]
+        user = User(email='cache@example.com', name='Caché', last_name='Benchmark')
+        db.session.add_all(eventos + [user])
+        db.session.commit()
+
+        for bloque in range(0, filas, FILAS_POR_INSERT):
+            db.session.execute(insert(Purchase), [
+                {
+                    'order_number': f'CACHE-{numero:08d}', 'user_id': user.id,
+                    'event_id': f'cache-{numero % EVENTOS}', 'quantity': 2, 'unit_price': 15000,
+                    'total_price': 30000, 'status': 'completed',
+                    'purchase_date': inicio + timedelta(seconds=random.randint(0, 365 * 86400))
+                }
+                for numero in range(bloque, min(bloque + FILAS_POR_INSERT, filas))
+            ])
+            db.session.commit()
+        reconstruir_resumen()
+
+
+def pedir(client, url, etag=None):
+    """(ms, respuesta) de una petición, opcionalmente condicional"""
+    headers = {'If-None-Match': etag} if etag else {}
+    inicio = time.perf_counter()
+    response = client.get(url, headers=headers)
+    return (time.perf_counter() - inicio) * 1000, response
+
+
+def ejecutar_benchmark(filas=100_000):
+    random.seed(42)
+    app = create_app()
+    print(f"Cargando {filas:,} compras...")
+    preparar_base(app, filas)
+    client = app.test_client()
+
+    resultados = []
+    ok = True
+    for formato in ('json', 'pdf', 'excel'):
+        url = f'{URL}&formato={formato}'
+        generado, response = pedir(client, url)
+        etag = response.headers['ETag']
+        cacheado = min(pedir(client, url)[0] for _ in range(REPETICIONES))
+        condicional, condicional_response = pedir(client, url, etag)
+        if condicional_response.status_code != 304:
+            ok = False
+            print(f"❌ {formato}: If-None-Match respondió {condicional_response.status_code} en vez de 304")
+        resultados.append((formato, generado, cacheado, condicional, len(response.data)))
+
+    # Una compra nueva cambia la versión de los datos: el ETag anterior deja de ser válido
+    _, response = pedir(client, URL)
+    etag = response.headers['ETag']
+    with app.app_context():
+        crear_compra(
+            User.query.filter_by(email='cache@example.com').first(), db.session.get(Event, 'cache-0'), 1, 15000, 15000,
+            purchase_date=datetime(2025, 6, 1)
+        )
+        db.session.commit()
+    _, despues = pedir(client, URL, etag)
+    if despues.status_code != 200 or despues.json['total_registros'] != response.json['total_registros'] + 1:
+        ok = False
+        print("❌ El reporte no cambió tras registrar una compra")
+
+    print("=" * 80)
+    print("🗃️  BENCHMARK DE LA CACHÉ DE REPORTES DE VENTAS")
+    print("=" * 80)
+    print(f"{'Formato':>8}{'Generado ms':>14}{'Caché ms':>12}{'304 ms':>10}{'Aceleración':>14}{'KB':>10}")
+    print("-" * 80)
+    for formato, generado, cacheado, condicional, tamano in resultados:
+        print(
+            f"{formato:>8}{generado:>14.1f}{cacheado:>12.2f}{condicional:>10.2f}"
+            f"{generado / cacheado:>13.0f}x{tamano / 1024:>10.1f}"
+        )
+
+    if ok:
+        print()
+        print("✅ Reportes repetidos servidos desde la caché, 304 con el mismo ETag e invalidación tras una compra")
+    return ok
+
+
+if __name__ == '__main__':
+    filas = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    ok = ejecutar_benchmark(filas)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,111 @@
+"""
+Benchmark de compras grupales: tickets ORM uno a uno vs INSERT multi-fila.
+
+Compara la forma anterior de crear tickets (un objeto Ticket + db.session.add
+y to_dict() por entrada) con la ruta actual de crear_compra (tickets generados
+por adelantado, INSERT multi-fila y resumen liviano) para compras de
+1, 10, 100 y 1000 entradas.
+
+Uso:
+    python benchmark_compras_grupales.py [repeticiones]
+"""
+import os
+import sys
+import tempfile
+import time
+
+# Usar una base de datos temporal para no tocar la base de desarrollo
+_tmp_dir = tempfile.mkdtemp(prefix='benchmark_compras_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp_dir, 'benchmark.db')}"
+os.environ['RESERVATION_SWEEPER_ENABLED'] = 'False'
+
+from api.app import create_app
+from api.models import db, Event, Purchase, Ticket, User
+from api.utils.orders import crear_compra, generar_numero_orden, resumen_tickets
+from api.utils.qr import digest_qr
+
+CANTIDADES = [1, 10, 100, 1000]
+
+
+def compra_orm_uno_a_uno(user, event, quantity):
+    """Ruta anterior: un objeto ORM y un INSERT por ticket"""
+    order_number = generar_numero_orden()
+    purchase = Purchase(
+        order_number=order_number,
+        user_id=user.id,
+        event_id=event.id,
+        quantity=quantity,
+        unit_price=event.price,
+        total_price=event.price * quantity,
+        status='completed'
+    )
+    db.session.add(purchase)
+    db.session.flush()
+
+    tickets = []
+    for i in range(quantity):
+        ticket_number = f"{order_number}-T{i+1:03d}"
+        qr_code_data = f"TICKET:{ticket_number}:EVENT:{event.id}:USER:{user.email}"
+        ticket = Ticket(
+            purchase_id=purchase.id,
+            ticket_number=ticket_number,
+            qr_code_data=qr_code_data,
+            qr_digest=digest_qr(qr_code_data)
+        )
+        tickets.append(ticket)
+        db.session.add(ticket)
+
+    db.session.commit()
+    return [ticket.to_dict() for ticket in tickets]
+
+
+def compra_multi_fila(user, event, quantity):
+    """Ruta actual: tickets generados por adelantado e INSERT multi-fila"""
+    purchase, tickets = crear_compra(user, event, quantity, event.price, event.price * quantity)
+    db.session.commit()
+    return resumen_tickets(tickets)
+
+
+def medir(funcion, user_id, event_id, quantity, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        db.session.expunge_all()
+        user = db.session.get(User, user_id)
+        event = db.session.get(Event, event_id)
+        inicio = time.perf_counter()
+        funcion(user, event, quantity)
+        tiempos.append(time.perf_counter() - inicio)
+    tiempos.sort()
+    return tiempos[len(tiempos) // 2]
+
+
+def ejecutar_benchmark(repeticiones=5):
+    app = create_app()
+
+    with app.app_context():
+        event = Event(
+            id='benchmark-1', title='Evento Benchmark', artist='Varios', date='2025-01-01',
+            venue='Estadio', location='Santiago, Chile', price=1000,
+            available_tickets=0, total_tickets=0
+        )
+        user = User(email='benchmark@example.com', name='Bench', last_name='Mark')
+        db.session.add_all([event, user])
+        db.session.commit()
+        user_id, event_id = user.id, event.id
+
+        print("=" * 80)
+        print(f"🎟️  BENCHMARK DE COMPRAS GRUPALES (mediana de {repeticiones} repeticiones)")
+        print("=" * 80)
+        print(f"{'Entradas':>10} | {'ORM uno a uno':>15} | {'Multi-fila':>15} | {'Mejora':>8}")
+        print("-" * 80)
+
+        for quantity in CANTIDADES:
+            antes = medir(compra_orm_uno_a_uno, user_id, event_id, quantity, repeticiones)
+            despues = medir(compra_multi_fila, user_id, event_id, quantity, repeticiones)
+            print(f"{quantity:>10} | {antes * 1000:>12.2f} ms | {despues * 1000:>12.2f} ms | {antes / despues:>7.1f}x")
+
+        print("=" * 80)
+
+
+if __name__ == '__main__':
+    ejecutar_benchmark(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,148 @@
+"""
+Benchmark de la exportación del detalle de ventas (GET /api/reportes/ventas).
+
+Carga la base con cantidades crecientes de compras y, para cada tamaño, mide
+el tiempo hasta el primer byte, el tiempo total, el tamaño descargado y el
+pico de memoria Python (tracemalloc) de las exportaciones en streaming
+(formato=csv y formato=ndjson) y del Excel con todas las filas de detalle
+(formato=excel, escrito en modo de solo escritura a un archivo temporal).
+Como referencia mide también el JSON con datos_detallados, que arma la
+respuesta completa en memoria (solo hasta MAX_FILAS_JSON filas).
+
+Uso:
+    python benchmark_exportacion_ventas.py [filas ...]
+    python benchmark_exportacion_ventas.py 1000 100000 1000000 5000000
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+# Usar una base de datos temporal para no tocar la base de desarrollo
+_tmp_dir = tempfile.mkdtemp(prefix='benchmark_exportacion_ventas_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp_dir, 'benchmark.db')}"
+os.environ['RESERVATION_SWEEPER_ENABLED'] = 'False'
+
+from sqlalchemy import insert
+from api.app import create_app
+from api.models import db, Event, Purchase, User
+
+EVENTOS = 20
+FILAS_POR_INSERT = 50_000
+MAX_FILAS_JSON = 100_000
+
+
+def preparar_base(app):
+    with app.app_context():
+        eventos = [
+            Event(
+                id=f'export-{i}', title=f'Evento {i}', artist='Varios', date='2025-01-01',
+                venue='Estadio', location='Santiago, Chile', price=1000, category=['Rock', 'Pop', ''][i % 3],
+                available_tickets=0, total_tickets=0
+            )
+            for i in range(EVENTOS)
+        ]
+        user = User(email='export@example.com', name='Exportación', last_name='Benchmark')
+        db.session.add_all(eventos + [user])
+        db.session.commit()
+        return user.id
+
+
+def agregar_compras(app, user_id, desde, hasta):
+    """Insertar compras con id en [desde, hasta) directamente, sin tickets ni inventario"""
+    inicio = datetime(2025, 1, 1)
+    with app.app_context():
+        for bloque in range(desde, hasta, FILAS_POR_INSERT):
+            filas = []
+            for numero in range(bloque, min(bloque + FILAS_POR_INSERT, hasta)):
+                cantidad = random.randint(1, 4)
+                filas.append({
+                    'order_number': f'EXP-{numero:08d}', 'user_id': user_id,
+                    'event_id': f'export-{numero % EVENTOS}', 'quantity': cantidad, 'unit_price': 15000,
+                    'total_price': 15000 * cantidad, 'status': 'completed',
+                    'purchase_date': inicio + timedelta(seconds=random.randint(0, 365 * 86400))
+                })
+            db.session.execute(insert(Purchase), filas)
+            db.session.commit()
+            print(f"   {min(bloque + FILAS_POR_INSERT, hasta):,} compras...", end='\r')
+        print()
+
+
+def descargar(client, formato):
+    """(primer byte s, total s, bytes) de una exportación leída bloque a bloque"""
+    inicio = time.perf_counter()
+    response = client.get(f'/api/reportes/ventas?formato={formato}', buffered=False)
+    primer_byte = None
+    descargado = 0
+    for bloque in response.response:
+        if primer_byte is None:
+            primer_byte = time.perf_counter() - inicio
+        descargado += len(bloque)
+    total = time.perf_counter() - inicio
+    response.close()
+    assert response.status_code == 200
+    return primer_byte, total, descargado
+
+
+def medir(client, formato):
+    """(primer byte ms, total s, MB descargados, pico de memoria MB) de una exportación.
+
+    Los tiempos se toman en una descarga sin tracemalloc (que la haría varias
+    veces más lenta) y el pico de memoria en una segunda descarga.
+    """
+    primer_byte, total, descargado = descargar(client, formato)
+    tracemalloc.start()
+    descargar(client, formato)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return primer_byte * 1000, total, descargado / 1024 / 1024, pico / 1024 / 1024
+
+
+def ejecutar_benchmark(tamanos=(1_000, 100_000, 1_000_000)):
+    random.seed(42)
+    app = create_app()
+    user_id = preparar_base(app)
+    client = app.test_client()
+
+    resultados = []
+    filas = 0
+    for tamano in sorted(tamanos):
+        print(f"Cargando {tamano:,} compras...")
+        agregar_compras(app, user_id, filas, tamano)
+        filas = tamano
+        for formato in ('csv', 'ndjson', 'excel', 'json'):
+            if formato == 'json' and filas > MAX_FILAS_JSON:
+                continue
+            resultados.append((filas, formato, *medir(client, formato)))
+
+    print("=" * 80)
+    print("📤 BENCHMARK DE EXPORTACIÓN DEL DETALLE DE VENTAS")
+    print("=" * 80)
+    print(f"{'Filas':>10}{'Formato':>9}{'Primer byte ms':>16}{'Total s':>10}{'Filas/s':>12}{'MB':>10}{'Pico mem. MB':>13}")
+    print("-" * 80)
+    for filas, formato, primer_byte, total, descargado, pico in resultados:
+        print(
+            f"{filas:>10,}{formato:>9}{primer_byte:>16.1f}{total:>10.2f}{filas / total:>12,.0f}"
+            f"{descargado:>10.1f}{pico:>13.1f}"
+        )
+
+    # La memoria de CSV, NDJSON y Excel no debe crecer con la cantidad de filas
+    ok = True
+    for formato in ('csv', 'ndjson', 'excel'):
+        picos = [pico for _, f, _, _, _, pico in resultados if f == formato]
+        if max(picos) > 2 * min(picos) + 5:
+            ok = False
+            print(f"❌ El pico de memoria de {formato} crece con las filas: {min(picos):.1f} → {max(picos):.1f} MB")
+    if ok:
+        print()
+        print("✅ Memoria constante en las exportaciones CSV, NDJSON y Excel")
+    return ok
+
+
+if __name__ == '__main__':
+    tamanos = [int(a) for a in sys.argv[1:]] or (1_000, 100_000, 1_000_000)
+    ok = ejecutar_benchmark(tamanos)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,129 @@
+"""
+Benchmark de generación de PDF de entradas en el servidor.
+
+Mide, con compras sintéticas de `tickets_por_compra` entradas:
+  - generación en un solo proceso (PDF/s de un núcleo)
+  - generación en el pool de procesos ya calentado, con `workers` procesos
+    (PDF/s totales y por núcleo)
+  - GET /api/purchases/<id>/tickets.pdf: primera petición y peticiones
+    servidas desde la caché en disco
+
+Uso:
+    python benchmark_pdf_tickets.py [compras] [tickets_por_compra] [workers]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Usar una base de datos y una caché temporales para no tocar las de desarrollo
+_tmp_dir = tempfile.mkdtemp(prefix='benchmark_pdf_tickets_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp_dir, 'benchmark.db')}"
+os.environ['TICKET_PDF_CACHE_DIR'] = os.path.join(_tmp_dir, 'pdf')
+os.environ['RESERVATION_SWEEPER_ENABLED'] = 'False'
+
+from api.app import create_app
+from api.models import db, Event, User
+from api.utils.orders import crear_compra
+from api.utils.ticket_pdf import generar_pdf_tickets, _iniciar_proceso
+
+PETICIONES_CACHE = 200
+
+
+def datos_sinteticos(indice, tickets_por_compra):
+    order_number = f'ORD-20250101-{indice:08X}'
+    return {
+        'orderNumber': order_number,
+        'purchaseDate': '01/01/2025 12:00',
+        'event': {
+            'title': 'Festival de Viña', 'artist': 'Varios', 'date': '2025-02-20', 'time': '21:00',
+            'venue': 'Quinta Vergara', 'location': 'Viña del Mar, Chile'
+        },
+        'buyer': {'name': 'Ana Pérez', 'email': f'comprador{indice}@example.com'},
+        'tickets': [
+            {'ticketNumber': f'{order_number}-T{n:03d}', 'qrCodeData': f'TK1.{order_number}-T{n:03d}.evento-1.firma'}
+            for n in range(1, tickets_por_compra + 1)
+        ]
+    }
+
+
+def medir_un_proceso(compras):
+    inicio = time.perf_counter()
+    total_bytes = sum(len(generar_pdf_tickets(datos)) for datos in compras)
+    return time.perf_counter() - inicio, total_bytes
+
+
+def medir_pool(compras, workers):
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=contexto, initializer=_iniciar_proceso) as pool:
+        # Calentar: esperar a que todos los procesos estén listos antes de medir
+        list(pool.map(len, [''] * workers * 4))
+        inicio = time.perf_counter()
+        list(pool.map(generar_pdf_tickets, compras, chunksize=4))
+        return time.perf_counter() - inicio
+
+
+def medir_endpoint(tickets_por_compra):
+    app = create_app()
+    with app.app_context():
+        event = Event(
+            id='pdf-1', title='Evento PDF', artist='Varios', date='2025-01-01',
+            venue='Estadio', location='Santiago, Chile', price=1000,
+            available_tickets=0, total_tickets=tickets_por_compra
+        )
+        user = User(email='pdf@example.com', name='P', last_name='DF')
+        db.session.add_all([event, user])
+        db.session.flush()
+        purchase, _ = crear_compra(user, event, tickets_por_compra, 1000, 1000 * tickets_por_compra)
+        db.session.commit()
+        purchase_id = purchase.id
+
+    client = app.test_client()
+    inicio = time.perf_counter()
+    response = client.get(f'/api/purchases/{purchase_id}/tickets.pdf')
+    primera = time.perf_counter() - inicio
+    assert response.status_code == 200, response.get_data(as_text=True)
+
+    latencias = []
+    for _ in range(PETICIONES_CACHE):
+        inicio = time.perf_counter()
+        client.get(f'/api/purchases/{purchase_id}/tickets.pdf')
+        latencias.append(time.perf_counter() - inicio)
+    latencias.sort()
+    app.extensions['pdf_tickets'].cerrar()
+    return primera, latencias[len(latencias) // 2], latencias[int(len(latencias) * 0.99)]
+
+
+def ejecutar_benchmark(compras=200, tickets_por_compra=4, workers=None):
+    workers = workers or os.cpu_count()
+    datos = [datos_sinteticos(i, tickets_por_compra) for i in range(compras)]
+
+    _iniciar_proceso()
+    segundos_uno, total_bytes = medir_un_proceso(datos)
+    segundos_pool = medir_pool(datos, workers)
+    primera, p50, p99 = medir_endpoint(tickets_por_compra)
+
+    print("=" * 80)
+    print("🎫 BENCHMARK DE PDF DE ENTRADAS")
+    print("=" * 80)
+    print(f"Compras: {compras} | Entradas por compra: {tickets_por_compra} | Procesos del pool: {workers}")
+    print(f"Tamaño promedio: {total_bytes / compras / 1024:.1f} KB por PDF")
+    print()
+    print(f"{'Modo':<28}{'PDF/s':>12}{'PDF/s por núcleo':>20}{'Páginas/s':>14}")
+    print("-" * 80)
+    for modo, segundos, nucleos in (('Un proceso', segundos_uno, 1), (f'Pool ({workers} procesos)', segundos_pool, workers)):
+        por_segundo = compras / segundos
+        print(f"{modo:<28}{por_segundo:>12.1f}{por_segundo / nucleos:>20.1f}{por_segundo * tickets_por_compra:>14.1f}")
+    print()
+    print(f"Endpoint, primera petición (incluye arranque del pool): {primera * 1000:.0f} ms")
+    print(f"Endpoint desde caché ({PETICIONES_CACHE} peticiones): p50 {p50 * 1000:.2f} ms | p99 {p99 * 1000:.2f} ms")
+    print("✅ Benchmark completado")
+    return True
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:4]]
+    ok = ejecutar_benchmark(*args)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,105 @@
+"""
+Benchmark del pipeline de compras: confirmación síncrona vs aceptación con confirmación en lote.
+
+Lanza `hilos` compradores concurrentes que realizan `compras_por_hilo` compras
+cada uno y reporta, para cada modo:
+  - órdenes por segundo hasta que todas quedan confirmadas en la base de datos
+  - latencia p50/p99 de aceptación (lo que espera el cliente en POST /api/purchases)
+
+Uso:
+    python benchmark_pipeline_compras.py [hilos] [compras_por_hilo]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+os.environ['RESERVATION_SWEEPER_ENABLED'] = 'False'
+
+from api.app import create_app
+from api.models import db, Event, Purchase, User
+
+EVENT_ID = 'pipeline-1'
+
+
+def crear_app(modo):
+    # Una base de datos temporal por modo, para no tocar la base de desarrollo
+    tmp_dir = tempfile.mkdtemp(prefix=f'benchmark_pipeline_{modo}_')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp_dir, 'benchmark.db')}"
+    os.environ['PURCHASE_PIPELINE_MODE'] = modo
+    app = create_app()
+
+    with app.app_context():
+        db.session.add(Event(
+            id=EVENT_ID, title='Evento Pipeline', artist='Varios', date='2025-01-01',
+            venue='Estadio', location='Santiago, Chile', price=1000,
+            available_tickets=1_000_000, total_tickets=1_000_000
+        ))
+        user = User(email='pipeline@example.com', name='Pipe', last_name='Line')
+        db.session.add(user)
+        db.session.commit()
+        return app, user.id
+
+
+def comprador(app, user_id, compras, barrera, latencias):
+    client = app.test_client()
+    barrera.wait()
+    for _ in range(compras):
+        inicio = time.perf_counter()
+        response = client.post('/api/purchases', json={
+            'userId': user_id,
+            'eventId': EVENT_ID,
+            'quantity': 2,
+            'unitPrice': 1000,
+            'totalPrice': 2000
+        })
+        latencias.append((time.perf_counter() - inicio, response.status_code))
+
+
+def confirmadas(app):
+    with app.app_context():
+        return Purchase.query.filter_by(event_id=EVENT_ID).count()
+
+
+def medir(modo, hilos, compras_por_hilo):
+    app, user_id = crear_app(modo)
+    latencias = []
+    barrera = threading.Barrier(hilos)
+    workers = [
+        threading.Thread(target=comprador, args=(app, user_id, compras_por_hilo, barrera, latencias))
+        for _ in range(hilos)
+    ]
+
+    inicio = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    aceptadas = sum(1 for _, status in latencias if status in (201, 202))
+    while confirmadas(app) < aceptadas:
+        time.sleep(0.01)
+    duracion = time.perf_counter() - inicio
+
+    tiempos = sorted(latencia for latencia, _ in latencias)
+    percentil = lambda p: tiempos[min(len(tiempos) - 1, int(p * len(tiempos)))] * 1000
+    return aceptadas / duracion, percentil(0.5), percentil(0.99), len(latencias) - aceptadas
+
+
+def ejecutar_benchmark(hilos=16, compras_por_hilo=50):
+    resultados = [(modo, medir(modo, hilos, compras_por_hilo)) for modo in ('sync', 'async')]
+
+    print("=" * 80)
+    print("⚙️  BENCHMARK PIPELINE DE COMPRAS")
+    print("=" * 80)
+    print(f"Hilos: {hilos} | Compras por hilo: {compras_por_hilo}")
+    print(f"{'Modo':<8} | {'Órdenes/s':>10} | {'p50 aceptación':>15} | {'p99 aceptación':>15} | {'Errores':>7}")
+    print("-" * 80)
+    for modo, (ordenes_por_segundo, p50, p99, errores) in resultados:
+        print(f"{modo:<8} | {ordenes_por_segundo:>10.1f} | {p50:>12.2f} ms | {p99:>12.2f} ms | {errores:>7}")
+    print("=" * 80)
+
+
+if __name__ == '__main__':
+    ejecutar_benchmark(*[int(a) for a in sys.argv[1:3]])
@@ -0,0 +1,158 @@
+"""
+Benchmark de números de ticket compactos vs el formato anterior.
+
+Crea `tickets` entradas (por defecto 1.000.000) con números compactos
+(13 caracteres base32 con dígito de control) y mide el tamaño del índice
+único de ticket_number y la búsqueda por número de ticket. Luego reescribe
+los mismos tickets con el formato anterior (ORD-AAAAMMDD-XXXXXXXX-T001) y
+repite las mediciones. Ambas mediciones se hacen tras VACUUM, con el índice
+reconstruido. También compara el largo y la versión QR de los datos firmados.
+
+Uso:
+    python benchmark_ticket_ids.py [tickets] [busquedas]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Usar una base de datos temporal para no tocar la base de desarrollo
+_tmp_dir = tempfile.mkdtemp(prefix='benchmark_ticket_ids_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp_dir, 'benchmark.db')}"
+os.environ['RESERVATION_SWEEPER_ENABLED'] = 'False'
+
+import qrcode
+from sqlalchemy import select, text
+from api.app import create_app
+from api.models import db, Event, Ticket, User
+from api.utils.orders import crear_compra
+from api.utils.qr import PREFIJO_QR_FIRMADO_V1, _firma
+
+EVENT_ID = 'ids-1'
+TICKETS_POR_COMPRA = 1000
+
+
+def preparar_datos(app, tickets):
+    with app.app_context():
+        event = Event(
+            id=EVENT_ID, title='Evento IDs', artist='Varios', date='2025-01-01',
+            venue='Estadio', location='Santiago, Chile', price=1000,
+            available_tickets=0, total_tickets=tickets
+        )
+        user = User(email='ids@example.com', name='I', last_name='D')
+        db.session.add_all([event, user])
+        db.session.commit()
+
+        creados = 0
+        while creados < tickets:
+            cantidad = min(TICKETS_POR_COMPRA, tickets - creados)
+            crear_compra(user, event, cantidad, 1000, 1000 * cantidad)
+            creados += cantidad
+            if creados % 50000 == 0:
+                db.session.commit()
+                print(f"   {creados:,} tickets creados...", end='\r')
+        db.session.commit()
+        print()
+
+
+def tamano_indice():
+    """(bytes, páginas) del índice único de ticket_number, tras reconstruir la base"""
+    db.session.commit()
+    with db.engine.connect() as conexion:
+        conexion.execution_options(isolation_level='AUTOCOMMIT').execute(text('VACUUM'))
+    nombre = db.session.execute(text(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'tickets' AND sql LIKE '%(ticket_number)%'"
+    )).scalar()
+    return db.session.execute(text(
+        'SELECT SUM(pgsize), COUNT(*) FROM dbstat WHERE name = :nombre'
+    ), {'nombre': nombre}).one()
+
+
+def muestra_numeros(ids):
+    return db.session.execute(select(Ticket.ticket_number).where(Ticket.id.in_(ids))).scalars().all()
+
+
+def medir_busquedas(app, numeros):
+    """Percentiles (ms) de búsqueda directa por índice y vía GET /api/tickets/<ticket_number>"""
+    directa = []
+    for numero in numeros:
+        inicio = time.perf_counter()
+        db.session.execute(select(Ticket.id).where(Ticket.ticket_number == numero)).scalar_one()
+        directa.append(time.perf_counter() - inicio)
+
+    client = app.test_client()
+    endpoint = []
+    for numero in numeros:
+        inicio = time.perf_counter()
+        response = client.get(f'/api/tickets/{numero}')
+        endpoint.append(time.perf_counter() - inicio)
+        assert response.status_code == 200
+    return percentiles(directa), percentiles(endpoint)
+
+
+def percentiles(tiempos):
+    tiempos = sorted(tiempos)
+    return tiempos[len(tiempos) // 2] * 1000, tiempos[int(len(tiempos) * 0.99)] * 1000
+
+
+def version_qr(qr_data):
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M)
+    qr.add_data(qr_data)
+    qr.make(fit=True)
+    return qr.version
+
+
+def ejecutar_benchmark(tickets=1_000_000, busquedas=2000):
+    app = create_app()
+    print(f"Creando {tickets:,} tickets con números compactos...")
+    preparar_datos(app, tickets)
+
+    resultados = {}
+    with app.app_context():
+        ids = random.sample(range(1, tickets + 1), min(busquedas, tickets))
+        qr_compacto = db.session.execute(select(Ticket.qr_code_data).where(Ticket.id == ids[0])).scalar()
+
+        numeros = muestra_numeros(ids)
+        resultados['Compacto'] = (tamano_indice(), *medir_busquedas(app, numeros), numeros[0], qr_compacto)
+
+        # Mismos tickets con el formato anterior: ORD-<fecha>-<8 hex>-T<nnn> por compra
+        print("Reescribiendo los tickets con el formato anterior...")
+        db.session.execute(text(
+            "UPDATE tickets SET ticket_number = printf('ORD-20250101-%08X-T%03d', purchase_id, (id - 1) % 1000 + 1)"
+        ))
+        db.session.commit()
+        numeros = muestra_numeros(ids)
+        cuerpo = f"{PREFIJO_QR_FIRMADO_V1}.{numeros[0]}.{EVENT_ID}"
+        qr_anterior = f"{cuerpo}.{_firma(cuerpo, app.config['QR_SIGNING_KEY'])}"
+        resultados['Anterior'] = (tamano_indice(), *medir_busquedas(app, numeros), numeros[0], qr_anterior)
+
+    print("=" * 80)
+    print("🔢 BENCHMARK DE NÚMEROS DE TICKET")
+    print("=" * 80)
+    print(f"Tickets: {tickets:,} | Búsquedas: {len(ids):,}")
+    print()
+    print(f"{'Formato':<10}{'Índice (MB)':>12}{'Bytes/ticket':>13}{'Directa p50/p99 ms':>22}{'Endpoint p50/p99 ms':>23}")
+    print("-" * 80)
+    for formato, ((bytes_indice, _), directa, endpoint, _, _) in resultados.items():
+        print(
+            f"{formato:<10}{bytes_indice / 1024 / 1024:>12.1f}{bytes_indice / tickets:>13.1f}"
+            f"{f'{directa[0]:.3f} / {directa[1]:.3f}':>22}{f'{endpoint[0]:.3f} / {endpoint[1]:.3f}':>23}"
+        )
+    print()
+    print(f"{'Formato':<10}{'Número de ticket':<30}{'Datos QR':>12}{'Versión QR':>14}{'Módulos':>14}")
+    print("-" * 80)
+    for formato, (_, _, _, numero, qr_data) in resultados.items():
+        version = version_qr(qr_data)
+        print(f"{formato:<10}{numero:<30}{len(qr_data):>12}{version:>14}{f'{17 + 4 * version}x{17 + 4 * version}':>14}")
+
+    (compacto, _), (anterior, _) = resultados['Compacto'][0], resultados['Anterior'][0]
+    print()
+    print(f"✅ Índice de ticket_number {100 * (1 - compacto / anterior):.0f}% más pequeño con números compactos")
+    return True
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:3]]
+    ok = ejecutar_benchmark(*args)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,158 @@
+"""
+Benchmark de búsqueda de QR en la puerta: digest indexado vs texto completo sin índice.
+
+Crea `tickets` entradas (por defecto 1.000.000) en una base temporal y mide:
+  - búsqueda por qr_digest (índice único), directa a la base y vía GET /api/tickets/qr/<qr>
+  - búsqueda anterior por qr_code_data (recorrido completo de la tabla), con pocas muestras
+  - verificación de firma de QR solo en CPU y rechazo de QR falsificados vía el endpoint
+
+La búsqueda por digest debe mantenerse bajo el milisegundo aunque crezca la tabla.
+
+Uso:
+    python benchmark_validacion_qr.py [tickets] [busquedas]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Usar una base de datos temporal para no tocar la base de desarrollo
+_tmp_dir = tempfile.mkdtemp(prefix='benchmark_validacion_qr_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp_dir, 'benchmark.db')}"
+os.environ['RESERVATION_SWEEPER_ENABLED'] = 'False'
+
+from api.app import create_app
+from api.models import db, Event, Ticket, User
+from api.utils.orders import crear_compra
+from api.utils.qr import digest_qr, verificar_qr
+
+EVENT_ID = 'qr-1'
+TICKETS_POR_COMPRA = 1000
+MUESTRAS_SIN_INDICE = 5
+
+
+def preparar_datos(app, tickets):
+    """Crear las compras del benchmark y retornar una muestra de datos QR existentes"""
+    with app.app_context():
+        event = Event(
+            id=EVENT_ID, title='Evento QR', artist='Varios', date='2025-01-01',
+            venue='Estadio', location='Santiago, Chile', price=1000,
+            available_tickets=0, total_tickets=tickets
+        )
+        user = User(email='qr@example.com', name='Q', last_name='R')
+        db.session.add_all([event, user])
+        db.session.commit()
+
+        muestra = []
+        creados = 0
+        while creados < tickets:
+            cantidad = min(TICKETS_POR_COMPRA, tickets - creados)
+            _, generados = crear_compra(user, event, cantidad, 1000, 1000 * cantidad)
+            muestra.append(random.choice(generados)['qr_code_data'])
+            creados += cantidad
+            if len(muestra) % 50 == 0:
+                db.session.commit()
+                print(f"   {creados:,} tickets creados...", end='\r')
+        db.session.commit()
+        print()
+        return muestra
+
+
+def percentiles(tiempos):
+    tiempos = sorted(tiempos)
+    percentil = lambda p: tiempos[min(len(tiempos) - 1, int(p * len(tiempos)))] * 1000
+    return percentil(0.5), percentil(0.99)
+
+
+def medir_digest(app, qrs):
+    tiempos = []
+    with app.app_context():
+        for qr_data in qrs:
+            inicio = time.perf_counter()
+            ticket = Ticket.query.filter_by(qr_digest=digest_qr(qr_data)).first()
+            tiempos.append(time.perf_counter() - inicio)
+            assert ticket is not None
+            db.session.expunge_all()
+    return percentiles(tiempos)
+
+
+def medir_endpoint(app, qrs):
+    client = app.test_client()
+    tiempos = []
+    for qr_data in qrs:
+        inicio = time.perf_counter()
+        response = client.get(f'/api/tickets/qr/{qr_data}')
+        tiempos.append(time.perf_counter() - inicio)
+        assert response.status_code == 200
+    return percentiles(tiempos)
+
+
+def medir_firma(app, qrs):
+    clave = app.config['QR_SIGNING_KEY']
+    tiempos = []
+    for qr_data in qrs:
+        inicio = time.perf_counter()
+        verificado = verificar_qr(qr_data, clave)
+        tiempos.append(time.perf_counter() - inicio)
+        assert verificado is not None
+    return percentiles(tiempos)
+
+
+def medir_falsificados(app, qrs):
+    """QR con la firma alterada: deben rechazarse sin consultar la base"""
+    client = app.test_client()
+    tiempos = []
+    for qr_data in qrs:
+        falsificado = qr_data[:-4] + ('AAAA' if not qr_data.endswith('AAAA') else 'BBBB')
+        inicio = time.perf_counter()
+        response = client.get(f'/api/tickets/qr/{falsificado}')
+        tiempos.append(time.perf_counter() - inicio)
+        assert response.status_code == 404
+    return percentiles(tiempos)
+
+
+def medir_sin_indice(app, qrs):
+    tiempos = []
+    with app.app_context():
+        for qr_data in qrs[:MUESTRAS_SIN_INDICE]:
+            inicio = time.perf_counter()
+            ticket = Ticket.query.filter_by(qr_code_data=qr_data).first()
+            tiempos.append(time.perf_counter() - inicio)
+            assert ticket is not None
+    return percentiles(tiempos)
+
+
+def ejecutar_benchmark(tickets=1_000_000, busquedas=2000):
+    app = create_app()
+    print(f"Creando {tickets:,} tickets en {_tmp_dir} ...")
+    muestra = preparar_datos(app, tickets)
+    qrs = [random.choice(muestra) for _ in range(busquedas)]
+
+    resultados = [
+        ('qr_digest (índice único)', medir_digest(app, qrs)),
+        ('GET /api/tickets/qr/<qr>', medir_endpoint(app, qrs)),
+        ('qr_code_data (sin índice)', medir_sin_indice(app, qrs)),
+        ('verificar_qr (solo CPU)', medir_firma(app, qrs)),
+        ('GET QR falsificado (404)', medir_falsificados(app, qrs)),
+    ]
+
+    print("=" * 80)
+    print("🎫 BENCHMARK BÚSQUEDA DE QR")
+    print("=" * 80)
+    print(f"Tickets: {tickets:,} | Búsquedas: {busquedas} ({MUESTRAS_SIN_INDICE} sin índice)")
+    print(f"{'Búsqueda':<28} | {'p50':>10} | {'p99':>10}")
+    print("-" * 80)
+    for nombre, (p50, p99) in resultados:
+        print(f"{nombre:<28} | {p50:>7.3f} ms | {p99:>7.3f} ms")
+    print("=" * 80)
+
+    p99_digest = resultados[0][1][1]
+    icono = "✅" if p99_digest < 1 else "❌"
+    print(f"{icono} p99 de búsqueda por digest: {p99_digest:.3f} ms (objetivo < 1 ms)")
+    return p99_digest < 1
+
+
+if __name__ == '__main__':
+    ok = ejecutar_benchmark(*[int(a) for a in sys.argv[1:3]])
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,127 @@
+"""
+Prueba de carga de la sala de espera ante un pico de compras.
+
+Mide la latencia de POST /api/purchases en tres escenarios:
+  1. Carga base: `clientes` compradores simultáneos, sin sala de espera.
+  2. Pico 10x sin sala de espera: todos golpean la ruta de compra a la vez.
+  3. Pico 10x con sala de espera: cada comprador toma un turno, consulta su
+     posición en memoria y solo compra cuando es admitido.
+
+Con la sala de espera la latencia de compra debe mantenerse plana respecto
+a la carga base, porque la concurrencia en la ruta de compra queda acotada
+por la tasa de admisión.
+
+Uso:
+    python carga_sala_espera.py [clientes] [tasa_admision]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Usar una base de datos temporal para no tocar la base de desarrollo
+_tmp_dir = tempfile.mkdtemp(prefix='carga_sala_espera_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp_dir, 'carga.db')}"
+os.environ['RESERVATION_SWEEPER_ENABLED'] = 'False'
+os.environ['QUEUE_DIR'] = os.path.join(_tmp_dir, 'sala_espera')
+
+from api.app import create_app
+from api.models import db, Event, User
+
+EVENT_ID = 'carga-1'
+INTERVALO_CONSULTA = 0.05
+
+
+def preparar_datos(app):
+    with app.app_context():
+        db.session.add(Event(
+            id=EVENT_ID, title='Salida a Venta', artist='Varios', date='2025-01-01',
+            venue='Estadio', location='Santiago, Chile', price=1000,
+            available_tickets=1_000_000, total_tickets=1_000_000
+        ))
+        user = User(email='carga@example.com', name='Carga', last_name='Test')
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def comprar(client, user_id, headers=None):
+    inicio = time.perf_counter()
+    response = client.post('/api/purchases', headers=headers or {}, json={
+        'userId': user_id,
+        'eventId': EVENT_ID,
+        'quantity': 1,
+        'unitPrice': 1000,
+        'totalPrice': 1000
+    })
+    return time.perf_counter() - inicio, response.status_code
+
+
+def comprador_directo(app, user_id, barrera, resultados):
+    client = app.test_client()
+    barrera.wait()
+    resultados.append(comprar(client, user_id))
+
+
+def comprador_en_cola(app, user_id, barrera, resultados):
+    client = app.test_client()
+    barrera.wait()
+    respuesta = client.post(f'/api/queue/{EVENT_ID}/join').get_json()
+    token, estado = respuesta['token'], respuesta['status']
+    # Como un cliente real: esperar el tiempo estimado antes de volver a consultar
+    while not estado['admitted']:
+        time.sleep(max(INTERVALO_CONSULTA, estado['estimatedWaitSeconds'] * 0.8))
+        estado = client.get(f'/api/queue/{EVENT_ID}/status', headers={'X-Queue-Token': token}).get_json()['status']
+    resultados.append(comprar(client, user_id, {'X-Queue-Token': token}))
+
+
+def ejecutar_escenario(app, user_id, compradores, objetivo):
+    resultados = []
+    barrera = threading.Barrier(compradores)
+    hilos = [
+        threading.Thread(target=objetivo, args=(app, user_id, barrera, resultados))
+        for _ in range(compradores)
+    ]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    duracion = time.perf_counter() - inicio
+
+    latencias = sorted(latencia for latencia, _ in resultados)
+    errores = sum(1 for _, status in resultados if status != 201)
+    percentil = lambda p: latencias[min(len(latencias) - 1, int(p * len(latencias)))] * 1000
+    return percentil(0.5), percentil(0.99), errores, duracion
+
+
+def ejecutar_carga(clientes=10, tasa_admision=30):
+    app = create_app()
+    user_id = preparar_datos(app)
+    print("=" * 80)
+    print("🚦 PRUEBA DE CARGA: SALA DE ESPERA")
+    print("=" * 80)
+    print(f"Carga base: {clientes} compradores | Pico: {clientes * 10} compradores | Admisión: {tasa_admision}/s")
+    print(f"{'Escenario':<28} | {'p50':>10} | {'p99':>10} | {'Errores':>7} | {'Duración':>9}")
+    print("-" * 80)
+
+    escenarios = [
+        ('Carga base', clientes, comprador_directo, False),
+        ('Pico 10x sin sala', clientes * 10, comprador_directo, False),
+        ('Pico 10x con sala', clientes * 10, comprador_en_cola, True),
+    ]
+    for nombre, compradores, objetivo, con_sala in escenarios:
+        if con_sala:
+            app.test_client().put(f'/api/queue/{EVENT_ID}', json={'admissionRate': tasa_admision})
+        p50, p99, errores, duracion = ejecutar_escenario(app, user_id, compradores, objetivo)
+        if con_sala:
+            app.test_client().delete(f'/api/queue/{EVENT_ID}')
+        print(f"{nombre:<28} | {p50:>7.2f} ms | {p99:>7.2f} ms | {errores:>7} | {duracion:>7.2f} s")
+
+    print("=" * 80)
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:2]] + [float(a) for a in sys.argv[2:3]]
+    ejecutar_carga(*args)
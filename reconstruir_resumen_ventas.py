@@ -0,0 +1,52 @@
+"""
+Reconstruir y verificar el resumen diario de ventas (tabla sales_daily_rollup).
+
+Recalcula desde cero las filas (día, evento, categoría) a partir de la tabla
+purchases y luego compara el resumen con las compras. Trabaja sobre la base
+configurada en DATABASE_URL. Termina con código de salida 1 si quedan
+diferencias.
+
+Uso:
+    python reconstruir_resumen_ventas.py                  # reconstruir y verificar
+    python reconstruir_resumen_ventas.py --solo-verificar # solo comparar, sin escribir
+"""
+import os
+import sys
+import time
+
+os.environ.setdefault('RESERVATION_SWEEPER_ENABLED', 'False')
+
+from api.app import create_app
+from api.utils.sales_rollup import reconstruir_resumen, verificar_resumen
+
+
+def ejecutar(solo_verificar=False):
+    app = create_app()
+    print("=" * 80)
+    print("📊 RESUMEN DIARIO DE VENTAS")
+    print("=" * 80)
+    with app.app_context():
+        if not solo_verificar:
+            inicio = time.perf_counter()
+            filas = reconstruir_resumen()
+            print(f"🛠️  Resumen reconstruido: {filas} filas en {time.perf_counter() - inicio:.2f} s")
+
+        inicio = time.perf_counter()
+        diferencias = verificar_resumen()
+        print(f"🔎 Verificación contra purchases en {time.perf_counter() - inicio:.2f} s")
+
+    if diferencias:
+        print("-" * 80)
+        for diferencia in diferencias[:50]:
+            print(f"   {diferencia}")
+        if len(diferencias) > 50:
+            print(f"   ... y {len(diferencias) - 50} más")
+        print(f"❌ {len(diferencias)} filas del resumen no coinciden con las compras")
+        return False
+    print("✅ El resumen coincide con las compras")
+    return True
+
+
+if __name__ == '__main__':
+    ok = ejecutar(solo_verificar='--solo-verificar' in sys.argv[1:])
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,119 @@
+"""
+Script de estrés: muchos compradores concurrentes sobre un mismo evento.
+
+Verifica que el inventario nunca quede negativo y que la suma de entradas
+vendidas coincida exactamente con lo descontado del evento.
+
+Con shards > 0 el evento usa inventario repartido en sub-contadores.
+
+Uso:
+    python stress_compras_concurrentes.py [hilos] [entradas] [compras_por_hilo] [shards]
+"""
+import os
+import sys
+import tempfile
+import threading
+from collections import Counter
+
+# Usar una base de datos temporal para no tocar la base de desarrollo
+_tmp_dir = tempfile.mkdtemp(prefix='stress_compras_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp_dir, 'stress.db')}"
+
+from api.app import create_app
+from api.models import db, Event, Purchase, User
+from api.utils.inventory import activar_shards
+
+EVENT_ID = 'stress-1'
+
+
+def preparar_datos(app, entradas, shards):
+    with app.app_context():
+        event = Event(
+            id=EVENT_ID,
+            title='Evento de Estrés',
+            artist='Varios',
+            date='2025-01-01',
+            venue='Estadio',
+            location='Santiago, Chile',
+            price=1000,
+            available_tickets=entradas,
+            total_tickets=entradas
+        )
+        db.session.add(event)
+        db.session.flush()
+        if shards:
+            activar_shards(event, shards)
+        user = User(email='stress@example.com', name='Stress', last_name='Test')
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def comprador(app, user_id, compras, barrera, resultados, lock):
+    client = app.test_client()
+    barrera.wait()
+    for i in range(compras):
+        quantity = 1 + (i % 3)
+        response = client.post('/api/purchases', json={
+            'userId': user_id,
+            'eventId': EVENT_ID,
+            'quantity': quantity,
+            'unitPrice': 1000,
+            'totalPrice': 1000 * quantity
+        })
+        with lock:
+            resultados[response.status_code] += 1
+
+
+def ejecutar_estres(hilos=32, entradas=200, compras_por_hilo=20, shards=0):
+    app = create_app()
+    user_id = preparar_datos(app, entradas, shards)
+
+    resultados = Counter()
+    lock = threading.Lock()
+    barrera = threading.Barrier(hilos)
+    workers = [
+        threading.Thread(target=comprador, args=(app, user_id, compras_por_hilo, barrera, resultados, lock))
+        for _ in range(hilos)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    with app.app_context():
+        event = Event.query.get(EVENT_ID)
+        vendidas = db.session.query(db.func.coalesce(db.func.sum(Purchase.quantity), 0)).filter(
+            Purchase.event_id == EVENT_ID,
+            Purchase.status == 'completed'
+        ).scalar()
+
+        print("=" * 80)
+        print("🔥 ESTRÉS DE COMPRAS CONCURRENTES")
+        print("=" * 80)
+        print(f"Hilos: {hilos} | Compras por hilo: {compras_por_hilo} | Entradas iniciales: {entradas} | Shards: {shards}")
+        print(f"Respuestas: {dict(sorted(resultados.items()))}")
+        print(f"Entradas vendidas: {vendidas}")
+        print(f"Entradas disponibles: {event.entradas_disponibles}/{event.total_tickets}")
+
+        errores = []
+        if event.entradas_disponibles < 0:
+            errores.append('El inventario quedó negativo')
+        if vendidas + event.entradas_disponibles != event.total_tickets:
+            errores.append('Las entradas vendidas no coinciden con el descuento del evento')
+        if vendidas > entradas:
+            errores.append('Se vendieron más entradas de las existentes')
+
+        if errores:
+            for error in errores:
+                print(f"❌ {error}")
+            return False
+
+        print("✅ Sin sobreventa: el inventario nunca quedó negativo")
+        return True
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:5]]
+    ok = ejecutar_estres(*args)
+    sys.exit(0 if ok else 1)
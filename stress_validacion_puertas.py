@@ -0,0 +1,172 @@
+"""
+Script de estrés: varias puertas escaneando los mismos tickets a la vez.
+
+Cada puerta valida todos los tickets del evento en lotes por
+POST /api/tickets/validate, en orden aleatorio, y la mitad de las puertas
+usa además el endpoint individual POST /api/tickets/<ticket_number>/validate.
+Verifica que cada ticket se admita exactamente una vez y que el contador de
+asistencia del evento coincida con los tickets usados.
+
+Con modo 'caliente' el evento se pone en modo día de evento y cada puerta
+corre en un proceso distinto, compartiendo el almacén local de validación;
+al final se desactiva el modo y se verifica que la base quedó consistente.
+
+Uso:
+    python stress_validacion_puertas.py [puertas] [tickets] [tamano_lote] [db|caliente]
+"""
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+from collections import Counter
+
+# Usar una base de datos temporal para no tocar la base de desarrollo
+_tmp_dir = tempfile.mkdtemp(prefix='stress_validacion_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp_dir, 'stress.db')}"
+os.environ['HOT_VALIDATION_DIR'] = os.path.join(_tmp_dir, 'validacion')
+os.environ['RESERVATION_SWEEPER_ENABLED'] = 'False'
+
+from api.app import create_app
+from api.models import db, Event, Ticket, User
+from api.utils.orders import crear_compra
+
+EVENT_ID = 'puertas-1'
+
+
+def preparar_datos(app, tickets):
+    with app.app_context():
+        event = Event(
+            id=EVENT_ID, title='Evento Puertas', artist='Varios', date='2025-01-01',
+            venue='Estadio', location='Santiago, Chile', price=1000,
+            available_tickets=0, total_tickets=tickets
+        )
+        user = User(email='puertas@example.com', name='Puertas', last_name='Test')
+        db.session.add_all([event, user])
+        db.session.flush()
+        _, generados = crear_compra(user, event, tickets, 1000, 1000 * tickets)
+        db.session.commit()
+        return [t['ticket_number'] for t in generados]
+
+
+def puerta(app, indice, ticket_numbers, tamano_lote, barrera):
+    """Validar todos los tickets en orden aleatorio; retorna (admitidos, veredictos)"""
+    client = app.test_client()
+    orden = random.sample(ticket_numbers, len(ticket_numbers))
+    admitidos = []
+    veredictos = Counter()
+    barrera.wait()
+    for inicio in range(0, len(orden), tamano_lote):
+        lote = orden[inicio:inicio + tamano_lote]
+        if indice % 2 and inicio % (2 * tamano_lote) == 0:
+            # Puertas impares alternan con el endpoint individual
+            for ticket_number in lote:
+                response = client.post(f'/api/tickets/{ticket_number}/validate')
+                if response.status_code == 200:
+                    admitidos.append(ticket_number)
+                    veredictos['admitted'] += 1
+                else:
+                    veredictos['already_used'] += 1
+            continue
+
+        response = client.post('/api/tickets/validate', json={'ticketNumbers': lote})
+        for resultado in response.get_json()['results']:
+            veredictos[resultado['status']] += 1
+            if resultado['status'] == 'admitted':
+                admitidos.append(resultado['ticketNumber'])
+    return admitidos, veredictos
+
+
+def puerta_en_proceso(entorno, indice, ticket_numbers, tamano_lote, barrera, salida):
+    # Proceso nuevo: usar la misma base y el mismo almacén local que el proceso principal
+    os.environ.update(entorno)
+    app = create_app()
+    salida.put(puerta(app, indice, ticket_numbers, tamano_lote, barrera))
+    # Escribir en la base las admisiones pendientes de este proceso antes de terminar
+    with app.app_context():
+        app.extensions['validacion_en_caliente'].escribir_pendientes()
+
+
+def ejecutar_en_hilos(app, puertas, ticket_numbers, tamano_lote):
+    resultados = []
+    barrera = threading.Barrier(puertas)
+    workers = [
+        threading.Thread(target=lambda i=i: resultados.append(puerta(app, i, ticket_numbers, tamano_lote, barrera)))
+        for i in range(puertas)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return resultados
+
+
+def ejecutar_en_procesos(app, puertas, ticket_numbers, tamano_lote):
+    contexto = multiprocessing.get_context('spawn')
+    barrera = contexto.Barrier(puertas)
+    salida = contexto.Queue()
+    entorno = {clave: os.environ[clave] for clave in ('DATABASE_URL', 'HOT_VALIDATION_DIR', 'RESERVATION_SWEEPER_ENABLED')}
+    procesos = [
+        contexto.Process(target=puerta_en_proceso, args=(entorno, i, ticket_numbers, tamano_lote, barrera, salida))
+        for i in range(puertas)
+    ]
+    for proceso in procesos:
+        proceso.start()
+    resultados = [salida.get() for _ in procesos]
+    for proceso in procesos:
+        proceso.join()
+    return resultados
+
+
+def ejecutar_estres(puertas=8, tickets=2000, tamano_lote=50, modo='db'):
+    app = create_app()
+    ticket_numbers = preparar_datos(app, tickets)
+
+    if modo == 'caliente':
+        app.test_client().put(f'/api/tickets/event/{EVENT_ID}/hot')
+        resultados = ejecutar_en_procesos(app, puertas, ticket_numbers, tamano_lote)
+        app.test_client().delete(f'/api/tickets/event/{EVENT_ID}/hot')
+    else:
+        resultados = ejecutar_en_hilos(app, puertas, ticket_numbers, tamano_lote)
+
+    admisiones = Counter()
+    veredictos = Counter()
+    for admitidos, veredictos_puerta in resultados:
+        admisiones.update(admitidos)
+        veredictos.update(veredictos_puerta)
+
+    with app.app_context():
+        usados = Ticket.query.filter_by(is_used=True).count()
+    asistencia = app.test_client().get(f'/api/events/{EVENT_ID}/attendance').get_json()['attendance']
+
+    print("=" * 80)
+    print("🚪 ESTRÉS DE VALIDACIÓN EN PUERTAS")
+    print("=" * 80)
+    print(f"Puertas: {puertas} | Tickets: {tickets} | Tamaño de lote: {tamano_lote} | Modo: {modo}")
+    print(f"Veredictos: {dict(sorted(veredictos.items()))}")
+    print(f"Tickets marcados como usados: {usados}")
+    print(f"Contador de asistencia: {asistencia['ticketsAdmitted']} admitidos de {asistencia['ticketsSold']} vendidos")
+
+    errores = []
+    duplicados = [n for n, veces in admisiones.items() if veces > 1]
+    if duplicados:
+        errores.append(f'{len(duplicados)} tickets admitidos más de una vez')
+    if len(admisiones) != tickets or usados != tickets:
+        errores.append('No todos los tickets fueron admitidos exactamente una vez')
+    if asistencia['ticketsAdmitted'] != usados:
+        errores.append('El contador de asistencia no coincide con los tickets usados')
+
+    if errores:
+        for error in errores:
+            print(f"❌ {error}")
+        return False
+
+    print("✅ Cada ticket fue admitido exactamente una vez")
+    return True
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:4]] + sys.argv[4:5]
+    ok = ejecutar_estres(*args)
+    sys.exit(0 if ok else 1)
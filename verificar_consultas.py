@@ -0,0 +1,113 @@
+"""
+Script para verificar que los listados de compras usan un número fijo de consultas SQL.
+
+Cuenta las consultas de cada endpoint con pocas y con muchas filas: si la
+cantidad crece con el tamaño de la página hay una regresión N+1. Termina
+con código de salida 1 si algún endpoint no cumple.
+"""
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from sqlalchemy import event as sa_event
+
+# Usar una base de datos temporal para no tocar la base de desarrollo
+_tmp_dir = tempfile.mkdtemp(prefix='verificar_consultas_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp_dir, 'consultas.db')}"
+os.environ['RESERVATION_SWEEPER_ENABLED'] = 'False'
+
+from api.app import create_app
+from api.models import db, Event, Purchase, User
+from api.utils.inventory import activar_shards
+from api.utils.orders import crear_compra
+
+# Máximo de consultas permitidas por petición
+MAX_CONSULTAS = 6
+
+
+def preparar_datos(app):
+    """Crear un comprador con pocas compras y otro con muchas, repartidas en varios eventos"""
+    with app.app_context():
+        eventos = []
+        for i in range(10):
+            evento = Event(
+                id=f'consultas-{i}', title=f'Evento {i}', artist='Varios', date='2025-01-01',
+                venue='Estadio', location='Santiago, Chile', price=1000,
+                available_tickets=10_000, total_tickets=10_000
+            )
+            db.session.add(evento)
+            eventos.append(evento)
+        db.session.flush()
+        activar_shards(eventos[0], 4)
+
+        pocas = User(email='pocas@example.com', name='Pocas', last_name='Compras')
+        muchas = User(email='muchas@example.com', name='Muchas', last_name='Compras')
+        db.session.add_all([pocas, muchas])
+        db.session.flush()
+
+        for i in range(2):
+            crear_compra(pocas, eventos[i], 1, 1000, 1000)
+        for i in range(100):
+            crear_compra(muchas, eventos[i % len(eventos)], 2, 1000, 2000)
+        compra_grande, _ = crear_compra(muchas, eventos[0], 50, 1000, 50000)
+        compra_chica, _ = crear_compra(pocas, eventos[1], 1, 1000, 1000)
+        db.session.commit()
+
+        return pocas.id, muchas.id, compra_chica.id, compra_grande.id
+
+
+@contextmanager
+def contar_consultas(app):
+    with app.app_context():
+        engine = db.engine
+    consultas = []
+
+    def registrar(conn, cursor, statement, parameters, context, executemany):
+        consultas.append(statement)
+
+    sa_event.listen(engine, 'before_cursor_execute', registrar)
+    try:
+        yield consultas
+    finally:
+        sa_event.remove(engine, 'before_cursor_execute', registrar)
+
+
+def medir(app, url):
+    client = app.test_client()
+    with contar_consultas(app) as consultas:
+        response = client.get(url)
+    assert response.status_code == 200, f'{url} respondió {response.status_code}'
+    return len(consultas)
+
+
+def verificar_consultas():
+    app = create_app()
+    pocas_id, muchas_id, compra_chica_id, compra_grande_id = preparar_datos(app)
+
+    casos = [
+        ('GET /api/purchases', '/api/purchases?per_page=2', '/api/purchases?per_page=100'),
+        ('GET /api/purchases?pagination=cursor', '/api/purchases?pagination=cursor&per_page=2', '/api/purchases?pagination=cursor&per_page=100'),
+        ('GET /api/purchases/user/<id>', f'/api/purchases/user/{pocas_id}', f'/api/purchases/user/{muchas_id}'),
+        ('GET /api/purchases/user/<id>?shape=normalized', f'/api/purchases/user/{pocas_id}?shape=normalized', f'/api/purchases/user/{muchas_id}?shape=normalized'),
+        ('GET /api/tickets/purchase/<id>', f'/api/tickets/purchase/{compra_chica_id}', f'/api/tickets/purchase/{compra_grande_id}'),
+    ]
+
+    print("=" * 80)
+    print("🔎 VERIFICACIÓN DE CONSULTAS POR PETICIÓN")
+    print("=" * 80)
+
+    ok = True
+    for nombre, url_chica, url_grande in casos:
+        chica = medir(app, url_chica)
+        grande = medir(app, url_grande)
+        cumple = chica == grande and grande <= MAX_CONSULTAS
+        ok = ok and cumple
+        icono = "✅" if cumple else "❌"
+        print(f"{icono} {nombre}: {chica} consultas (pocas filas) / {grande} consultas (muchas filas)")
+
+    print("=" * 80)
+    return ok
+
+
+if __name__ == '__main__':
+    sys.exit(0 if verificar_consultas() else 1)
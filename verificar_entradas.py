@@ -1,7 +1,7 @@
 """
 Script para verificar que las entradas se descuentan correctamente al comprar
 """
-from api.models import db, Event, Purchase, User
+from api.models import db, Event, Purchase, User, Reservation
 from api.app import create_app
 from datetime import datetime
 
@@ -29,24 +29,33 @@ def verificar_descuento_entradas():
                 status='completed'
             ).all()
             
+            # Reservas activas: sus entradas están retenidas (descontadas) pero aún no vendidas
+            reservas_activas = Reservation.query.filter_by(
+                event_id=event.id,
+                status='active'
+            ).all()
+            
             # Calcular entradas vendidas
             entradas_vendidas = sum(p.quantity for p in compras)
-            entradas_esperadas = event.total_tickets - entradas_vendidas
+            entradas_retenidas = sum(r.quantity for r in reservas_activas)
+            entradas_esperadas = event.total_tickets - entradas_vendidas - entradas_retenidas
             
             # Verificar si coincide
-            coincide = event.available_tickets == entradas_esperadas
+            coincide = event.entradas_disponibles == entradas_esperadas
             icono = "✅" if coincide else "❌"
             
             print(f"{icono} Evento: {event.title}")
             print(f"   ID: {event.id}")
             print(f"   Total de tickets: {event.total_tickets}")
-            print(f"   Tickets disponibles (actual): {event.available_tickets}")
+            print(f"   Tickets disponibles (actual): {event.entradas_disponibles}")
             print(f"   Compras completadas: {len(compras)}")
             print(f"   Entradas vendidas: {entradas_vendidas}")
+            if entradas_retenidas:
+                print(f"   Entradas retenidas en reservas activas: {entradas_retenidas}")
             print(f"   Entradas esperadas disponibles: {entradas_esperadas}")
             
             if not coincide:
-                diferencia = event.available_tickets - entradas_esperadas
+                diferencia = event.entradas_disponibles - entradas_esperadas
                 print(f"   ⚠️  DIFERENCIA: {diferencia:+d} entradas")
                 print(f"   💡 Posible causa: Compras en estado 'pending' o no contabilizadas")
             
@@ -67,7 +76,7 @@ def verificar_descuento_entradas():
         print("=" * 80)
         
         total_entradas = sum(e.total_tickets for e in events)
-        total_disponibles = sum(e.available_tickets for e in events)
+        total_disponibles = sum(e.entradas_disponibles for e in events)
         total_vendidas = total_entradas - total_disponibles
         
         print(f"Total de entradas en sistema: {total_entradas}")